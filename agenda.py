@@ -0,0 +1,156 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# --- Configuración ---
+# Horario de atención en el que se buscan huecos, p. ej. KB_HORARIO="08:00-20:00"
+HORARIO = os.environ.get("KB_HORARIO", "08:00-20:00")
+DURACION_POR_DEFECTO = 30     # minutos, para servicios sin Duracion_min
+MINUTOS_DIA = 24 * 60
+_DESPLAZAMIENTO = np.int64(1) << 40   # separa los barberos al acumular máximos en un solo arreglo
+
+
+def _minutos(hhmm):
+    horas, minutos = hhmm.strip().split(":")[:2]
+    return int(horas) * 60 + int(minutos)
+
+
+def _horario(horario=HORARIO):
+    apertura, cierre = horario.split("-")
+    return _minutos(apertura), _minutos(cierre)
+
+
+def _hora(minutos):
+    """Minutos desde medianoche -> 'HH:MM'."""
+    minutos = int(minutos) % MINUTOS_DIA
+    return f"{minutos // 60:02d}:{minutos % 60:02d}"
+
+
+def _maximo_acumulado_por_grupo(grupos, valores):
+    """
+    Máximo acumulado de `valores` reiniciado en cada grupo, sin bucles de Python. Requiere que
+    los datos vengan ordenados por grupo: sumar grupo * desplazamiento hace que el máximo de un
+    grupo nunca "contamine" al siguiente.
+    """
+    desplazados = grupos.astype(np.int64) * _DESPLAZAMIENTO + valores
+    return np.maximum.accumulate(desplazados) - grupos.astype(np.int64) * _DESPLAZAMIENTO
+
+
+class IndiceAgenda:
+    """
+    Índice de intervalos ocupados por barbero, construido una vez a partir de la vista de citas.
+
+    Cada cita es un intervalo [inicio, fin) en minutos absolutos (día * 1440 + hora) con la
+    duración de su servicio. Los intervalos se guardan en arreglos de numpy ordenados por
+    (día, barbero, inicio), así que las citas de un día son un tramo contiguo que se ubica con
+    búsqueda binaria y los huecos se calculan vectorizados para todos los barberos a la vez.
+    """
+
+    def __init__(self, df_vista, horario=HORARIO):
+        self.horario = horario
+        self.apertura, self.cierre = _horario(horario)
+        columnas = ['ID_Cita', 'ID_Barbero', 'Nombre_Completo_Barbero', 'Nombre_Sede', 'Fecha', 'Hora', 'Duracion_min']
+        citas = df_vista[columnas].dropna(subset=['ID_Cita', 'ID_Barbero', 'Fecha', 'Hora'])
+        # Las horas se repiten muchísimo: se convierten solo los valores distintos
+        codigos_hora, horas = pd.factorize(citas['Hora'].astype(str))
+        minutos_hora = (pd.to_timedelta(horas, errors='coerce').total_seconds() // 60).to_numpy()[codigos_hora]
+        validas = ~np.isnan(minutos_hora)
+        citas, minutos_hora = citas[validas], minutos_hora[validas].astype(np.int64)
+
+        # Barberos y las sedes donde atienden (un barbero ocupado lo está en cualquier sede)
+        barberos = citas[['ID_Barbero', 'Nombre_Completo_Barbero']].drop_duplicates('ID_Barbero').sort_values('Nombre_Completo_Barbero')
+        self.barberos = barberos.set_index('ID_Barbero')['Nombre_Completo_Barbero']
+        self._codigo = pd.Series(np.arange(len(barberos)), index=barberos['ID_Barbero'].to_numpy())
+        self._sedes = citas.groupby('Nombre_Sede')['ID_Barbero'].unique().to_dict()
+
+        dia = citas['Fecha'].to_numpy().astype('datetime64[D]').astype(np.int64)
+        inicio = dia * MINUTOS_DIA + minutos_hora
+        duracion = pd.to_numeric(citas['Duracion_min'], errors='coerce').fillna(DURACION_POR_DEFECTO).to_numpy().astype(np.int64)
+        codigo = self._codigo.reindex(citas['ID_Barbero'].to_numpy()).to_numpy()
+
+        orden = np.lexsort((inicio, codigo, dia))
+        self.dia = dia[orden]
+        self.barbero = codigo[orden]
+        self.inicio = inicio[orden]
+        self.fin = self.inicio + duracion[orden]
+        self.id_cita = citas['ID_Cita'].to_numpy()[orden]
+        self.sede = citas['Nombre_Sede'].to_numpy()[orden]
+        self._conflictos = None
+
+    def __len__(self):
+        return len(self.inicio)
+
+    def _tramo_dia(self, fecha):
+        dia = np.datetime64(fecha, 'D').astype(np.int64)
+        return dia, slice(*np.searchsorted(self.dia, [dia, dia + 1]))
+
+    def _codigos_sede(self, sede):
+        if sede in (None, "Todas"):
+            return np.arange(len(self.barberos))
+        return np.sort(self._codigo.reindex(self._sedes.get(sede, [])).dropna().to_numpy().astype(np.int64))
+
+    def huecos_libres(self, sede, fecha, minimo_min=30):
+        """
+        Huecos de al menos `minimo_min` minutos dentro del horario de atención para cada barbero
+        de la sede en la fecha dada. Devuelve un DataFrame con Barbero, Desde, Hasta y Minutos.
+        """
+        dia, tramo = self._tramo_dia(fecha)
+        codigos = self._codigos_sede(sede)
+        apertura, cierre = dia * MINUTOS_DIA + self.apertura, dia * MINUTOS_DIA + self.cierre
+
+        barbero, inicio, fin = self.barbero[tramo], self.inicio[tramo], self.fin[tramo]
+        dentro = np.isin(barbero, codigos)
+        barbero, inicio, fin = barbero[dentro], np.clip(inicio[dentro], apertura, cierre), np.clip(fin[dentro], apertura, cierre)
+
+        # Fin de lo ocupado hasta cada cita (solapes incluidos) y hueco entre eso y la cita siguiente
+        ocupado_hasta = _maximo_acumulado_por_grupo(barbero, fin)
+        primera = np.r_[True, barbero[1:] != barbero[:-1]] if len(barbero) else np.zeros(0, dtype=bool)
+        ultima = np.r_[barbero[1:] != barbero[:-1], True] if len(barbero) else np.zeros(0, dtype=bool)
+        desde_previo = np.where(primera, apertura, np.r_[apertura, ocupado_hasta[:-1]])
+
+        # Barberos sin citas ese día: todo el horario libre
+        sin_citas = np.setdiff1d(codigos, barbero)
+        huecos = pd.DataFrame({
+            "codigo": np.concatenate([barbero, barbero[ultima], sin_citas]),
+            "desde": np.concatenate([desde_previo, ocupado_hasta[ultima], np.full(len(sin_citas), apertura)]),
+            "hasta": np.concatenate([inicio, np.full(ultima.sum(), cierre), np.full(len(sin_citas), cierre)]),
+        })
+        huecos["Minutos"] = huecos["hasta"] - huecos["desde"]
+        huecos = huecos[huecos["Minutos"] >= max(minimo_min, 1)].sort_values(["codigo", "desde"])
+        return pd.DataFrame({
+            "Barbero": self.barberos.iloc[huecos["codigo"].to_numpy()].to_numpy(),
+            "Desde": [_hora(m) for m in huecos["desde"]],
+            "Hasta": [_hora(m) for m in huecos["hasta"]],
+            "Minutos": huecos["Minutos"].to_numpy(),
+        })
+
+    def conflictos(self):
+        """
+        Citas que empiezan antes de que termine otra del mismo barbero (doble reserva o solape).
+        Cada fila trae la cita y la cita anterior con la que choca. Se calcula una sola vez.
+        """
+        if self._conflictos is None:
+            self._conflictos = self._calcular_conflictos()
+        return self._conflictos
+
+    def _calcular_conflictos(self):
+        i = previa = np.zeros(0, dtype=np.int64)
+        if len(self) > 1:
+            # Grupo = (día, barbero); el orden del índice ya los deja contiguos
+            nuevo_grupo = np.r_[True, (self.dia[1:] != self.dia[:-1]) | (self.barbero[1:] != self.barbero[:-1])]
+            ocupado_hasta = _maximo_acumulado_por_grupo(np.cumsum(nuevo_grupo), self.fin)
+            # Posición de la cita que define ese máximo, para reportar con cuál choca
+            posicion = np.maximum.accumulate(np.where(ocupado_hasta == self.fin, np.arange(len(self)), 0))
+            i = np.flatnonzero(~nuevo_grupo & (self.inicio < np.r_[0, ocupado_hasta[:-1]]))
+            previa = posicion[i - 1]
+        return pd.DataFrame({
+            "Fecha": self.dia[i].astype('datetime64[D]'),
+            "Barbero": self.barberos.iloc[self.barbero[i]].to_numpy(),
+            "Sede": self.sede[i],
+            "ID_Cita": self.id_cita[i],
+            "Hora": [_hora(m) for m in self.inicio[i]],
+            "Choca_con": self.id_cita[previa],
+            "Hora_previa": [_hora(m) for m in self.inicio[previa]],
+            "Minutos_solapados": np.minimum(self.fin[i], self.fin[previa]) - self.inicio[i],
+        })
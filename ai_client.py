@@ -0,0 +1,95 @@
+import io
+import os
+import streamlit as st
+import instrumentation as perf
+import cache_compartida as cc
+from llm_gateway import PasarelaLLM, huella_solicitud
+
+# El SDK de Gemini solo se importa cuando una función de IA se ejecuta por primera vez.
+MODELO_GEMINI = 'gemini-2.5-flash-preview-05-20'
+
+
+@st.cache_resource(show_spinner=False)
+def obtener_modelo(nombre=MODELO_GEMINI):
+    """Configura Gemini y construye el cliente bajo demanda (una vez por proceso)."""
+    import google.generativeai as genai
+    genai.configure(api_key=st.secrets["GOOGLE_API_KEY"])
+    return genai.GenerativeModel(nombre)
+
+
+def modelo_disponible():
+    """Devuelve el modelo o None, mostrando el error de configuración en la página."""
+    try:
+        return obtener_modelo()
+    except Exception as e:
+        st.error(f"No se pudo configurar la conexión con Google Gemini. Verifica tu API Key. Error: {e}")
+        return None
+
+
+@st.cache_resource(show_spinner=False)
+def obtener_pasarela():
+    """Pasarela única por proceso: todas las sesiones comparten límite de tasa, concurrencia y cola."""
+    return PasarelaLLM(
+        max_concurrentes=int(os.environ.get("KB_LLM_CONCURRENCIA", 4)),
+        por_minuto=int(os.environ.get("KB_LLM_RPM", 30)),
+    )
+
+
+def generar(modelo, contenido, coalescer=True, **kwargs):
+    """
+    Punto único para `generate_content`: pasa por la pasarela compartida y, si hay que esperar
+    turno, muestra la posición en la cola donde se hizo la llamada. Los prompts creativos pasan
+    `coalescer=False` para que dos clics simultáneos no reciban la misma respuesta.
+    """
+    aviso = st.empty()
+
+    def al_esperar(posicion):
+        aviso.info(f"⏳ Hay mucha demanda en el asistente. Tu solicitud está en la posición {posicion} de la cola.")
+
+    perf.contar("llm.generate_content")
+    try:
+        with perf.span("llm:generate_content"):
+            return obtener_pasarela().generar(modelo, contenido, al_esperar=al_esperar, coalescer=coalescer, **kwargs)
+    finally:
+        aviso.empty()
+
+
+def generar_texto(modelo, contenido, ttl=24 * 3600, **kwargs):
+    """
+    Texto de la respuesta. Con KB_CACHE activa, las réplicas comparten el resultado de un mismo
+    prompt: solo una llama a Gemini y las demás esperan y reutilizan su texto. Es para salidas
+    deterministas (reportes, plantillas), no para las que deben variar en cada clic.
+    """
+    if not cc.activa():
+        return generar(modelo, contenido, **kwargs).text
+    return cc.obtener_o_calcular(f"llm:{huella_solicitud(modelo, contenido, kwargs)}",
+                                 lambda: generar(modelo, contenido, **kwargs).text,
+                                 lambda texto: texto.encode("utf-8"), lambda datos: datos.decode("utf-8"),
+                                 ttl=ttl, recordar=False)
+
+
+@st.cache_resource(show_spinner=False, ttl=47 * 3600)
+def _subir_imagen(huella, _datos, mime):
+    """Sube la imagen con la File API una sola vez por contenido (Gemini la conserva 48 h)."""
+    import google.generativeai as genai
+    obtener_modelo()  # asegura genai.configure
+    return genai.upload_file(io.BytesIO(_datos), mime_type=mime, display_name=huella[:16])
+
+
+def parte_imagen(foto):
+    """Parte de contenido para una `image_preprocessing.FotoProcesada`: referencia subida o, si falla, blob en línea."""
+    try:
+        return _subir_imagen(foto.huella, foto.datos, foto.mime)
+    except Exception:
+        return {"mime_type": foto.mime, "data": foto.datos}
+
+
+def configuracion_seguridad():
+    """Configuración de seguridad menos restrictiva usada por las pestañas de imágenes."""
+    from google.generativeai.types import HarmCategory, HarmBlockThreshold
+    return {
+        HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
+        HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
+        HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
+        HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
+    }
@@ -0,0 +1,230 @@
+import json
+import os
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+import requests
+
+import cache_compartida as cc
+from pronostico import NIVELES
+
+# --- Configuración ---
+ESTADO_DIR = os.environ.get("KB_ANOMALIAS_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "anomalias")
+# Las alertas nuevas se agregan a un archivo JSONL (la "bandeja de salida") y, si hay webhook, se envían también ahí
+OUTBOX = os.environ.get("KB_ALERTAS_OUTBOX") or os.path.join(ESTADO_DIR, "outbox.jsonl")
+WEBHOOK = os.environ.get("KB_ALERTAS_WEBHOOK", "")
+UMBRAL_Z = float(os.environ.get("KB_ALERTAS_Z", 3.0))
+DIAS_RECIENTES = int(os.environ.get("KB_ALERTAS_DIAS", 7))
+# Un día se da por cerrado cuando pasaron KB_ALERTAS_GRACIA días más: margen para las citas registradas tarde
+DIAS_GRACIA = int(os.environ.get("KB_ALERTAS_GRACIA", 0))
+ALFA = 0.2                    # peso de cada semana nueva en la línea base de su día de la semana
+MIN_OBSERVACIONES = 4         # semanas vistas de ese día antes de poder alertar
+MIN_CITAS_ESPERADAS = 5       # series con menos citas esperadas ese día son puro ruido día a día
+DESVIACION_RELATIVA_MIN = 0.1 # la desviación nunca se toma menor al 10 % de lo esperado
+METRICAS = ("citas", "ingresos")
+VERSION_ESTADO = 1
+
+
+class EstadoAnomalias:
+    """
+    Líneas base por serie (total, sede, barbero y servicio), métrica (citas e ingresos diarios) y
+    día de la semana: media y varianza con promedio móvil exponencial (EWMA). Se guardan en disco
+    junto con el último día procesado, así cada actualización solo recorre los días nuevos.
+
+    Cada día se evalúa una sola vez, al cerrar: una cita registrada después para un día ya
+    procesado no cambia su línea base ni genera alertas. `KB_ALERTAS_GRACIA` retrasa el cierre
+    para dar tiempo a esas citas.
+    """
+
+    def __init__(self):
+        self.version = VERSION_ESTADO
+        self.claves = [("total", "Todas")]
+        self._posicion = {self.claves[0]: 0}
+        self.media = np.zeros((1, len(METRICAS), 7))
+        self.varianza = np.zeros((1, len(METRICAS), 7))
+        self.observaciones = np.zeros((1, 7), dtype=np.int64)
+        self.ultimo_dia = None        # datetime64[D] del último día cerrado ya procesado
+        self.recientes = []           # alertas de los últimos DIAS_RECIENTES días
+
+    def filas(self, nivel, valores):
+        """Fila de cada valor en los arreglos de estado; las series nuevas se agregan en cero."""
+        nuevas = [(nivel, v) for v in valores if (nivel, v) not in self._posicion]
+        if nuevas:
+            for clave in nuevas:
+                self._posicion[clave] = len(self.claves)
+                self.claves.append(clave)
+            extra = len(nuevas)
+            self.media = np.concatenate([self.media, np.zeros((extra,) + self.media.shape[1:])])
+            self.varianza = np.concatenate([self.varianza, np.zeros((extra,) + self.varianza.shape[1:])])
+            self.observaciones = np.concatenate([self.observaciones, np.zeros((extra, 7), dtype=np.int64)])
+        return np.array([self._posicion[(nivel, v)] for v in valores], dtype=np.int64)
+
+    def alertas(self, claves=None):
+        """Alertas recientes (opcionalmente solo de las series en `claves`): las más nuevas y fuertes primero."""
+        alertas = [a for a in self.recientes if claves is None or (a["nivel"], a["valor"]) in claves]
+        columnas = ["fecha", "nivel", "valor", "metrica", "direccion", "observado", "esperado", "z"]
+        df = pd.DataFrame(alertas, columns=columnas)
+        return df.sort_values(["fecha", "z"], ascending=False, key=lambda c: c.abs() if c.name == "z" else c)
+
+
+def _dia_semana(dias):
+    """Lunes = 0 ... domingo = 6 para días en datetime64[D] (el 1970-01-01 fue jueves)."""
+    return (dias.astype(np.int64) + 3) % 7
+
+
+def _matrices(citas, estado, dia, n_dias):
+    """Citas e ingresos por (serie, métrica, día) de los días nuevos, con un solo bincount por métrica."""
+    filas = [np.zeros(len(citas), dtype=np.int64)]
+    for nivel, columna in NIVELES.items():
+        codigos, valores = pd.factorize(citas[columna])
+        posiciones = estado.filas(nivel, list(valores))
+        filas.append(np.where(codigos >= 0, posiciones[codigos] if len(posiciones) else -1, -1))
+    fila = np.concatenate(filas)
+    validas = fila >= 0
+    plano = fila[validas] * n_dias + np.tile(dia, len(filas))[validas]
+    precio = pd.to_numeric(citas['Precio'], errors='coerce').fillna(0).to_numpy(dtype=float)
+    tamano = len(estado.claves) * n_dias
+    Y = np.stack([np.bincount(plano, minlength=tamano),
+                  np.bincount(plano, weights=np.tile(precio, len(filas))[validas], minlength=tamano)], axis=1)
+    return Y.reshape(len(estado.claves), n_dias, len(METRICAS)).transpose(0, 2, 1).astype(float)
+
+
+def _piso_poisson(media):
+    """
+    Con pocas citas al día la variación natural es del orden de √citas (y de ingresos / √citas):
+    así un barbero que pasa de 2 a 5 citas no dispara una alerta.
+    """
+    citas = np.maximum(np.abs(media[:, 0]), 1.0)
+    return np.stack([np.sqrt(citas), np.abs(media[:, 1]) / np.sqrt(citas)], axis=1)
+
+
+def _procesar(estado, Y, desde, recientes_desde):
+    """Recorre los días nuevos: primero compara contra la línea base y después la actualiza. Devuelve las alertas."""
+    alertas = []
+    for t in range(Y.shape[2]):
+        dia = desde + np.timedelta64(t, 'D')
+        semana = int(_dia_semana(dia))
+        x, media, varianza = Y[:, :, t], estado.media[:, :, semana], estado.varianza[:, :, semana]
+        vistas = estado.observaciones[:, semana]
+
+        if dia >= recientes_desde:
+            desviacion = np.maximum.reduce([np.sqrt(varianza), DESVIACION_RELATIVA_MIN * np.abs(media),
+                                            _piso_poisson(media), np.full_like(media, 1e-9)])
+            z = (x - media) / desviacion
+            elegibles = (vistas >= MIN_OBSERVACIONES) & (media[:, 0] >= MIN_CITAS_ESPERADAS)
+            marcadas = elegibles[:, None] & (np.abs(z) > UMBRAL_Z)
+            for i, m in zip(*np.nonzero(marcadas)):
+                nivel, valor = estado.claves[i]
+                alertas.append({"fecha": str(dia), "nivel": nivel, "valor": str(valor), "metrica": METRICAS[m],
+                                "direccion": "caída" if z[i, m] < 0 else "alza", "observado": round(float(x[i, m]), 2),
+                                "esperado": round(float(media[i, m]), 2), "z": round(float(z[i, m]), 2)})
+
+        # EWMA de media y varianza; la primera observación de una serie fija su media sin sesgo hacia cero
+        diferencia = x - media
+        nueva_media = np.where(vistas[:, None] == 0, x, media + ALFA * diferencia)
+        nueva_varianza = np.where(vistas[:, None] == 0, 0.0, (1 - ALFA) * (varianza + ALFA * diferencia ** 2))
+        estado.media[:, :, semana], estado.varianza[:, :, semana] = nueva_media, nueva_varianza
+        estado.observaciones[:, semana] += 1
+    return alertas
+
+
+# --- Persistencia y envío ---
+def _ruta_estado(directorio):
+    return os.path.join(directorio, "estado.pkl")
+
+
+def cargar(directorio=ESTADO_DIR):
+    try:
+        with open(_ruta_estado(directorio), "rb") as f:
+            estado = pickle.load(f)
+        return estado if getattr(estado, "version", None) == VERSION_ESTADO else EstadoAnomalias()
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError, AttributeError):
+        return EstadoAnomalias()
+
+
+def firma_estado(directorio=ESTADO_DIR):
+    """(mtime, tamaño) del estado guardado o None: cambia cada vez que el ETL guarda líneas base nuevas."""
+    try:
+        info = os.stat(_ruta_estado(directorio))
+    except FileNotFoundError:
+        return None
+    return info.st_mtime_ns, info.st_size
+
+
+def _guardar(estado, directorio):
+    ruta = _ruta_estado(directorio)
+    tmp = f"{ruta}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(estado, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, ruta)
+
+
+def enviar(alertas, outbox=OUTBOX, webhook=WEBHOOK):
+    """Agrega las alertas a la bandeja de salida y, si hay webhook, las publica (un fallo no las pierde)."""
+    if not alertas:
+        return
+    os.makedirs(os.path.dirname(outbox) or ".", exist_ok=True)
+    detectada = time.strftime("%Y-%m-%dT%H:%M:%S")
+    with open(outbox, "a", encoding="utf-8") as f:
+        for alerta in alertas:
+            f.write(json.dumps(dict(alerta, detectada=detectada), ensure_ascii=False) + "\n")
+    if webhook:
+        try:
+            requests.post(webhook, json={"alertas": alertas}, timeout=5).raise_for_status()
+        except requests.exceptions.RequestException:
+            pass  # quedan en la bandeja de salida
+
+
+# --- Puntos de entrada ---
+def revisar(estado, df_vista, hoy=None):
+    """
+    Incorpora al `estado` en memoria los días cerrados que aún no había procesado y devuelve sus
+    alertas. No escribe nada: las páginas lo usan para ver las alertas al día y `actualizar` para
+    guardarlas y enviarlas. Solo se leen las citas de esos días; el resto de la historia ya está
+    resumido en las líneas base.
+    """
+    hoy = np.datetime64(hoy or pd.Timestamp.now().date(), 'D')
+    cierre = hoy - np.timedelta64(DIAS_GRACIA, 'D')
+    # Primero el recorte por fecha y después las columnas y los nulos: no se copia la historia ya procesada
+    fechas = df_vista['Fecha']
+    en_rango = fechas < pd.Timestamp(cierre)
+    if estado.ultimo_dia is not None:
+        en_rango &= fechas >= pd.Timestamp(estado.ultimo_dia + np.timedelta64(1, 'D'))
+    columnas = ['ID_Cita', 'Fecha', 'Precio', *NIVELES.values()]
+    citas = df_vista.loc[en_rango, columnas].dropna(subset=['ID_Cita', 'Fecha'])
+    if citas.empty:
+        return []
+
+    dias = citas['Fecha'].to_numpy().astype('datetime64[D]')
+    desde = dias.min() if estado.ultimo_dia is None else estado.ultimo_dia + np.timedelta64(1, 'D')
+    hasta = dias.max()
+    n_dias = int((hasta - desde).astype(np.int64)) + 1
+    Y = _matrices(citas, estado, (dias - desde).astype(np.int64), n_dias)
+    recientes_desde = hasta - np.timedelta64(DIAS_RECIENTES - 1, 'D')
+    alertas = _procesar(estado, Y, desde, recientes_desde)
+
+    estado.ultimo_dia = hasta
+    estado.recientes = [a for a in estado.recientes if np.datetime64(a["fecha"]) >= recientes_desde] + alertas
+    return alertas
+
+
+def actualizar(df_vista, directorio=ESTADO_DIR, hoy=None, outbox=OUTBOX, webhook=WEBHOOK):
+    """
+    Lo que corre el ETL (`artefactos.py --alertas`): revisa los días nuevos, guarda el estado y
+    envía las alertas nuevas. Un bloqueo entre procesos evita que dos ejecuciones procesen (y
+    alerten) el mismo día.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    alertas = []
+    with cc.CacheDisco(directorio).bloqueo("anomalias") as obtenido:
+        estado = cargar(directorio)
+        if not obtenido:
+            return estado
+        previo = estado.ultimo_dia
+        alertas = revisar(estado, df_vista, hoy)
+        if estado.ultimo_dia is not None and estado.ultimo_dia != previo:
+            _guardar(estado, directorio)
+    enviar(alertas, outbox, webhook)
+    return estado
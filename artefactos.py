@@ -0,0 +1,351 @@
+"""
+Construcción sin Streamlit de los datos derivados que usan las páginas (ETL para cron).
+
+Descarga los endpoints de la API (o los lee de un directorio local con la misma forma, p. ej.
+benchmarks/data/<escala>) y publica en KB_ARTEFACTOS (.cache/artefactos por defecto):
+
+    vista        la vista de citas unida (clientes + citas + sedes + barberos + servicios) y las sedes
+    indices      posiciones de las citas por sede, barbero y servicio, para sembrar el motor de consultas
+    agenda       agenda.IndiceAgenda ya armada, con las citas cruzadas calculadas
+    pronostico   pronostico.Pronosticos ya ajustado
+    cohortes     cohortes.Cohortes: retención y valor de vida por cohorte
+
+Cada etapa guarda la huella de sus entradas; si no cambiaron, se salta. Los archivos llevan la
+huella en el nombre, se escriben con tmp + os.replace y el manifiesto se reemplaza al final, así
+que un lector nunca ve una publicación a medias. Mientras haya un manifiesto de menos de
+KB_ARTEFACTOS_MAX_HORAS, data_manager lee de aquí en lugar de llamar a la API.
+
+Uso:
+    python artefactos.py --api https://pi-movil2-0.onrender.com
+    python artefactos.py --fuente benchmarks/data/100k-s42
+    python artefactos.py --forzar                  # reconstruye todas las etapas
+    python artefactos.py --alertas                 # además revisa anomalías de los días nuevos (anomalias.py)
+"""
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import requests
+
+# --- Configuración ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ARTEFACTOS_DIR = os.environ.get("KB_ARTEFACTOS") or os.path.join(BASE_DIR, ".cache", "artefactos")
+MAX_EDAD_HORAS = float(os.environ.get("KB_ARTEFACTOS_MAX_HORAS", 24))
+MAX_EDAD_HUERFANOS_SEG = 3600     # los archivos de publicaciones anteriores se borran después de una hora
+TIMEOUT_DESCARGA = 120
+ENDPOINTS = ["clientes", "barberos", "servicios", "historial/citas", "sedes"]
+# Subir la versión de una etapa invalida sus artefactos (y los de las etapas que dependen de ella)
+VERSION_ETAPAS = {"vista": 1, "indices": 1, "agenda": 1, "pronostico": 1, "cohortes": 1}
+COLUMNAS_INDICE = {"sede": "Nombre_Sede", "barbero": "Nombre_Completo_Barbero", "servicio": "Nombre_Servicio"}
+
+# Capa de traducción para compatibilidad: nombres de la API -> nombres que usan las páginas
+RENOMBRES = {
+    "clientes": {'id': 'ID_Cliente', 'nombreCliente': 'Nombre_Cliente', 'apellidoCliente': 'Apellido_Cliente', 'telefono': 'Telefono', 'email': 'Email'},
+    "barberos": {'id': 'ID_Barbero', 'nombreBarbero': 'Nombre_Barbero', 'apellidoBarbero': 'Apellido_Barbero'},
+    "servicios": {'id': 'ID_Servicio', 'nombreServicio': 'Nombre_Servicio', 'precio': 'Precio', 'duracionMin': 'Duracion_min'},
+    "historial/citas": {'id': 'ID_Cita', 'idCliente': 'ID_Cliente', 'idBarbero': 'ID_Barbero', 'idServicio': 'ID_Servicio', 'idSede': 'ID_Sede', 'fecha': 'Fecha', 'hora': 'Hora'},
+    "sedes": {'id': 'ID_Sede', 'nombreSede': 'Nombre_Sede', 'ciudad': 'Ciudad', 'municipio': 'Municipio', 'barrio': 'Barrio', 'direccion': 'Direccion'},
+}
+
+
+# --- Transformación (compartida con data_manager) ---
+def traducir(endpoint, df):
+    """Renombra las columnas de un endpoint; en barberos además aplana el ID de la sede anidada."""
+    if df.empty:
+        return df
+    if endpoint == "barberos" and 'sede' in df.columns and not df['sede'].isnull().all():
+        df['ID_Sede'] = df['sede'].apply(lambda x: x.get('id') if isinstance(x, dict) else None)
+    return df.rename(columns=RENOMBRES[endpoint])
+
+
+def construir_vista(df_clientes, df_barberos, df_servicios, df_citas, df_sedes):
+    """Une las tablas traducidas en la vista de citas. Devuelve (df_vista, df_sedes)."""
+    # Aseguramos que los IDs sean numéricos antes de unir
+    for df in [df_clientes, df_citas, df_barberos, df_sedes, df_servicios]:
+        for col in df.columns:
+            if 'ID' in col:
+                df[col] = pd.to_numeric(df[col], errors='coerce')
+
+    df_clientes['Nombre_Completo_Cliente'] = df_clientes['Nombre_Cliente'] + ' ' + df_clientes['Apellido_Cliente']
+    df_barberos['Nombre_Completo_Barbero'] = df_barberos['Nombre_Barbero'] + ' ' + df_barberos['Apellido_Barbero']
+
+    df_vista = pd.merge(df_clientes, df_citas, on="ID_Cliente", how="left")
+    df_vista = pd.merge(df_vista, df_sedes, on="ID_Sede", how="left")
+    df_vista = pd.merge(df_vista, df_barberos, on="ID_Barbero", how="left")
+    df_vista = pd.merge(df_vista, df_servicios, on="ID_Servicio", how="left")
+
+    df_vista['Fecha'] = pd.to_datetime(df_vista['Fecha'], errors='coerce')
+    return df_vista, df_sedes
+
+
+def version_datos(df_vista):
+    """Huella barata de la vista (tamaño, columnas y totales) para indexar lo que se deriva de ella."""
+    if df_vista.empty:
+        return "vacia"
+    firma = (len(df_vista), tuple(df_vista.columns), float(df_vista['ID_Cita'].sum()),
+             str(df_vista['Fecha'].max()), float(df_vista['Precio'].sum()))
+    return hashlib.sha1(repr(firma).encode("utf-8")).hexdigest()[:16]
+
+
+# --- Utilidades de archivos ---
+def _huella(*partes):
+    return hashlib.sha256(repr(partes).encode("utf-8")).hexdigest()[:16]
+
+
+def _escribir_atomico(ruta, escribir):
+    """`escribir(ruta_tmp)` produce el archivo; solo se publica con su nombre final si terminó bien."""
+    tmp = f"{ruta}.{os.getpid()}.tmp"
+    try:
+        escribir(tmp)
+        os.replace(tmp, ruta)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _escribir_pickle(ruta, objeto):
+    def escribir(tmp):
+        with open(tmp, "wb") as f:
+            pickle.dump(objeto, f, protocol=pickle.HIGHEST_PROTOCOL)
+    _escribir_atomico(ruta, escribir)
+
+
+def leer_manifiesto(directorio=ARTEFACTOS_DIR):
+    try:
+        with open(os.path.join(directorio, "manifiesto.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def vigente(directorio=ARTEFACTOS_DIR, max_edad_horas=MAX_EDAD_HORAS):
+    """El manifiesto publicado si existe y no es más viejo que `max_edad_horas`; None si no."""
+    manifiesto = leer_manifiesto(directorio)
+    if manifiesto is None or time.time() - manifiesto["publicado"] > max_edad_horas * 3600:
+        return None
+    return manifiesto
+
+
+def _ruta(manifiesto, etapa, archivo, directorio=ARTEFACTOS_DIR):
+    return os.path.join(directorio, manifiesto["etapas"][etapa]["archivos"][archivo])
+
+
+# --- Fuentes ---
+def _nombre_fuente(endpoint):
+    return endpoint.replace("/", "_") + ".json"
+
+
+def _actualizar_fuente(fuente, endpoint, directorio, meta):
+    """
+    Deja el JSON crudo del endpoint en `directorio/fuentes` y devuelve su versión. Con la API se
+    revalida con ETag / Last-Modified; un archivo local se lee en su sitio y se versiona por contenido.
+    """
+    if not str(fuente).startswith(("http://", "https://")):
+        ruta = os.path.join(fuente, endpoint + ".json")
+        huella = hashlib.sha256()
+        with open(ruta, "rb") as f:
+            for bloque in iter(lambda: f.read(1 << 20), b""):
+                huella.update(bloque)
+        return {"ruta": os.path.abspath(ruta), "version": huella.hexdigest()[:16]}
+
+    destino = os.path.join(directorio, "fuentes", _nombre_fuente(endpoint))
+    headers = {}
+    if os.path.exists(destino) and meta.get("url") == f"{fuente}/{endpoint}":
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+    with requests.get(f"{fuente}/{endpoint}", headers=headers, stream=True, timeout=TIMEOUT_DESCARGA) as response:
+        if response.status_code == 304:
+            return meta
+        response.raise_for_status()
+        huella = hashlib.sha256()
+
+        def escribir(tmp):
+            with open(tmp, "wb") as f:
+                for bloque in response.iter_content(chunk_size=1 << 20):
+                    f.write(bloque)
+                    huella.update(bloque)
+        _escribir_atomico(destino, escribir)
+    return {"url": f"{fuente}/{endpoint}", "ruta": destino, "version": huella.hexdigest()[:16],
+            "etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+
+
+def _leer_fuentes(fuentes):
+    tablas = []
+    for endpoint in ENDPOINTS:
+        with open(fuentes[endpoint]["ruta"], encoding="utf-8") as f:
+            tablas.append(traducir(endpoint, pd.DataFrame(json.load(f))))
+    return tablas
+
+
+# --- Etapas ---
+def _indices(df_vista):
+    """Por columna, las posiciones de las citas agrupadas por valor (formato CSR: valores, inicios, posiciones)."""
+    citas = np.flatnonzero(df_vista['ID_Cita'].notna().to_numpy())
+    arreglos = {}
+    for campo, columna in COLUMNAS_INDICE.items():
+        codigos, valores = pd.factorize(df_vista[columna].to_numpy()[citas])
+        orden = np.argsort(codigos, kind="stable")        # estable: las posiciones quedan ascendentes
+        validas = codigos[orden] >= 0
+        arreglos[f"{campo}_valores"] = np.asarray(valores, dtype=str)
+        arreglos[f"{campo}_inicios"] = np.concatenate([[0], np.cumsum(np.bincount(codigos[codigos >= 0], minlength=len(valores)))])
+        arreglos[f"{campo}_posiciones"] = citas[orden][validas].astype(np.int32 if len(df_vista) < 2 ** 31 else np.int64)
+    return arreglos
+
+
+def construir(fuente, directorio=ARTEFACTOS_DIR, forzar=False, informar=print):
+    """Actualiza las fuentes, reconstruye las etapas cuyas entradas cambiaron y publica el manifiesto."""
+    import agenda
+    import cohortes
+    import pronostico
+
+    os.makedirs(os.path.join(directorio, "fuentes"), exist_ok=True)
+    anterior = leer_manifiesto(directorio) or {"fuentes": {}, "etapas": {}}
+    fuentes = {e: _actualizar_fuente(fuente, e, directorio, dict(anterior["fuentes"].get(e, {}))) for e in ENDPOINTS}
+
+    # Huella de entrada de cada etapa: su versión de código, su configuración y lo que consume
+    entrada_vista = _huella("vista", VERSION_ETAPAS["vista"], [fuentes[e]["version"] for e in ENDPOINTS])
+    entradas = {
+        "vista": entrada_vista,
+        "indices": _huella("indices", VERSION_ETAPAS["indices"], entrada_vista),
+        "agenda": _huella("agenda", VERSION_ETAPAS["agenda"], entrada_vista, agenda.HORARIO),
+        "pronostico": _huella("pronostico", VERSION_ETAPAS["pronostico"], entrada_vista, pronostico.HORIZONTE_DIAS),
+        "cohortes": _huella("cohortes", VERSION_ETAPAS["cohortes"], entrada_vista),
+    }
+    archivos = {
+        "vista": {"vista": f"vista-{entradas['vista']}.parquet", "sedes": f"sedes-{entradas['vista']}.parquet"},
+        "indices": {"indices": f"indices-{entradas['indices']}.npz"},
+        "agenda": {"agenda": f"agenda-{entradas['agenda']}.pkl"},
+        "pronostico": {"pronostico": f"pronostico-{entradas['pronostico']}.pkl"},
+        "cohortes": {"cohortes": f"cohortes-{entradas['cohortes']}.pkl"},
+    }
+
+    def al_dia(etapa):
+        previa = anterior["etapas"].get(etapa, {})
+        return (not forzar and previa.get("entrada") == entradas[etapa]
+                and all(os.path.exists(os.path.join(directorio, a)) for a in archivos[etapa].values()))
+
+    etapas, vista = {}, None
+    for etapa in VERSION_ETAPAS:
+        inicio = time.perf_counter()
+        if al_dia(etapa):
+            etapas[etapa] = anterior["etapas"][etapa]
+            informar(f"{etapa:<11} sin cambios")
+            continue
+        rutas = {nombre: os.path.join(directorio, archivo) for nombre, archivo in archivos[etapa].items()}
+        if etapa == "vista":
+            df_clientes, df_barberos, df_servicios, df_citas, df_sedes = _leer_fuentes(fuentes)
+            if df_clientes.empty or df_citas.empty:
+                raise RuntimeError("La fuente no trae clientes o citas; no se publica nada.")
+            vista = construir_vista(df_clientes, df_barberos, df_servicios, df_citas, df_sedes)
+            for nombre, df in zip(("vista", "sedes"), vista):
+                _escribir_atomico(rutas[nombre], lambda tmp, df=df: df.to_parquet(tmp, index=False))
+        else:
+            if vista is None:
+                vista = cargar_vista({"etapas": {"vista": etapas["vista"]}}, directorio)
+            if etapa == "indices":
+                arreglos = _indices(vista[0])
+
+                def escribir(tmp):
+                    with open(tmp, "wb") as f:
+                        np.savez(f, **arreglos)
+                _escribir_atomico(rutas["indices"], escribir)
+            elif etapa == "agenda":
+                indice = agenda.IndiceAgenda(vista[0])
+                indice.conflictos()   # se guardan ya calculadas
+                _escribir_pickle(rutas["agenda"], indice)
+            elif etapa == "pronostico":
+                _escribir_pickle(rutas["pronostico"], pronostico.Pronosticos(vista[0]))
+            else:
+                _escribir_pickle(rutas["cohortes"], cohortes.Cohortes(vista[0]))
+        etapas[etapa] = {"entrada": entradas[etapa], "archivos": archivos[etapa]}
+        if etapa == "vista":
+            etapas[etapa]["version_datos"] = version_datos(vista[0])
+        informar(f"{etapa:<11} reconstruida en {time.perf_counter() - inicio:.2f} s")
+
+    manifiesto = {"version": entrada_vista, "version_datos": etapas["vista"]["version_datos"], "publicado": time.time(),
+                  "fuente": str(fuente), "fuentes": fuentes, "etapas": etapas}
+
+    def escribir(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifiesto, f, ensure_ascii=False, indent=2)
+    _escribir_atomico(os.path.join(directorio, "manifiesto.json"), escribir)
+    _limpiar_huerfanos(directorio, manifiesto)
+    return manifiesto
+
+
+def _limpiar_huerfanos(directorio, manifiesto):
+    """Borra artefactos de publicaciones anteriores que ya nadie debería estar leyendo."""
+    vigentes = {a for etapa in manifiesto["etapas"].values() for a in etapa["archivos"].values()}
+    ahora = time.time()
+    for nombre in os.listdir(directorio):
+        ruta = os.path.join(directorio, nombre)
+        if nombre in vigentes or nombre == "manifiesto.json" or not os.path.isfile(ruta):
+            continue
+        try:
+            if ahora - os.path.getmtime(ruta) > MAX_EDAD_HUERFANOS_SEG:
+                os.remove(ruta)
+        except OSError:
+            pass
+
+
+# --- Lectura (la usa data_manager) ---
+def cargar_vista(manifiesto, directorio=ARTEFACTOS_DIR):
+    """(df_vista, df_sedes) publicados."""
+    return (pd.read_parquet(_ruta(manifiesto, "vista", "vista", directorio)),
+            pd.read_parquet(_ruta(manifiesto, "vista", "sedes", directorio)))
+
+
+def cargar_indices(manifiesto, directorio=ARTEFACTOS_DIR):
+    """{campo: {valor: posiciones}} para sembrar el motor de consultas."""
+    with np.load(_ruta(manifiesto, "indices", "indices", directorio)) as arreglos:
+        indices = {}
+        for campo in COLUMNAS_INDICE:
+            inicios, posiciones = arreglos[f"{campo}_inicios"], arreglos[f"{campo}_posiciones"]
+            indices[campo] = {valor: posiciones[inicios[i]:inicios[i + 1]]
+                              for i, valor in enumerate(arreglos[f"{campo}_valores"].tolist())}
+    return indices
+
+
+def cargar_objeto(manifiesto, etapa, directorio=ARTEFACTOS_DIR):
+    """La agenda, los pronósticos o las cohortes publicados (solo se leen archivos escritos por este mismo ETL)."""
+    with open(_ruta(manifiesto, etapa, etapa, directorio), "rb") as f:
+        return pickle.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    grupo = parser.add_mutually_exclusive_group()
+    grupo.add_argument("--api", default=os.environ.get("KB_API_URL"), help="URL base de la API (por defecto KB_API_URL)")
+    grupo.add_argument("--fuente", help="Directorio local con un <endpoint>.json por endpoint")
+    parser.add_argument("--destino", default=ARTEFACTOS_DIR, help="Directorio de artefactos (por defecto KB_ARTEFACTOS)")
+    parser.add_argument("--forzar", action="store_true", help="Reconstruye todas las etapas aunque no haya cambios")
+    parser.add_argument("--alertas", action="store_true", help="Actualiza las líneas base de anomalías y envía las alertas nuevas")
+    args = parser.parse_args()
+
+    fuente = args.fuente or (args.api or "").rstrip("/")
+    if not fuente:
+        parser.error("Indica --api (o KB_API_URL) o --fuente.")
+    try:
+        manifiesto = construir(fuente, args.destino, forzar=args.forzar)
+    except (requests.exceptions.RequestException, OSError, RuntimeError) as e:
+        print(f"No se publicaron artefactos: {e}", file=sys.stderr)
+        return 1
+    print(f"Publicada la versión {manifiesto['version']} (datos {manifiesto['version_datos']}) en {args.destino}")
+    if args.alertas:
+        import anomalias
+        estado = anomalias.actualizar(cargar_vista(manifiesto, args.destino)[0])
+        print(f"Anomalías revisadas hasta {estado.ultimo_dia}: {len(estado.recientes)} alertas en los últimos "
+              f"{anomalias.DIAS_RECIENTES} días")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+import base64
+import functools
+import hashlib
+import io
+import os
+
+from PIL import Image, features
+
+# --- Rutas ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ASSETS_DIR = os.path.join(BASE_DIR, "assets")
+# Streamlit sirve el contenido de ./static en /app/static cuando server.enableStaticServing = true
+STATIC_DIR = os.path.join(BASE_DIR, "static", "generated")
+STATIC_URL = "app/static/generated"
+
+LOGO_PATH = os.path.join(ASSETS_DIR, "Logo.png")
+ANCHO_LOGO_PDF = 400  # ~33 mm a 300 ppp
+CALIDAD = {"WEBP": 80, "AVIF": 60, "JPEG": 82, "PNG": None}
+MIME = {"WEBP": "image/webp", "AVIF": "image/avif", "JPEG": "image/jpeg", "PNG": "image/png"}
+EXTENSION = {"WEBP": "webp", "AVIF": "avif", "JPEG": "jpg", "PNG": "png"}
+
+
+def _version(ruta):
+    """Clave de caché del archivo original: si cambia su fecha de modificación, se regenera."""
+    return os.stat(ruta).st_mtime_ns
+
+
+def soporta(formato):
+    return formato in ("JPEG", "PNG") or features.check(formato.lower())
+
+
+@functools.lru_cache(maxsize=64)
+def _codificar(ruta, version, ancho, formato):
+    """Redimensiona y codifica una imagen. El resultado queda en memoria del proceso."""
+    with Image.open(ruta) as img:
+        img.load()
+        if img.width > ancho:
+            img = img.resize((ancho, round(img.height * ancho / img.width)), Image.LANCZOS)
+        if formato == "JPEG" and img.mode != "RGB":
+            img = img.convert("RGB")
+        buffer = io.BytesIO()
+        opciones = {"optimize": True} if formato in ("PNG", "JPEG") else {}
+        if CALIDAD[formato] is not None:
+            opciones["quality"] = CALIDAD[formato]
+        img.save(buffer, format=formato, **opciones)
+    return buffer.getvalue()
+
+
+def _nombre_generado(ruta, version, ancho, formato):
+    huella = hashlib.sha1(f"{ruta}:{version}".encode("utf-8")).hexdigest()[:10]
+    base = os.path.splitext(os.path.basename(ruta))[0]
+    return f"{base}-{ancho}w-{huella}.{EXTENSION[formato]}"
+
+
+@functools.lru_cache(maxsize=64)
+def _publicar(ruta, version, ancho, formato):
+    """Escribe la versión optimizada en static/generated (una sola vez) y devuelve su ruta o None."""
+    nombre = _nombre_generado(ruta, version, ancho, formato)
+    destino = os.path.join(STATIC_DIR, nombre)
+    if not os.path.exists(destino):
+        try:
+            os.makedirs(STATIC_DIR, exist_ok=True)
+            tmp = destino + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(_codificar(ruta, version, ancho, formato))
+            os.replace(tmp, destino)
+        except OSError:
+            return None
+    return destino
+
+
+def imagen_optimizada(ruta, ancho, formato="WEBP"):
+    """Bytes de la versión redimensionada de `ruta` (cacheados por fecha de modificación)."""
+    return _codificar(ruta, _version(ruta), ancho, formato)
+
+
+def ruta_optimizada(ruta, ancho, formato="WEBP"):
+    """Ruta en disco de la versión optimizada (útil para st.image o para FPDF)."""
+    version = _version(ruta)
+    return _publicar(ruta, version, ancho, formato) or ruta
+
+
+def url_imagen(ruta, ancho, formato="WEBP"):
+    """
+    URL servida por el servidor estático de Streamlit. Si no se puede escribir en disco
+    se recurre a un data URI, pero ya con la imagen reducida.
+    """
+    if not os.path.exists(ruta):
+        return None
+    version = _version(ruta)
+    destino = _publicar(ruta, version, ancho, formato)
+    if destino:
+        return f"{STATIC_URL}/{os.path.basename(destino)}"
+    datos = base64.b64encode(_codificar(ruta, version, ancho, formato)).decode()
+    return f"data:{MIME[formato]};base64,{datos}"
+
+
+def etiqueta_picture(ruta, ancho, atributos_img=""):
+    """<picture> con AVIF cuando el servidor puede generarlo y WebP como respaldo."""
+    url_webp = url_imagen(ruta, ancho, "WEBP")
+    if not url_webp:
+        return ""
+    fuente_avif = ""
+    if soporta("AVIF"):
+        url_avif = url_imagen(ruta, ancho, "AVIF")
+        fuente_avif = f'<source srcset="{url_avif}" type="image/avif">'
+    return f'<picture>{fuente_avif}<img src="{url_webp}" {atributos_img}></picture>'
+
+
+def ruta_logo_pdf():
+    """Logo reducido en PNG (FPDF conserva la transparencia) compartido por todos los reportes."""
+    if not os.path.exists(LOGO_PATH):
+        return LOGO_PATH
+    return ruta_optimizada(LOGO_PATH, ANCHO_LOGO_PDF, "PNG")
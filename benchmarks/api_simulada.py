@@ -0,0 +1,69 @@
+"""
+API simulada que sirve los JSON de `datos_sinteticos.py` con las mismas rutas que la API real
+(`/clientes`, `/barberos`, `/servicios`, `/historial/citas`, `/sedes`).
+
+Uso:
+    python benchmarks/api_simulada.py --escala 10k --puerto 8080
+    KB_API_URL=http://localhost:8080 streamlit run inicio.py
+"""
+import argparse
+import os
+import shutil
+import sys
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import datos_sinteticos as ds  # noqa: E402
+
+
+def _manejador(directorio, latencia_ms):
+    class Manejador(SimpleHTTPRequestHandler):
+        def do_GET(self):
+            ruta = os.path.normpath(os.path.join(directorio, self.path.split("?")[0].strip("/") + ".json"))
+            if not ruta.startswith(directorio) or not os.path.isfile(ruta):
+                self.send_error(404, "Endpoint no encontrado")
+                return
+            if latencia_ms:
+                time.sleep(latencia_ms / 1000)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(os.path.getsize(ruta)))
+            self.end_headers()
+            with open(ruta, "rb") as f:
+                shutil.copyfileobj(f, self.wfile, 1024 * 1024)
+
+        def log_message(self, *args):
+            pass
+
+    return Manejador
+
+
+def iniciar(directorio, puerto=0, latencia_ms=0):
+    """Arranca la API en un hilo de fondo. Devuelve (servidor, url_base); detener con servidor.shutdown()."""
+    directorio = os.path.abspath(directorio)
+    servidor = ThreadingHTTPServer(("127.0.0.1", puerto), _manejador(directorio, latencia_ms))
+    threading.Thread(target=servidor.serve_forever, daemon=True, name="api-simulada").start()
+    return servidor, f"http://127.0.0.1:{servidor.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--escala", choices=list(ds.ESCALAS), default="10k")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--puerto", type=int, default=8080)
+    parser.add_argument("--latencia-ms", type=int, default=0, help="Retardo artificial por petición")
+    args = parser.parse_args()
+
+    servidor, url = iniciar(ds.asegurar(args.escala, args.semilla), args.puerto, args.latencia_ms)
+    print(f"API simulada ({args.escala}) en {url} — Ctrl+C para detener")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        servidor.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
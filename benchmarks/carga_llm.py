@@ -0,0 +1,125 @@
+"""
+Prueba de carga de la pasarela LLM contra un modelo falso local (sin red ni API key).
+
+El modelo simulado tarda `--latencia-ms` por respuesta y, como el servicio real, responde
+429 cuando recibe más de `--limite-servidor` solicitudes por segundo. Se lanzan `--sesiones`
+hilos ("gerentes") que piden `--solicitudes` análisis cada uno, una parte con prompts
+repetidos, y se compara llamar al modelo directamente contra pasar por la pasarela.
+
+Uso:
+    python benchmarks/carga_llm.py
+    python benchmarks/carga_llm.py --sesiones 40 --limite-servidor 5
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from llm_gateway import PasarelaLLM  # noqa: E402
+
+RESULTADOS_PATH = os.path.join(RAIZ, "benchmarks", "results", "carga_llm.json")
+
+
+class ErrorCuota(Exception):
+    """Imita google.api_core.exceptions.ResourceExhausted."""
+    code = 429
+
+
+class RespuestaSimulada:
+    def __init__(self, texto):
+        self.text = texto
+
+
+class ModeloSimulado:
+    """Modelo falso con latencia fija y límite de solicitudes por segundo del lado del 'servidor'."""
+
+    model_name = "models/simulado"
+
+    def __init__(self, latencia_ms, limite_por_seg):
+        self.latencia = latencia_ms / 1000
+        self.limite = limite_por_seg
+        self._recientes = deque()
+        self._lock = threading.Lock()
+        self.llamadas = 0
+
+    def generate_content(self, contenido, **kwargs):
+        with self._lock:
+            ahora = time.monotonic()
+            while self._recientes and ahora - self._recientes[0] > 1:
+                self._recientes.popleft()
+            self.llamadas += 1
+            if len(self._recientes) >= self.limite:
+                raise ErrorCuota("429 Resource has been exhausted (e.g. check quota).")
+            self._recientes.append(ahora)
+        time.sleep(self.latencia * random.uniform(0.8, 1.2))
+        return RespuestaSimulada(f"Análisis de: {str(contenido)[:40]}")
+
+
+def correr(llamar, sesiones, solicitudes, repetidos):
+    """Ejecuta la carga y devuelve éxitos, fallos y percentiles de latencia por solicitud."""
+    def sesion(i):
+        latencias, fallos = [], 0
+        for j in range(solicitudes):
+            prompt = "Resumen del mes por sede" if random.random() < repetidos else f"Pregunta {i}-{j}"
+            inicio = time.perf_counter()
+            try:
+                llamar(prompt)
+                latencias.append(time.perf_counter() - inicio)
+            except Exception:
+                fallos += 1
+        return latencias, fallos
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sesiones) as executor:
+        resultados = list(executor.map(sesion, range(sesiones)))
+    latencias = sorted(l for r, _ in resultados for l in r)
+    return {
+        "duracion_s": round(time.perf_counter() - inicio, 2),
+        "exitos": len(latencias),
+        "fallos": sum(f for _, f in resultados),
+        "p50_s": round(statistics.median(latencias), 2) if latencias else None,
+        "p95_s": round(latencias[int(len(latencias) * 0.95) - 1], 2) if latencias else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sesiones", type=int, default=20)
+    parser.add_argument("--solicitudes", type=int, default=3)
+    parser.add_argument("--repetidos", type=float, default=0.3, help="Fracción de prompts idénticos")
+    parser.add_argument("--latencia-ms", type=int, default=400)
+    parser.add_argument("--limite-servidor", type=int, default=8, help="Solicitudes por segundo que acepta el modelo")
+    args = parser.parse_args()
+
+    random.seed(0)
+    directo = ModeloSimulado(args.latencia_ms, args.limite_servidor)
+    sin_pasarela = correr(directo.generate_content, args.sesiones, args.solicitudes, args.repetidos)
+    sin_pasarela["llamadas_modelo"] = directo.llamadas
+
+    random.seed(0)
+    modelo = ModeloSimulado(args.latencia_ms, args.limite_servidor)
+    pasarela = PasarelaLLM(max_concurrentes=4, por_minuto=args.limite_servidor * 60 * 0.8, rafaga=args.limite_servidor // 2,
+                           espera_base=0.2, espera_max=2.0, plazo_cola=120)
+    con_pasarela = correr(lambda p: pasarela.generar(modelo, p), args.sesiones, args.solicitudes, args.repetidos)
+    con_pasarela.update(llamadas_modelo=modelo.llamadas, **pasarela.estado())
+
+    resultados = {"parametros": vars(args), "sin_pasarela": sin_pasarela, "con_pasarela": con_pasarela}
+    for nombre in ("sin_pasarela", "con_pasarela"):
+        print(f"{nombre:14s} {resultados[nombre]}")
+    os.makedirs(os.path.dirname(RESULTADOS_PATH), exist_ok=True)
+    with open(RESULTADOS_PATH, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, indent=2)
+    return 1 if con_pasarela["fallos"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
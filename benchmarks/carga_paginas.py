@@ -0,0 +1,313 @@
+"""
+Prueba de carga de las páginas: varios gerentes usando la app a la vez contra un servidor real.
+
+Se levanta `streamlit run inicio.py` apuntado a la API simulada (KB_API_URL) y a CSV de prueba
+para los datasets de datos.gov.co (KB_DATASETS_DIR), sin artefactos publicados. Cada gerente es
+un cliente websocket sin navegador que habla el mismo protocolo que el frontend: abre el
+Dashboard, la Gestión de Citas o los Datasets Reales y cambia al azar sus selectbox, radios y
+toggles (a veces salta de página). Se mide cuánto tarda cada rerun desde que se envía el cambio
+hasta que el servidor termina el script.
+
+Para cada nivel de concurrencia se informa p50/p95/p99 de los reruns, la CPU que consumió el
+servidor por segundo de prueba y su memoria residente pico (leídas de /proc, solo Linux). La
+capacidad es el nivel más alto cuyo p95 queda por debajo de `--objetivo-ms`.
+
+Uso:
+    python benchmarks/carga_paginas.py
+    python benchmarks/carga_paginas.py --escala 100k --niveles 1 8 32 --interacciones 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RAIZ = os.path.dirname(BENCH_DIR)
+sys.path[:0] = [RAIZ, BENCH_DIR]
+
+import datos_sinteticos as ds  # noqa: E402
+import api_simulada  # noqa: E402
+from streamlit.proto.BackMsg_pb2 import BackMsg  # noqa: E402
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg  # noqa: E402
+from streamlit.proto.WidgetStates_pb2 import WidgetState  # noqa: E402
+from tornado.websocket import websocket_connect  # noqa: E402
+
+RESULTADOS_PATH = os.path.join(RAIZ, "benchmarks", "results", "carga_paginas.json")
+GAZETTEER_PATH = os.path.join(RAIZ, "assets", "gazetteer_municipios.csv")
+
+PAGINAS = ["Dashboard", "Gestion_de_Citas", "Datasets_Reales"]
+WIDGETS = ("selectbox", "radio", "checkbox")   # botones y cajas de texto no se tocan
+PROB_CAMBIO_PAGINA = 0.15
+PLAZO_RERUN_SEG = 120
+
+
+# --- Datos de prueba ---
+def escribir_fixtures(destino, filas, semilla):
+    """CSV con los encabezados que esperan los esquemas de schema_resolver y municipios reales del gazetteer."""
+    rng = random.Random(semilla)
+    municipios = pd.read_csv(GAZETTEER_PATH, dtype=str)[["municipio", "departamento"]].values.tolist()
+    risaralda = [m for m in municipios if m[1] == "Risaralda"] or municipios
+    barrios = [f"Barrio {i}" for i in range(1, 41)]
+
+    def nombres(n):
+        return [f"Peluquería {rng.choice(['Estilo', 'Kingdom', 'Bella', 'Imperial', 'Urbana'])} {i}" for i in range(n)]
+
+    os.makedirs(destino, exist_ok=True)
+    muestra = [rng.choice(municipios) for _ in range(filas)]
+    pd.DataFrame({"Nombre del Establecimiento": nombres(filas), "Municipio Comercial": [m[0] for m in muestra],
+                  "Departamento": [m[1] for m in muestra]}).to_csv(os.path.join(destino, "nacional.csv"), index=False)
+    muestra = [rng.choice(risaralda) for _ in range(filas // 10)]
+    pd.DataFrame({"Razon Social": nombres(len(muestra)), "Municipio": [m[0] for m in muestra],
+                  "Departamento": [m[1] for m in muestra]}).to_csv(os.path.join(destino, "risaralda.csv"), index=False)
+    pd.DataFrame({"Nombre del Establecimiento": nombres(filas // 10),
+                  "Barrio": [rng.choice(barrios) for _ in range(filas // 10)],
+                  "Municipio": "Pereira"}).to_csv(os.path.join(destino, "local.csv"), index=False)
+    return destino
+
+
+# --- Servidor ---
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def levantar_servidor(puerto, entorno):
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", "inicio.py", "--server.headless", "true",
+         "--server.port", str(puerto), "--browser.gatherUsageStats", "false", "--server.runOnSave", "false"],
+        cwd=RAIZ, env=entorno, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    limite = time.monotonic() + 60
+    while time.monotonic() < limite:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{puerto}/_stcore/health", timeout=2):
+                return proceso
+        except OSError:
+            if proceso.poll() is not None:
+                break
+            time.sleep(0.2)
+    proceso.kill()
+    raise RuntimeError("El servidor de Streamlit no arrancó")
+
+
+def _cpu_seg(pid):
+    """Tiempo de CPU (usuario + sistema) consumido por el proceso, en segundos."""
+    with open(f"/proc/{pid}/stat") as f:
+        campos = f.read().rsplit(")", 1)[1].split()
+    return (int(campos[11]) + int(campos[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def _rss_mb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for linea in f:
+            if linea.startswith("VmRSS:"):
+                return int(linea.split()[1]) / 1024
+    return 0.0
+
+
+class MonitorMemoria(threading.Thread):
+    """Muestrea la memoria residente del servidor y conserva el pico."""
+
+    def __init__(self, pid, intervalo=0.05):
+        super().__init__(daemon=True)
+        self.pid, self.intervalo = pid, intervalo
+        self.pico_mb = _rss_mb(pid)
+        self._parar = threading.Event()
+
+    def run(self):
+        while not self._parar.wait(self.intervalo):
+            self.pico_mb = max(self.pico_mb, _rss_mb(self.pid))
+
+    def detener(self):
+        self._parar.set()
+        self.join()
+        return self.pico_mb
+
+
+# --- Cliente sin navegador ---
+class Gerente:
+    """Una sesión del navegador: guarda los widgets de la última corrida y los valores que eligió."""
+
+    def __init__(self, url, rng):
+        self.url, self.rng = url, rng
+        self.ws = None
+        self.pagina = None
+        self.widgets = {}     # id -> elemento (proto) visto en la última corrida
+        self.estados = {}     # id -> WidgetState que el "frontend" reenvía en cada rerun
+        self.errores = 0
+
+    async def conectar(self):
+        self.ws = await websocket_connect(self.url, max_message_size=1 << 30)
+
+    async def _correr(self, widget_states=()):
+        """Pide un rerun y espera a que termine; devuelve los segundos transcurridos."""
+        mensaje = BackMsg()
+        mensaje.rerun_script.page_name = self.pagina
+        mensaje.rerun_script.widget_states.widgets.extend(widget_states)
+        inicio = time.perf_counter()
+        await self.ws.write_message(mensaje.SerializeToString(), binary=True)
+        widgets = {}
+        while True:
+            crudo = await asyncio.wait_for(self.ws.read_message(), PLAZO_RERUN_SEG)
+            if crudo is None:
+                raise ConnectionError("El servidor cerró la conexión")
+            msg = ForwardMsg()
+            msg.ParseFromString(crudo)
+            tipo = msg.WhichOneof("type")
+            if tipo == "delta" and msg.delta.WhichOneof("type") == "new_element":
+                elemento = msg.delta.new_element
+                clase = elemento.WhichOneof("type")
+                if clase in WIDGETS and not getattr(elemento, clase).disabled:
+                    widgets[getattr(elemento, clase).id] = (clase, getattr(elemento, clase))
+                elif clase == "exception":
+                    self.errores += 1
+            elif tipo == "page_not_found":
+                self.errores += 1
+            elif tipo == "script_finished" and msg.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                self.widgets = widgets
+                return time.perf_counter() - inicio
+
+    async def abrir(self, pagina):
+        self.pagina, self.estados = pagina, {}
+        return await self._correr()
+
+    async def interactuar(self):
+        """Cambia un widget al azar (o salta de página) y devuelve la latencia del rerun."""
+        candidatos = [w for w in self.widgets.items() if w[1][0] != "selectbox" or len(w[1][1].options) > 1]
+        if not candidatos or self.rng.random() < PROB_CAMBIO_PAGINA:
+            return await self.abrir(self.rng.choice(PAGINAS))
+        id_widget, (clase, proto) = self.rng.choice(candidatos)
+        estado = WidgetState(id=id_widget)
+        if clase == "selectbox":
+            estado.string_value = self.rng.choice(list(proto.options))
+        elif clase == "radio":
+            estado.int_value = self.rng.randrange(len(proto.options))
+        else:
+            estado.bool_value = not proto.value
+        self.estados[id_widget] = estado
+        # Como el frontend, se reenvían los valores de todos los widgets que siguen en pantalla
+        return await self._correr([e for i, e in self.estados.items() if i in self.widgets])
+
+    def cerrar(self):
+        if self.ws is not None:
+            self.ws.close()
+
+
+async def _sesion(url, interacciones, semilla):
+    gerente = Gerente(url, random.Random(semilla))
+    latencias = []
+    try:
+        await gerente.conectar()
+        latencias.append(await gerente.abrir(gerente.rng.choice(PAGINAS)))
+        for _ in range(interacciones):
+            latencias.append(await gerente.interactuar())
+    except (ConnectionError, asyncio.TimeoutError, OSError):
+        gerente.errores += 1
+    finally:
+        gerente.cerrar()
+    return latencias, gerente.errores
+
+
+def _percentil(ordenadas, p):
+    return round(ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * p))] * 1000, 1) if ordenadas else None
+
+
+def medir_nivel(url, pid, concurrencia, interacciones, semilla):
+    """Corre `concurrencia` gerentes a la vez y resume latencias, CPU y memoria del servidor."""
+    monitor = MonitorMemoria(pid)
+    monitor.start()
+    cpu_inicio, inicio = _cpu_seg(pid), time.perf_counter()
+
+    async def todos():
+        return await asyncio.gather(*(_sesion(url, interacciones, semilla * 1000 + i) for i in range(concurrencia)))
+
+    resultados = asyncio.run(todos())
+    duracion = time.perf_counter() - inicio
+    cpu = _cpu_seg(pid) - cpu_inicio
+    latencias = sorted(l for r, _ in resultados for l in r)
+    return {
+        "concurrencia": concurrencia,
+        "reruns": len(latencias),
+        "errores": sum(e for _, e in resultados),
+        "duracion_s": round(duracion, 2),
+        "reruns_por_s": round(len(latencias) / duracion, 2),
+        "p50_ms": round(statistics.median(latencias) * 1000, 1) if latencias else None,
+        "p95_ms": _percentil(latencias, 0.95),
+        "p99_ms": _percentil(latencias, 0.99),
+        "cpu_s": round(cpu, 2),
+        "cpu_nucleos": round(cpu / duracion, 2),
+        "rss_pico_mb": round(monitor.detener(), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--escala", default="10k", choices=list(ds.ESCALAS))
+    parser.add_argument("--niveles", type=int, nargs="+", default=[1, 4, 8, 16], help="Gerentes simultáneos")
+    parser.add_argument("--interacciones", type=int, default=10, help="Cambios de filtro por gerente")
+    parser.add_argument("--objetivo-ms", type=float, default=2000, help="p95 máximo aceptable por rerun")
+    parser.add_argument("--filas-datasets", type=int, default=20_000, help="Filas del CSV nacional de prueba")
+    parser.add_argument("--latencia-api-ms", type=int, default=0)
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args()
+
+    servidor_api, url_api = api_simulada.iniciar(ds.asegurar(args.escala), latencia_ms=args.latencia_api_ms)
+    temporal = tempfile.mkdtemp(prefix="kb_carga_")
+    entorno = dict(os.environ, KB_API_URL=url_api,
+                   KB_ARTEFACTOS=os.path.join(temporal, "artefactos"),
+                   KB_ANOMALIAS_DIR=os.path.join(temporal, "anomalias"),
+                   KB_DATASETS_DIR=escribir_fixtures(os.path.join(temporal, "datasets"), args.filas_datasets, args.semilla))
+    puerto = _puerto_libre()
+    servidor = levantar_servidor(puerto, entorno)
+    url = f"ws://127.0.0.1:{puerto}/_stcore/stream"
+    try:
+        # Calentamiento: cada página una vez, para no medir la primera descarga de la API dentro de un nivel
+        inicio = time.perf_counter()
+
+        async def calentar():
+            for pagina in PAGINAS:
+                gerente = Gerente(url, random.Random(args.semilla))
+                await gerente.conectar()
+                await gerente.abrir(pagina)
+                gerente.cerrar()
+        asyncio.run(calentar())
+        arranque_s = round(time.perf_counter() - inicio, 2)
+        print(f"calentamiento {arranque_s} s  rss {_rss_mb(servidor.pid):.0f} MB")
+
+        niveles = []
+        for concurrencia in args.niveles:
+            nivel = medir_nivel(url, servidor.pid, concurrencia, args.interacciones, args.semilla)
+            niveles.append(nivel)
+            print(f"{concurrencia:4d} gerentes  p50 {nivel['p50_ms']} ms  p95 {nivel['p95_ms']} ms  "
+                  f"p99 {nivel['p99_ms']} ms  cpu {nivel['cpu_nucleos']} núcleos  rss {nivel['rss_pico_mb']} MB  "
+                  f"errores {nivel['errores']}")
+    finally:
+        servidor.terminate()
+        servidor.wait()
+        servidor_api.shutdown()
+
+    aceptables = [n["concurrencia"] for n in niveles if n["p95_ms"] is not None and n["p95_ms"] <= args.objetivo_ms
+                  and not n["errores"]]
+    capacidad = max(aceptables, default=0)
+    print(f"capacidad: {capacidad} gerentes con p95 <= {args.objetivo_ms:.0f} ms")
+
+    resultados = {"parametros": vars(args), "calentamiento_s": arranque_s, "niveles": niveles, "capacidad": capacidad}
+    os.makedirs(os.path.dirname(RESULTADOS_PATH), exist_ok=True)
+    with open(RESULTADOS_PATH, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, indent=2, ensure_ascii=False)
+    return 0 if all(not n["errores"] for n in niveles) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+"""
+Generador de datos sintéticos de Kingdom Barber con la misma forma JSON que devuelve la API.
+
+Escribe un archivo por endpoint (clientes, barberos, servicios, historial/citas, sedes) en
+`benchmarks/data/<escala>/`. Los datos son deterministas para una misma escala y semilla, y
+se escriben por bloques, así que incluso 10M de citas se generan sin tenerlas todas en memoria.
+
+Uso:
+    python benchmarks/datos_sinteticos.py --escala 100k
+    python benchmarks/datos_sinteticos.py --citas 250000 --semilla 7
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(RAIZ, "benchmarks", "data")
+
+ESCALAS = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1M": 1_000_000, "10M": 10_000_000}
+TAMANO_BLOQUE = 250_000
+
+NOMBRES = ["Juan", "Andrés", "Alejandro", "Carlos", "Santiago", "Mateo", "Sebastián", "Valentina", "Camila",
+           "Daniela", "Laura", "Sofía", "Miguel", "Felipe", "David", "Julián", "Mariana", "Isabella", "Tomás", "Samuel"]
+APELLIDOS = ["Rivera", "Vallejo", "Urrego", "Gómez", "Rodríguez", "López", "Martínez", "García", "Hernández",
+             "Ramírez", "Torres", "Castro", "Ospina", "Cardona", "Restrepo", "Giraldo", "Montoya", "Zapata"]
+SERVICIOS = [("Corte Clásico", 25000, 30), ("Corte + Barba", 40000, 45), ("Afeitado con Toalla Caliente", 30000, 30),
+             ("Perfilado de Barba", 18000, 20), ("Corte Infantil", 20000, 25), ("Fade Premium", 35000, 40),
+             ("Diseño de Cejas", 12000, 15), ("Tinte de Cabello", 60000, 60), ("Mascarilla Facial", 28000, 25),
+             ("Keratina", 90000, 90), ("Corte Dama", 45000, 50), ("Tratamiento Capilar", 55000, 45)]
+UBICACIONES = [("Pereira", "Pereira", "Centro"), ("Pereira", "Pereira", "Cuba"), ("Pereira", "Dosquebradas", "La Pradera"),
+               ("Medellín", "Medellín", "El Poblado"), ("Medellín", "Envigado", "Zúñiga"), ("Bogotá", "Bogotá", "Chapinero"),
+               ("Bogotá", "Bogotá", "Usaquén"), ("Cali", "Cali", "Granada"), ("Manizales", "Manizales", "Cable"),
+               ("Armenia", "Armenia", "Centro")]
+HORAS = [f"{h:02d}:{m:02d}:00" for h in range(8, 20) for m in (0, 30)]
+
+
+def dimensiones(citas):
+    """Tamaño de las tablas de referencia para un número de citas (la cadena crece con las citas)."""
+    return {
+        "clientes": max(50, citas // 5),
+        "barberos": max(8, citas // 2_000),
+        "sedes": int(np.clip(citas // 100_000, 3, 200)),
+        "servicios": len(SERVICIOS),
+    }
+
+
+def _escribir_json(ruta, bloques):
+    """Escribe una lista JSON a partir de DataFrames sucesivos sin materializarla completa."""
+    with open(ruta, "w", encoding="utf-8") as f:
+        f.write("[")
+        primero = True
+        for bloque in bloques:
+            if bloque.empty:
+                continue
+            registros = bloque.to_json(orient="records", force_ascii=False)[1:-1]
+            f.write(registros if primero else "," + registros)
+            primero = False
+        f.write("]")
+
+
+def _nombres(rng, n):
+    return np.array(NOMBRES)[rng.integers(0, len(NOMBRES), n)], np.array(APELLIDOS)[rng.integers(0, len(APELLIDOS), n)]
+
+
+def generar(citas, destino, semilla=42):
+    """Genera los cinco endpoints en `destino` y devuelve las dimensiones usadas."""
+    os.makedirs(os.path.join(destino, "historial"), exist_ok=True)
+    rng = np.random.default_rng(semilla)
+    dims = dimensiones(citas)
+
+    # Sedes
+    n = dims["sedes"]
+    ubic = [UBICACIONES[i % len(UBICACIONES)] for i in range(n)]
+    sedes = pd.DataFrame({
+        "id": np.arange(1, n + 1),
+        "nombreSede": [f"Sede {u[0]} {u[2]}" + (f" {i // len(UBICACIONES) + 1}" if i >= len(UBICACIONES) else "") for i, u in enumerate(ubic)],
+        "ciudad": [u[0] for u in ubic], "municipio": [u[1] for u in ubic], "barrio": [u[2] for u in ubic],
+        "direccion": [f"Calle {rng.integers(1, 120)} # {rng.integers(1, 80)}-{rng.integers(1, 99)}" for _ in range(n)],
+    })
+    _escribir_json(os.path.join(destino, "sedes.json"), [sedes])
+
+    # Servicios
+    servicios = pd.DataFrame(SERVICIOS, columns=["nombreServicio", "precio", "duracionMin"])
+    servicios.insert(0, "id", np.arange(1, len(servicios) + 1))
+    _escribir_json(os.path.join(destino, "servicios.json"), [servicios])
+
+    # Barberos (la API anida la sede como objeto)
+    n = dims["barberos"]
+    nombres, apellidos = _nombres(rng, n)
+    id_sede_barbero = rng.integers(1, dims["sedes"] + 1, n)
+    barberos = pd.DataFrame({
+        "id": np.arange(1, n + 1), "nombreBarbero": nombres, "apellidoBarbero": apellidos,
+        "sede": [{"id": int(s), "nombreSede": sedes.at[s - 1, "nombreSede"]} for s in id_sede_barbero],
+    })
+    _escribir_json(os.path.join(destino, "barberos.json"), [barberos])
+
+    # Clientes
+    def bloques_clientes():
+        total = dims["clientes"]
+        for inicio in range(0, total, TAMANO_BLOQUE):
+            ids = np.arange(inicio + 1, min(inicio + TAMANO_BLOQUE, total) + 1)
+            nombres, apellidos = _nombres(rng, len(ids))
+            yield pd.DataFrame({
+                "id": ids, "nombreCliente": nombres, "apellidoCliente": apellidos,
+                "telefono": (3_000_000_000 + rng.integers(0, 99_999_999, len(ids))).astype(str),
+                "email": [f"cliente{i}@correo.com" for i in ids],
+            })
+    _escribir_json(os.path.join(destino, "clientes.json"), bloques_clientes())
+
+    # Citas: el barbero determina la sede, igual que en la operación real
+    hoy = np.datetime64("today", "D")
+    def bloques_citas():
+        for inicio in range(0, citas, TAMANO_BLOQUE):
+            m = min(TAMANO_BLOQUE, citas - inicio)
+            barbero = rng.integers(1, dims["barberos"] + 1, m)
+            yield pd.DataFrame({
+                "id": np.arange(inicio + 1, inicio + m + 1),
+                "idCliente": rng.integers(1, dims["clientes"] + 1, m),
+                "idBarbero": barbero,
+                "idServicio": rng.integers(1, dims["servicios"] + 1, m),
+                "idSede": id_sede_barbero[barbero - 1],
+                "fecha": np.datetime_as_string(hoy - rng.integers(0, 730, m).astype("timedelta64[D]")),
+                "hora": np.array(HORAS)[rng.integers(0, len(HORAS), m)],
+            })
+    _escribir_json(os.path.join(destino, "historial", "citas.json"), bloques_citas())
+
+    dims["citas"] = citas
+    with open(os.path.join(destino, "dimensiones.json"), "w", encoding="utf-8") as f:
+        json.dump({**dims, "semilla": semilla}, f, indent=2)
+    return dims
+
+
+def asegurar(escala, semilla=42):
+    """Devuelve el directorio de la escala, generándolo solo si no existe para esa semilla."""
+    destino = os.path.join(DATA_DIR, f"{escala}-s{semilla}")
+    if not os.path.exists(os.path.join(destino, "dimensiones.json")):
+        generar(ESCALAS[escala], destino, semilla)
+    return destino
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    grupo = parser.add_mutually_exclusive_group(required=True)
+    grupo.add_argument("--escala", choices=list(ESCALAS))
+    grupo.add_argument("--citas", type=int)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--destino", help="Directorio de salida (por defecto benchmarks/data/<escala>-s<semilla>)")
+    args = parser.parse_args()
+
+    citas = ESCALAS[args.escala] if args.escala else args.citas
+    destino = args.destino or os.path.join(DATA_DIR, f"{args.escala or citas}-s{args.semilla}")
+    dims = generar(citas, destino, args.semilla)
+    print(f"Datos generados en {destino}: {dims}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
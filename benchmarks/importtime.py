@@ -0,0 +1,136 @@
+"""
+Mide el costo de arranque en frío (importaciones de nivel superior) de cada página.
+
+Para cada punto de entrada se extraen con `ast` las importaciones que se ejecutan al cargar
+el script (las que están dentro de funciones no cuentan, por eso las diferidas no suman) y
+se importan en un proceso nuevo con `python -X importtime`.
+
+Uso:
+    python benchmarks/importtime.py                  # mide y guarda benchmarks/results/importtime.json
+    python benchmarks/importtime.py --guardar-base   # además la guarda como línea base
+    python benchmarks/importtime.py --comparar       # falla (código 1) si alguna página empeoró
+"""
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTADOS_DIR = os.path.join(RAIZ, "benchmarks", "results")
+RESULTADOS_PATH = os.path.join(RESULTADOS_DIR, "importtime.json")
+BASE_PATH = os.path.join(RESULTADOS_DIR, "importtime_base.json")
+
+PUNTOS_DE_ENTRADA = [
+    "inicio.py",
+    "pages/1_Dashboard.py",
+    "pages/2_Gestion_de_Citas.py",
+    "pages/3_Asistente_IA.py",
+    "pages/4_Datasets_Reales.py",
+]
+TOLERANCIA_RELATIVA = 0.25
+TOLERANCIA_ABSOLUTA_MS = 30.0
+
+
+def importaciones_de_nivel_superior(ruta):
+    """Módulos importados siempre al ejecutar el script (sin entrar en funciones, clases ni condicionales)."""
+    with open(os.path.join(RAIZ, ruta), encoding="utf-8") as f:
+        arbol = ast.parse(f.read())
+
+    modulos, pendientes = [], list(arbol.body)
+    while pendientes:
+        nodo = pendientes.pop(0)
+        if isinstance(nodo, ast.Import):
+            modulos.extend(alias.name for alias in nodo.names)
+        elif isinstance(nodo, ast.ImportFrom) and nodo.module and nodo.level == 0:
+            modulos.append(nodo.module)
+        elif isinstance(nodo, (ast.With, ast.AsyncWith)):
+            # `with st.sidebar:` / `with tab:` se ejecutan siempre al cargar la página
+            pendientes.extend(nodo.body)
+        elif isinstance(nodo, ast.Try):
+            pendientes.extend(nodo.body + nodo.finalbody)
+        # Funciones, clases y bloques condicionales (if/for/while) no cuentan para el arranque
+    return list(dict.fromkeys(modulos))
+
+
+def _parsear_importtime(stderr):
+    """Suma el tiempo acumulado de las importaciones de primer nivel (en ms)."""
+    por_modulo = {}
+    for linea in stderr.splitlines():
+        if not linea.startswith("import time:") or "cumulative" in linea:
+            continue
+        _, acumulado, nombre = linea[len("import time:"):].split("|")
+        if nombre.startswith("  "):  # Importación anidada: ya está incluida en su padre
+            continue
+        por_modulo[nombre.strip()] = int(acumulado) / 1000
+    return sum(por_modulo.values()), por_modulo
+
+
+def medir(modulos, repeticiones):
+    """Importa `modulos` en un intérprete nuevo `repeticiones` veces y devuelve la mediana."""
+    codigo = "\n".join(
+        f"try:\n    import {m}\nexcept Exception as e:\n    print('{m}', type(e).__name__, file=sys.stdout)"
+        for m in modulos
+    )
+    totales, detalle, errores = [], {}, ""
+    for _ in range(repeticiones):
+        proceso = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import sys\n" + codigo],
+            cwd=RAIZ, capture_output=True, text=True,
+        )
+        total, detalle = _parsear_importtime(proceso.stderr)
+        totales.append(total)
+        errores = proceso.stdout.strip()
+    mas_pesados = dict(sorted(detalle.items(), key=lambda x: x[1], reverse=True)[:5])
+    return {"total_ms": round(statistics.median(totales), 1), "mas_pesados_ms": mas_pesados, "errores": errores}
+
+
+def comparar(actual, base):
+    regresiones = []
+    for pagina, datos in actual.items():
+        if pagina not in base:
+            continue
+        antes, ahora = base[pagina]["total_ms"], datos["total_ms"]
+        if ahora - antes > TOLERANCIA_ABSOLUTA_MS and ahora > antes * (1 + TOLERANCIA_RELATIVA):
+            regresiones.append(f"{pagina}: {antes:.0f} ms -> {ahora:.0f} ms")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--guardar-base", action="store_true")
+    parser.add_argument("--comparar", action="store_true")
+    args = parser.parse_args()
+
+    resultados = {}
+    for pagina in PUNTOS_DE_ENTRADA:
+        modulos = importaciones_de_nivel_superior(pagina)
+        resultados[pagina] = {"modulos": modulos, **medir(modulos, args.repeticiones)}
+        print(f"{pagina:32s} {resultados[pagina]['total_ms']:8.1f} ms  {resultados[pagina]['mas_pesados_ms']}")
+        if resultados[pagina]["errores"]:
+            print(f"  ⚠️ importaciones fallidas: {resultados[pagina]['errores']}")
+
+    os.makedirs(RESULTADOS_DIR, exist_ok=True)
+    with open(RESULTADOS_PATH, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, indent=2)
+    if args.guardar_base:
+        with open(BASE_PATH, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2)
+
+    if args.comparar:
+        if not os.path.exists(BASE_PATH):
+            print("No hay línea base; ejecuta primero con --guardar-base.")
+            return 1
+        with open(BASE_PATH, encoding="utf-8") as f:
+            regresiones = comparar(resultados, json.load(f))
+        for r in regresiones:
+            print(f"❌ Regresión de arranque: {r}")
+        return 1 if regresiones else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,272 @@
+"""
+Benchmark de la ruta de datos: latencia y memoria pico de cada etapa contra la API simulada.
+
+Para cada escala se generan (una sola vez) los datos sintéticos, se levanta la API simulada,
+se apunta `data_manager` a ella con KB_API_URL y se miden:
+
+    cargar_api        dm.cargar_datos_completos_api() con la caché de st.cache_data vacía
+    vista_citas       dm.obtener_vista_citas_completa() con la caché vacía (descarga + merges)
+    vista_citas_cache dm.obtener_vista_citas_completa() con las respuestas ya cacheadas
+    filtros_dashboard cadena sede -> barbero -> cliente de pages/1_Dashboard.py
+    filtros_gestion   cadena sede -> barbero -> rango de fechas de pages/2_Gestion_de_Citas.py
+    agregaciones      KPIs y series de tiempo del Dashboard
+    agenda_indice     agenda.IndiceAgenda() sobre la vista (intervalos ocupados por barbero)
+    agenda_huecos     huecos libres de 30 min en la primera sede para hoy
+    pronostico        pronostico.Pronosticos(): Holt-Winters para el total y cada sede/barbero/servicio
+    cohortes          cohortes.Cohortes(): retención y valor de vida por cohorte, total y por sede
+    anomalias         anomalias.actualizar() desde cero: líneas base EWMA de toda la historia
+    etl_artefactos    artefactos.construir(--forzar): todas las etapas del ETL desde los JSON locales
+    vista_artefactos  lectura de la vista ya publicada por el ETL (lo que hacen las páginas con artefactos)
+    pdf_reporte       report_generator.generar_pdf_reporte() sobre la vista filtrada
+
+La latencia es la mediana de `--repeticiones` corridas; la memoria pico se mide con
+tracemalloc en una corrida aparte para no distorsionar los tiempos.
+
+Uso:
+    python benchmarks/ruta_datos.py                         # escalas 1k, 10k y 100k
+    python benchmarks/ruta_datos.py --escalas 1M 10M --repeticiones 1
+    python benchmarks/ruta_datos.py --guardar-base
+    python benchmarks/ruta_datos.py --comparar              # falla (código 1) si alguna etapa empeoró
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RAIZ = os.path.dirname(BENCH_DIR)
+sys.path[:0] = [RAIZ, BENCH_DIR]
+# Las etapas de la API miden la ruta sin artefactos aunque haya un ETL publicado en .cache/artefactos
+os.environ["KB_ARTEFACTOS"] = tempfile.mkdtemp(prefix="kb_artefactos_")
+os.environ["KB_ANOMALIAS_DIR"] = tempfile.mkdtemp(prefix="kb_anomalias_")
+
+import datos_sinteticos as ds  # noqa: E402
+import api_simulada  # noqa: E402
+
+RESULTADOS_DIR = os.path.join(RAIZ, "benchmarks", "results")
+RESULTADOS_PATH = os.path.join(RESULTADOS_DIR, "ruta_datos.json")
+BASE_PATH = os.path.join(RESULTADOS_DIR, "ruta_datos_base.json")
+
+TOLERANCIA_RELATIVA = 0.25
+TOLERANCIA_ABSOLUTA_MS = 20.0
+ANALISIS_FIJO = "Resumen Ejecutivo\nTexto de prueba del benchmark. " * 20
+
+
+# --- Etapas ---
+def _filtros_dashboard(df_vista, df_sedes):
+    sede = df_sedes['Nombre_Sede'].iloc[0]
+    df = df_vista[df_vista['Nombre_Sede'] == sede]
+    barberos = sorted(df['Nombre_Completo_Barbero'].dropna().unique().tolist())
+    df = df[df['Nombre_Completo_Barbero'] == barberos[0]] if barberos else df
+    clientes = sorted(df['Nombre_Completo_Cliente'].dropna().unique().tolist())
+    return df.copy(), len(clientes)
+
+
+def _filtros_gestion(df_vista, df_sedes):
+    df = df_vista.copy()
+    df = df[df['Nombre_Sede'] == df_sedes['Nombre_Sede'].iloc[0]]
+    barberos = sorted(list(df['Nombre_Completo_Barbero'].dropna().unique()))
+    if barberos:
+        df = df[df['Nombre_Completo_Barbero'] == barberos[0]]
+    df = df.dropna(subset=['Fecha'])
+    fin = df['Fecha'].max().date()
+    inicio = (df['Fecha'].max() - pd.Timedelta(days=90)).date()
+    return df[(df['Fecha'].dt.date >= inicio) & (df['Fecha'].dt.date <= fin)]
+
+
+def _agregaciones(df_vista):
+    df = df_vista.dropna(subset=['ID_Cita'])
+    resultado = {
+        "ingresos": df['Precio'].sum(),
+        "servicio_popular": df['Nombre_Servicio'].mode().iloc[0],
+        "ingresos_servicio": df.groupby('Nombre_Servicio')['Precio'].sum(),
+        "ingresos_barbero": df.groupby('Nombre_Completo_Barbero')['Precio'].sum(),
+        "citas_barbero": df['Nombre_Completo_Barbero'].value_counts(),
+    }
+    fechas = df.set_index('Fecha')
+    for regla in ("D", "W-Mon", "M"):
+        resultado[regla] = fechas.resample(regla).size()
+    return resultado
+
+
+def etapas(dm, generar_pdf_reporte):
+    """Lista ordenada de (nombre, función(estado) -> resultado). `estado` guarda salidas previas."""
+    def limpiar_y(funcion):
+        def ejecutar(estado):
+            dm.obtener_datos_api.clear()
+            return funcion()
+        return ejecutar
+
+    def vista_cache(estado):
+        estado["vista"] = dm.obtener_vista_citas_completa()
+        return estado["vista"]
+
+    def filtros_gestion(estado):
+        estado["filtrado"] = _filtros_gestion(*estado["vista"])
+        return estado["filtrado"]
+
+    def agenda_indice(estado):
+        import agenda
+        estado["agenda"] = agenda.IndiceAgenda(estado["vista"][0])
+        return estado["agenda"]
+
+    def agenda_huecos(estado):
+        return estado["agenda"].huecos_libres(estado["vista"][1]['Nombre_Sede'].iloc[0], pd.Timestamp.now().date(), 30)
+
+    def ajustar_pronosticos(estado):
+        import pronostico
+        return pronostico.Pronosticos(estado["vista"][0]).claves
+
+    def calcular_cohortes(estado):
+        import cohortes
+        return cohortes.Cohortes(estado["vista"][0]).resumen()
+
+    def revisar_anomalias(estado):
+        import anomalias
+        # Directorio nuevo en cada corrida: se mide el recorrido completo, no una actualización vacía
+        directorio = tempfile.mkdtemp(prefix="kb_anomalias_")
+        return anomalias.actualizar(estado["vista"][0], directorio, outbox=os.path.join(directorio, "outbox.jsonl")).recientes
+
+    def etl(estado):
+        import artefactos
+        # Directorio propio: lo publicado aquí no debe alimentar las etapas de la API de la siguiente escala
+        estado.setdefault("artefactos", tempfile.mkdtemp(prefix="kb_etl_"))
+        estado["manifiesto"] = artefactos.construir(estado["fuente"], estado["artefactos"], forzar=True, informar=lambda texto: None)
+        return estado["manifiesto"]
+
+    def vista_artefactos(estado):
+        import artefactos
+        return artefactos.cargar_vista(estado["manifiesto"], estado["artefactos"])
+
+    def pdf(estado):
+        return generar_pdf_reporte(estado["filtrado"], ANALISIS_FIJO, {"sede": "Benchmark", "rango_fechas": "Últimos 90 días"})
+
+    return [
+        ("cargar_api", limpiar_y(dm.cargar_datos_completos_api)),
+        ("vista_citas", limpiar_y(dm.obtener_vista_citas_completa)),
+        ("vista_citas_cache", vista_cache),
+        ("filtros_dashboard", lambda estado: _filtros_dashboard(*estado["vista"])),
+        ("filtros_gestion", filtros_gestion),
+        ("agregaciones", lambda estado: _agregaciones(estado["vista"][0])),
+        ("agenda_indice", agenda_indice),
+        ("agenda_huecos", agenda_huecos),
+        ("pronostico", ajustar_pronosticos),
+        ("cohortes", calcular_cohortes),
+        ("anomalias", revisar_anomalias),
+        ("etl_artefactos", etl),
+        ("vista_artefactos", vista_artefactos),
+        ("pdf_reporte", pdf),
+    ]
+
+
+def _filas(resultado):
+    primero = resultado[0] if isinstance(resultado, tuple) else resultado
+    return len(primero) if hasattr(primero, "__len__") and not isinstance(primero, (dict, bytes, bytearray)) else None
+
+
+def medir_escala(escala, repeticiones, semilla):
+    fuente = ds.asegurar(escala, semilla)
+    servidor, url = api_simulada.iniciar(fuente)
+    os.environ["KB_API_URL"] = url
+    import data_manager as dm
+    from report_generator import generar_pdf_reporte
+    from streamlit import config
+    from streamlit.logger import set_log_level
+    dm.API_URL = url  # data_manager lee la URL al importarse; se actualiza para cada escala
+    config.get_config_options()  # cargar la configuración primero: al cargarse restablece el nivel de log
+    set_log_level("error")  # Fuera de `streamlit run`, st.cache_data avisa en cada llamada que no hay ScriptRunContext
+
+    resultados = {}
+    try:
+        estado = {"fuente": fuente}
+        for nombre, funcion in etapas(dm, generar_pdf_reporte):
+            try:
+                tiempos = []
+                for _ in range(repeticiones):
+                    inicio = time.perf_counter()
+                    salida = funcion(estado)
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+                tracemalloc.start()
+                funcion(estado)
+                _, pico = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                resultados[nombre] = {"mediana_ms": round(statistics.median(tiempos), 1), "pico_mb": round(pico / 1024 ** 2, 1), "filas": _filas(salida)}
+            except Exception as e:  # MemoryError incluido: ahí es donde la cadena "se rompe"
+                tracemalloc.stop()
+                resultados[nombre] = {"error": f"{type(e).__name__}: {e}"}
+                break
+            print(f"  {nombre:18s} {resultados[nombre]['mediana_ms']:10.1f} ms {resultados[nombre]['pico_mb']:8.1f} MB")
+    finally:
+        servidor.shutdown()
+        dm.obtener_datos_api.clear()
+    return resultados
+
+
+def comparar(actual, base):
+    regresiones = []
+    for escala, etapas_actuales in actual.items():
+        for etapa, datos in etapas_actuales.items():
+            antes = base.get(escala, {}).get(etapa, {})
+            if "mediana_ms" not in antes:
+                continue
+            if "error" in datos:
+                regresiones.append(f"{escala}/{etapa}: ahora falla ({datos['error']})")
+                continue
+            a, b = antes["mediana_ms"], datos["mediana_ms"]
+            if b - a > TOLERANCIA_ABSOLUTA_MS and b > a * (1 + TOLERANCIA_RELATIVA):
+                regresiones.append(f"{escala}/{etapa}: {a:.0f} ms -> {b:.0f} ms")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--escalas", nargs="+", choices=list(ds.ESCALAS), default=["1k", "10k", "100k"])
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--guardar-base", action="store_true")
+    parser.add_argument("--comparar", action="store_true")
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore", FutureWarning)  # resample('M') replica tal cual al Dashboard
+
+    resultados = {}
+    if os.path.exists(RESULTADOS_PATH):
+        with open(RESULTADOS_PATH, encoding="utf-8") as f:
+            resultados = json.load(f)
+    actuales = {}
+    for escala in args.escalas:
+        print(f"Escala {escala} ({ds.ESCALAS[escala]:,} citas)")
+        actuales[escala] = medir_escala(escala, args.repeticiones, args.semilla)
+        for etapa, datos in actuales[escala].items():
+            if "error" in datos:
+                print(f"  ❌ {etapa}: {datos['error']}")
+    resultados.update(actuales)
+
+    os.makedirs(RESULTADOS_DIR, exist_ok=True)
+    with open(RESULTADOS_PATH, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, indent=2)
+    if args.guardar_base:
+        with open(BASE_PATH, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2)
+
+    if args.comparar:
+        if not os.path.exists(BASE_PATH):
+            print("No hay línea base; ejecuta primero con --guardar-base.")
+            return 1
+        with open(BASE_PATH, encoding="utf-8") as f:
+            regresiones = comparar(actuales, json.load(f))
+        for r in regresiones:
+            print(f"❌ Regresión en la ruta de datos: {r}")
+        return 1 if regresiones else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
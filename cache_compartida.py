@@ -0,0 +1,277 @@
+import contextlib
+import functools
+import hashlib
+import io
+import os
+import pickle
+import struct
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import instrumentation as perf
+
+# --- Configuración ---
+# KB_CACHE elige dónde comparten resultados las réplicas de la app:
+#   ""                      desactivada: solo las cachés de Streamlit de cada proceso (como siempre)
+#   "memoria"               un solo proceso (útil en pruebas)
+#   "disco" o "disco:/ruta" réplicas en la misma máquina
+#   "redis://host:6379/0"   cualquier servidor compatible con el protocolo de Redis (requiere `redis`)
+BACKEND = os.environ.get("KB_CACHE", "")
+TTL_SEG = int(os.environ.get("KB_CACHE_TTL", 600))
+DISCO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "compartida")
+PREFIJO = "kb:"
+ESPERA_BLOQUEO_SEG = 120      # lo máximo que una réplica espera a que otra termine el mismo cálculo
+EXPIRA_BLOQUEO_SEG = 300      # un bloqueo más viejo que esto es de un proceso que murió
+SONDEO_SEG = 0.05
+MAX_DECODIFICADOS = 8         # valores ya deserializados que cada proceso conserva
+
+
+class SerializacionNoSegura(ValueError):
+    """El valor solo se podría guardar con pickle y el backend no lo admite: se usa sin compartirlo."""
+
+
+class CacheMemoria:
+    """Diccionario del proceso con expiración; los bloqueos son candados de hilo por clave."""
+
+    admite_pickle = True
+
+    def __init__(self):
+        self._datos = {}
+        self._candados = {}
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+        if entrada is None or entrada[0] < time.time():
+            return None
+        return entrada[1]
+
+    def guardar(self, clave, datos, ttl):
+        with self._lock:
+            self._datos[clave] = (time.time() + ttl, datos)
+
+    @contextlib.contextmanager
+    def bloqueo(self, clave):
+        with self._lock:
+            candado = self._candados.setdefault(clave, threading.Lock())
+        obtenido = candado.acquire(timeout=ESPERA_BLOQUEO_SEG)
+        try:
+            yield obtenido
+        finally:
+            if obtenido:
+                candado.release()
+
+
+class CacheDisco:
+    """
+    Un archivo por clave con la hora de expiración en la cabecera, escrito con tmp + os.replace.
+    El bloqueo entre procesos es un archivo creado con O_EXCL (funciona igual en Windows y Linux).
+    Admite pickle porque el directorio es local y solo lo escribe el usuario de la app.
+    """
+
+    admite_pickle = True
+
+    def __init__(self, directorio=DISCO_DIR):
+        self.directorio = directorio
+        os.makedirs(directorio, exist_ok=True)
+
+    def _ruta(self, clave, extension):
+        return os.path.join(self.directorio, hashlib.sha256(clave.encode("utf-8")).hexdigest() + extension)
+
+    def obtener(self, clave):
+        try:
+            with open(self._ruta(clave, ".bin"), "rb") as f:
+                expira, = struct.unpack("<d", f.read(8))
+                return f.read() if expira >= time.time() else None
+        except (FileNotFoundError, struct.error):
+            return None
+
+    def guardar(self, clave, datos, ttl):
+        ruta = self._ruta(clave, ".bin")
+        tmp = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(struct.pack("<d", time.time() + ttl))
+            f.write(datos)
+        os.replace(tmp, ruta)
+
+    @contextlib.contextmanager
+    def bloqueo(self, clave):
+        ruta = self._ruta(clave, ".lock")
+        limite = time.monotonic() + ESPERA_BLOQUEO_SEG
+        obtenido = False
+        while not obtenido and time.monotonic() < limite:
+            try:
+                os.close(os.open(ruta, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                obtenido = True
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(ruta) > EXPIRA_BLOQUEO_SEG:
+                        os.remove(ruta)
+                        continue
+                except FileNotFoundError:
+                    continue
+                time.sleep(SONDEO_SEG)
+        try:
+            yield obtenido
+        finally:
+            if obtenido:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(ruta)
+
+
+class CacheRedis:
+    """
+    Servidor compatible con Redis; el bloqueo es el `Lock` de redis-py (SET NX con expiración).
+    Lo que llega por la red nunca pasa por `pickle.loads`: los DataFrames viajan solo como Arrow.
+    """
+
+    admite_pickle = False
+
+    def __init__(self, url):
+        import redis
+        self._cliente = redis.Redis.from_url(url)
+
+    def obtener(self, clave):
+        return self._cliente.get(PREFIJO + clave)
+
+    def guardar(self, clave, datos, ttl):
+        self._cliente.set(PREFIJO + clave, datos, ex=ttl)
+
+    @contextlib.contextmanager
+    def bloqueo(self, clave):
+        candado = self._cliente.lock(PREFIJO + "bloqueo:" + clave, timeout=EXPIRA_BLOQUEO_SEG,
+                                     sleep=SONDEO_SEG, blocking_timeout=ESPERA_BLOQUEO_SEG)
+        obtenido = candado.acquire()
+        try:
+            yield obtenido
+        finally:
+            if obtenido:
+                with contextlib.suppress(Exception):   # pudo expirar si el cálculo tardó demasiado
+                    candado.release()
+
+
+def crear_backend(especificacion):
+    if not especificacion:
+        return None
+    if especificacion == "memoria":
+        return CacheMemoria()
+    if especificacion == "disco" or especificacion.startswith("disco:"):
+        return CacheDisco(especificacion.partition(":")[2] or DISCO_DIR)
+    if especificacion.startswith(("redis://", "rediss://", "unix://")):
+        return CacheRedis(especificacion)
+    raise ValueError(f"KB_CACHE no reconocido: {especificacion!r}")
+
+
+@functools.lru_cache(maxsize=1)
+def backend():
+    """Backend único por proceso según KB_CACHE, o None si la caché compartida está desactivada."""
+    return crear_backend(BACKEND)
+
+
+def activa():
+    return backend() is not None
+
+
+# --- Serialización ---
+def _admite_pickle():
+    b = backend()
+    return b is None or b.admite_pickle
+
+
+def frames_a_bytes(frames):
+    """
+    Varios DataFrames en un solo valor: cada uno como stream IPC de Arrow, precedido de su
+    tamaño. Las columnas que Arrow no sabe representar (objetos mezclados) caen a pickle, solo
+    con backends locales; con Redis se lanza SerializacionNoSegura y el valor no se comparte.
+    """
+    import pyarrow as pa
+    salida = io.BytesIO()
+    for df in frames:
+        try:
+            tabla = pa.Table.from_pandas(df, preserve_index=False)
+            sumidero = pa.BufferOutputStream()
+            with pa.ipc.new_stream(sumidero, tabla.schema) as escritor:
+                escritor.write_table(tabla)
+            tipo, cuerpo = b"A", sumidero.getvalue().to_pybytes()
+        except (pa.ArrowException, TypeError, ValueError) as e:
+            if not _admite_pickle():
+                raise SerializacionNoSegura(f"DataFrame no representable en Arrow: {e}") from e
+            tipo, cuerpo = b"P", pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL)
+        salida.write(tipo + struct.pack("<Q", len(cuerpo)) + cuerpo)
+    return salida.getvalue()
+
+
+def bytes_a_frames(datos):
+    import pyarrow as pa
+    frames, vista = [], memoryview(datos)
+    while vista:
+        tipo, largo = bytes(vista[:1]), struct.unpack("<Q", vista[1:9])[0]
+        cuerpo, vista = vista[9:9 + largo], vista[9 + largo:]
+        if tipo == b"A":
+            frames.append(pa.ipc.open_stream(pa.py_buffer(cuerpo)).read_all().to_pandas())
+        elif _admite_pickle():
+            frames.append(pickle.loads(cuerpo))
+        else:
+            raise SerializacionNoSegura("Valor con pickle en un backend que no lo admite: no se deserializa")
+    return tuple(frames)
+
+
+# --- Uso ---
+_decodificados = OrderedDict()   # clave -> (versión, valor): evita deserializar en cada rerun
+_lock_decodificados = threading.Lock()
+
+
+def _recordar(clave, version, valor, recordar=True):
+    if not recordar:
+        return valor
+    with _lock_decodificados:
+        _decodificados[clave] = (version, valor)
+        _decodificados.move_to_end(clave)
+        while len(_decodificados) > MAX_DECODIFICADOS:
+            _decodificados.popitem(last=False)
+    return valor
+
+
+def obtener_o_calcular(clave, calcular, serializar, deserializar, ttl=TTL_SEG, recordar=True):
+    """
+    Valor compartido por todas las réplicas. Si falta, solo una réplica lo calcula: las demás
+    esperan el bloqueo y leen lo que esa guardó (sin estampida contra la API o Gemini). Si la
+    espera vence, se calcula igual en lugar de fallar.
+
+    Junto al valor se guarda una versión corta; cada proceso conserva el último valor ya
+    deserializado y, mientras la versión no cambie, lo devuelve sin volver a leerlo completo.
+    El valor devuelto se comparte entre sesiones: no debe modificarse. Con `recordar=False`
+    (valores pequeños y numerosos, como textos del LLM) no ocupa lugar en esa memoria.
+    `calcular` debe lanzar una excepción si el resultado no debe guardarse (p. ej. error de la API);
+    si `serializar` lanza SerializacionNoSegura, el valor se devuelve sin guardarlo.
+    """
+    b = backend()
+    perf.contar("cache.compartida.llamadas")
+    version = b.obtener(clave + ":version")
+    if version is not None:
+        with _lock_decodificados:
+            recordado = _decodificados.get(clave)
+        if recordado is not None and recordado[0] == version:
+            return recordado[1]
+        datos = b.obtener(clave)
+        if datos is not None:
+            return _recordar(clave, version, deserializar(datos), recordar)
+
+    with b.bloqueo(clave):
+        # Otra réplica pudo llenarla mientras esperábamos el bloqueo
+        version, datos = b.obtener(clave + ":version"), b.obtener(clave)
+        if version is not None and datos is not None:
+            return _recordar(clave, version, deserializar(datos), recordar)
+        perf.contar("cache.compartida.fallos")
+        valor = calcular()
+        try:
+            datos = serializar(valor)
+        except SerializacionNoSegura:
+            return valor
+        version = uuid.uuid4().hex[:16].encode()
+        b.guardar(clave, datos, ttl)
+        b.guardar(clave + ":version", version, ttl)   # después del valor: quien vea la versión encuentra el valor
+        return _recordar(clave, version, valor, recordar)
@@ -0,0 +1,153 @@
+import string
+
+import numpy as np
+import pandas as pd
+
+import exportacion as ex
+
+# --- Configuración ---
+# dayofweek (0 = lunes) -> nombre en español, sin depender de que el locale es_ES esté instalado
+DIAS_SEMANA = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"]
+# Segmentos por recencia y frecuencia, evaluados en orden: el primero que aplica gana
+SEGMENTOS = {
+    "Frecuentes": "3 o más visitas y la última hace menos de 45 días",
+    "Nuevos": "una sola visita en los últimos 60 días",
+    "Activos": "última visita hace menos de 60 días",
+    "En riesgo": "última visita hace entre 60 y 180 días",
+    "Inactivos": "última visita hace más de 180 días",
+}
+VARIABLES = {
+    "nombre": "Nombre_Cliente",
+    "servicio": "Servicio_Favorito",
+    "barbero": "Barbero_Favorito",
+    "sede": "Sede_Habitual",
+    "dias": "Dias_Sin_Visita",
+}
+CONTACTO = ['Nombre_Cliente', 'Apellido_Cliente', 'Telefono', 'Email']
+
+
+def dia_semana(fechas):
+    """Nombre del día en español para una serie datetime (reemplaza `day_name(locale=...)`); NaT da None."""
+    dias = fechas.dt.dayofweek
+    validas = dias.notna().to_numpy()
+    nombres = np.full(len(fechas), None, dtype=object)
+    nombres[validas] = np.array(DIAS_SEMANA, dtype=object)[dias[validas].astype(int).to_numpy()]
+    return pd.Series(nombres, index=fechas.index)
+
+
+def _mas_frecuente(citas, columna):
+    """Valor más frecuente de `columna` por cliente (empates: el de la visita más reciente)."""
+    conteo = (citas.groupby(['ID_Cliente', columna], observed=True)
+              .agg(veces=('Fecha', 'size'), ultima=('Fecha', 'max'))
+              .reset_index()
+              .sort_values(['ID_Cliente', 'veces', 'ultima'], ascending=[True, False, False]))
+    return conteo.drop_duplicates('ID_Cliente').set_index('ID_Cliente')[columna]
+
+
+def segmentar_clientes(df_citas, hoy=None):
+    """
+    Una fila por cliente con sus rasgos (última visita, visitas, gasto, servicio, barbero y sede
+    más frecuentes) y su segmento. Todo con agregaciones agrupadas, sin recorrer clientes.
+    """
+    citas = df_citas.dropna(subset=['ID_Cita', 'ID_Cliente', 'Fecha'])
+    if citas.empty:
+        return pd.DataFrame()
+    hoy = pd.Timestamp(hoy or pd.Timestamp.now()).normalize()
+
+    # Los datos de contacto pueden faltar según la versión de la API
+    citas = citas.reindex(columns=citas.columns.union(CONTACTO, sort=False))
+    clientes = citas.groupby('ID_Cliente').agg(
+        **{columna: (columna, 'first') for columna in CONTACTO},
+        Ultima_Visita=('Fecha', 'max'),
+        Visitas=('ID_Cita', 'size'),
+        Gasto_Total=('Precio', 'sum'),
+    )
+    clientes['Servicio_Favorito'] = _mas_frecuente(citas, 'Nombre_Servicio')
+    clientes['Barbero_Favorito'] = _mas_frecuente(citas, 'Nombre_Completo_Barbero')
+    clientes['Sede_Habitual'] = _mas_frecuente(citas, 'Nombre_Sede')
+    clientes['Dias_Sin_Visita'] = (hoy - clientes['Ultima_Visita'].dt.normalize()).dt.days.clip(lower=0)
+
+    dias, visitas = clientes['Dias_Sin_Visita'], clientes['Visitas']
+    clientes['Segmento'] = np.select(
+        [(visitas >= 3) & (dias < 45), (visitas == 1) & (dias < 60), dias < 60, dias <= 180],
+        list(SEGMENTOS)[:4],
+        default="Inactivos",
+    )
+    return clientes.reset_index()
+
+
+def resumen_segmentos(clientes):
+    """Tamaño y rasgos dominantes de cada segmento: es lo único que ve el modelo."""
+    resumen = clientes.groupby('Segmento').agg(
+        Clientes=('ID_Cliente', 'size'),
+        Visitas_Promedio=('Visitas', 'mean'),
+        Dias_Sin_Visita_Promedio=('Dias_Sin_Visita', 'mean'),
+        Gasto_Promedio=('Gasto_Total', 'mean'),
+        Servicio_Top=('Servicio_Favorito', lambda s: s.mode().iloc[0]),
+    )
+    return resumen.reindex([s for s in SEGMENTOS if s in resumen.index])
+
+
+def prompt_plantilla(segmento, fila, objetivo, canal):
+    variables = ", ".join("{" + v + "}" for v in VARIABLES)
+    return f"""
+    Actúa como un Director Creativo para 'Kingdom Barber'. Escribe UNA plantilla de mensaje de {canal}
+    para todos los clientes del segmento "{segmento}" ({SEGMENTOS[segmento]}).
+    - Objetivo de la campaña: {objetivo}
+    - Clientes en el segmento: {int(fila['Clientes'])}
+    - Visitas promedio: {fila['Visitas_Promedio']:.1f} · Días promedio sin visita: {fila['Dias_Sin_Visita_Promedio']:.0f}
+    - Gasto promedio: ${fila['Gasto_Promedio']:,.0f} COP · Servicio más pedido: {fila['Servicio_Top']}
+
+    **Reglas Estrictas:**
+    1. Responde SOLO con el texto del mensaje, sin títulos ni explicaciones.
+    2. Personaliza usando únicamente estas variables entre llaves: {variables}.
+    3. No inventes otras variables ni uses llaves para otra cosa.
+    4. Máximo {"600" if canal == "Email" else "300"} caracteres, tono cercano y una llamada a la acción clara.
+    """
+
+
+def limpiar_plantilla(texto):
+    """Quita cercos de código y escapa toda llave que no sea una variable conocida."""
+    texto = texto.strip().strip("`").strip().replace("{", "{{").replace("}", "}}")
+    for variable in VARIABLES:
+        texto = texto.replace("{{" + variable + "}}", "{" + variable + "}")
+    return texto
+
+
+def generar_plantillas(resumen, objetivo, canal, generar_texto):
+    """Una llamada al modelo por segmento. `generar_texto(prompt) -> str` encapsula el cliente de IA."""
+    return {
+        segmento: limpiar_plantilla(generar_texto(prompt_plantilla(segmento, fila, objetivo, canal)))
+        for segmento, fila in resumen.iterrows()
+    }
+
+
+def _renderizar_plantilla(plantilla, clientes):
+    """Sustituye las variables concatenando columnas enteras (una operación vectorizada por trozo)."""
+    mensaje = pd.Series("", index=clientes.index, dtype=object)
+    for literal, variable, _, _ in string.Formatter().parse(plantilla):
+        mensaje = mensaje + literal
+        if variable is not None:
+            mensaje = mensaje + clientes[VARIABLES[variable]].fillna("").astype(str)
+    return mensaje
+
+
+def renderizar_mensajes(clientes, plantillas):
+    """Mensaje final por cliente según la plantilla de su segmento."""
+    mensajes = pd.Series("", index=clientes.index, dtype=object)
+    for segmento, plantilla in plantillas.items():
+        en_segmento = clientes['Segmento'] == segmento
+        mensajes[en_segmento] = _renderizar_plantilla(plantilla, clientes[en_segmento])
+    salida = clientes[CONTACTO + ['Segmento']].copy()
+    salida['Mensaje'] = mensajes
+    return salida[salida['Mensaje'] != ""]
+
+
+def exportar(mensajes, formato, filas_por_bloque=ex.FILAS_POR_BLOQUE):
+    """
+    Archivo temporal con los mensajes en el formato pedido (ver `exportacion.FORMATOS`), escrito
+    por bloques con los mismos escritores que la exportación de citas. Devuelve la ruta.
+    """
+    # Con cero mensajes igual sale un bloque vacío: el archivo lleva al menos los encabezados
+    bloques = (mensajes.iloc[inicio:inicio + filas_por_bloque] for inicio in range(0, max(len(mensajes), 1), filas_por_bloque))
+    return ex.escribir_archivo(bloques, formato, total=len(mensajes), hoja="Campaña")
@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+
+# --- Configuración ---
+TODAS = "Todas"
+
+
+def _primeros_de_grupo(grupos):
+    """Para un arreglo ordenado, la posición del primer elemento del grupo de cada elemento."""
+    inicio = np.empty(len(grupos), dtype=bool)
+    inicio[:1] = True
+    inicio[1:] = grupos[1:] != grupos[:-1]
+    return np.maximum.accumulate(np.where(inicio, np.arange(len(grupos)), 0))
+
+
+class Cohortes:
+    """
+    Retención y valor de vida de los clientes por cohorte (mes de su primera visita), para todas
+    las sedes juntas y para cada sede, calculados una sola vez por versión de datos.
+
+    Las citas se convierten en códigos enteros (cliente, mes, sede). Los pares únicos
+    (cliente, mes, sede) salen de un solo `np.unique`; como quedan ordenados por cliente y mes,
+    el primer mes de cada cliente es el primer elemento de su grupo. Las matrices cohorte × meses
+    transcurridos se arman con `np.bincount` sobre índices planos, sin groupby anidados.
+    """
+
+    def __init__(self, df_vista):
+        citas = df_vista.dropna(subset=['ID_Cita', 'ID_Cliente', 'Fecha'])
+        self.sedes, self.meses = [], pd.DatetimeIndex([])
+        self._alcances, self.ingresos_sede, self._n = {}, None, 0
+        if citas.empty:
+            return
+
+        meses_abs = citas['Fecha'].to_numpy().astype('datetime64[M]').astype(np.int64)
+        mes0 = meses_abs.min()
+        n = int(meses_abs.max() - mes0) + 1
+        mes = meses_abs - mes0
+        cliente, _ = pd.factorize(citas['ID_Cliente'])
+        sede, sedes = pd.factorize(citas['Nombre_Sede'])
+        S = len(sedes) + 1
+        sede = np.where(sede < 0, len(sedes), sede)          # citas sin sede: solo cuentan en "Todas"
+        precio = pd.to_numeric(citas['Precio'], errors='coerce').fillna(0).to_numpy(dtype=float)
+
+        self.sedes = list(sedes)
+        self.meses = pd.date_range(pd.Timestamp(np.int64(mes0).astype('datetime64[M]')), periods=n, freq="MS")
+        self._n = n
+
+        # Pares únicos (cliente, mes, sede) ordenados: la base de todas las retenciones
+        pares = np.unique((cliente.astype(np.int64) * n + mes) * S + sede)
+        cliente_mes = pares // S
+        unicos_total = np.ones(len(cliente_mes), dtype=bool)
+        unicos_total[1:] = cliente_mes[1:] != cliente_mes[:-1]
+
+        alcances = [(TODAS, cliente_mes[unicos_total], np.ones(len(cliente), dtype=bool))]
+        for i, nombre in enumerate(self.sedes):
+            alcances.append((nombre, cliente_mes[pares % S == i], sede == i))
+
+        n_clientes = cliente.max() + 1
+        for nombre, claves, en_alcance in alcances:
+            self._alcances[nombre] = self._calcular(claves, n_clientes, cliente[en_alcance], mes[en_alcance],
+                                                    precio[en_alcance])
+
+        # Ingresos por cohorte global (primera visita en cualquier sede) y sede de la cita
+        primer_mes = self._alcances[TODAS]["primer_mes"]
+        plano = np.bincount(primer_mes[cliente] * S + sede, weights=precio, minlength=n * S)
+        self.ingresos_sede = plano.reshape(n, S)[:, :len(self.sedes)]
+
+    def _calcular(self, claves, n_clientes, cliente, mes, precio):
+        """Matrices de un alcance a partir de sus pares (cliente, mes) únicos y ordenados."""
+        n = self._n
+        cliente_par, mes_par = claves // n, claves % n
+        cohorte_par = mes_par[_primeros_de_grupo(cliente_par)]
+        activos = np.bincount(cohorte_par * n + (mes_par - cohorte_par), minlength=n * n).reshape(n, n)
+
+        primer_mes = np.full(n_clientes, -1, dtype=np.int64)
+        primer_mes[cliente_par] = cohorte_par                  # todos los pares de un cliente traen el mismo valor
+        cohorte = primer_mes[cliente]
+        ingresos = np.bincount(cohorte * n + (mes - cohorte), weights=precio, minlength=n * n).reshape(n, n)
+        return {
+            "primer_mes": primer_mes,
+            "activos": activos,
+            "ingresos": ingresos,
+            "citas": np.bincount(cohorte, minlength=n),
+        }
+
+    def __bool__(self):
+        return bool(self._alcances)
+
+    def _alcance(self, sede):
+        return self._alcances[TODAS if sede in (None, TODAS) else sede]
+
+    def _etiquetas(self):
+        return self.meses.strftime("%Y-%m")
+
+    def _observable(self):
+        """Máscara cohorte × meses transcurridos que ya ocurrieron (el resto no se conoce todavía)."""
+        n = self._n
+        return np.arange(n)[None, :] <= (n - 1 - np.arange(n))[:, None]
+
+    def retencion(self, sede=None):
+        """% de cada cohorte que volvió en el mes 0, 1, 2... desde su primera visita (NaN si aún no ocurrió)."""
+        activos = self._alcance(sede)["activos"]
+        tamano = activos[:, 0]
+        con_clientes = tamano > 0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            matriz = np.where(self._observable(), activos / tamano[:, None] * 100, np.nan)
+        df = pd.DataFrame(matriz, index=self._etiquetas(), columns=range(self._n))
+        df.index.name, df.columns.name = "Cohorte", "Meses desde la primera visita"
+        return df[con_clientes]
+
+    def valor_vida(self, sede=None):
+        """Por cohorte: clientes, citas, ingresos, valor de vida por cliente y retención al mes 1, 3 y 6."""
+        alcance = self._alcance(sede)
+        tamano = alcance["activos"][:, 0]
+        ingresos = alcance["ingresos"].sum(axis=1)
+        retencion = self.retencion(sede)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            df = pd.DataFrame({
+                "Clientes": tamano,
+                "Citas": alcance["citas"],
+                "Ingresos": ingresos,
+                "Valor de vida": ingresos / tamano,
+                "Citas por cliente": alcance["citas"] / tamano,
+            }, index=self._etiquetas())
+        df.index.name = "Cohorte"
+        df = df[tamano > 0]
+        for mes in (1, 3, 6):
+            if mes < self._n:
+                df[f"Retención mes {mes} (%)"] = retencion[mes]
+        return df
+
+    def valor_vida_acumulado(self, sede=None):
+        """Ingreso acumulado por cliente de cada cohorte según los meses transcurridos (curva de LTV)."""
+        alcance = self._alcance(sede)
+        tamano = alcance["activos"][:, 0]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            matriz = np.where(self._observable(), alcance["ingresos"].cumsum(axis=1) / tamano[:, None], np.nan)
+        df = pd.DataFrame(matriz, index=self._etiquetas(), columns=range(self._n))
+        return df[tamano > 0]
+
+    def resumen(self, sede=None, meses=12):
+        """Clientes, valor de vida medio y valor a `meses` meses (solo cohortes que ya cumplieron ese plazo)."""
+        alcance = self._alcance(sede)
+        tamano = alcance["activos"][:, 0]
+        clientes = int(tamano.sum())
+        resumen = {"clientes": clientes,
+                   "valor_vida": float(alcance["ingresos"].sum() / clientes) if clientes else 0.0,
+                   "valor_a_meses": None, "retencion_mes_1": None}
+        maduras = tamano[:max(self._n - meses + 1, 0)]
+        if meses <= self._n and maduras.sum():
+            acumulado = alcance["ingresos"][:len(maduras), :meses].sum()
+            resumen["valor_a_meses"] = float(acumulado / maduras.sum())
+        if self._n > 1 and tamano[:-1].sum():
+            resumen["retencion_mes_1"] = float(alcance["activos"][:-1, 1].sum() / tamano[:-1].sum() * 100)
+        return resumen
+
+    def ingresos_por_sede(self):
+        """Ingresos de cada cohorte (primera visita en cualquier sede) repartidos por la sede de la cita."""
+        df = pd.DataFrame(self.ingresos_sede, index=self._etiquetas(), columns=self.sedes)
+        df.index.name = "Cohorte"
+        return df[df.sum(axis=1) > 0]
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+import text_utils as tu
+
+# Palabras que no describen la ubicación cuando deducimos el lugar a partir del nombre de la sede
+PALABRAS_NO_UBICACION = {"SEDE", "KINGDOM", "BARBER", "BARBERIA", "SUCURSAL", "PRINCIPAL"}
+COLUMNAS_UBICACION_SEDE = ["Barrio", "Municipio", "Ciudad"]
+
+
+def claves_ubicacion_sedes(df_sedes, nivel):
+    """
+    Clave normalizada del lugar de cada sede. Se usa la columna de ubicación que traiga la API
+    según el nivel del dataset ('barrio' o 'municipio'); si no existe, se deduce del nombre de
+    la sede quitando palabras genéricas ("Sede Laureles" -> "LAURELES").
+    """
+    preferidas = ["Barrio"] if nivel == "barrio" else ["Municipio", "Ciudad"]
+    for col in preferidas:
+        if col in df_sedes.columns and df_sedes[col].notna().any():
+            return tu.normalizar_texto(df_sedes[col])
+
+    nombres = tu.normalizar_texto(df_sedes["Nombre_Sede"]).fillna("")
+    return nombres.map(lambda n: " ".join(p for p in n.split() if p not in PALABRAS_NO_UBICACION)).astype("string")
+
+
+def _claves_rollup(rollup):
+    return (rollup["clave"] if "clave" in rollup.columns else tu.normalizar_texto(rollup["ubicacion"])).to_numpy()
+
+
+def _indice_por_clave(rollup):
+    """Establecimientos por clave normalizada (varias grafías del mismo lugar se suman)."""
+    return rollup.groupby(_claves_rollup(rollup))["establecimientos"].sum().sort_index()
+
+
+def _subfrases(claves):
+    """Una fila (pos, subfrase) por cada secuencia contigua de palabras de cada clave."""
+    filas = [(pos, " ".join(palabras[i:j]))
+             for pos, palabras in enumerate(claves.fillna("").str.split())
+             for i in range(len(palabras)) for j in range(i + 1, len(palabras) + 1)]
+    return pd.DataFrame(filas, columns=["pos", "subfrase"])
+
+
+def _resolver_claves(claves_sedes, indice):
+    """
+    Une cada sede con una ubicación del índice: coincidencia exacta o, si no, la ubicación con
+    más establecimientos que contenga la clave de la sede como palabras (o viceversa).
+
+    Las subfrases de todas las ubicaciones se arman una sola vez y ambos sentidos se resuelven
+    con merges sobre claves normalizadas, sin recorrer el dataset por cada sede.
+    """
+    tamanos = indice.rename("establecimientos").rename_axis("ubicacion").reset_index()
+    sedes = pd.DataFrame({"pos": np.arange(len(claves_sedes)), "subfrase": claves_sedes.fillna("").to_numpy()})
+    # Ubicaciones que contienen la clave completa de la sede
+    contienen = sedes.merge(_subfrases(tamanos["ubicacion"]).join(tamanos, on="pos").drop(columns="pos"), on="subfrase")
+    # Ubicaciones contenidas en la clave de la sede
+    contenidas = _subfrases(claves_sedes).merge(tamanos, left_on="subfrase", right_on="ubicacion")
+    candidatas = pd.concat([contienen, contenidas], ignore_index=True)
+    mejor = (candidatas.sort_values("establecimientos", ascending=False, kind="stable")
+             .drop_duplicates("pos").set_index("pos")["ubicacion"])
+
+    exactas = claves_sedes.where(claves_sedes.isin(indice.index))
+    return exactas.fillna(pd.Series(mejor.reindex(np.arange(len(claves_sedes))).to_numpy(), index=claves_sedes.index,
+                                    dtype="string"))
+
+
+def analizar_competencia(df_sedes, df_vista, rollup, nivel):
+    """
+    Devuelve una fila por sede con su desempeño interno y la competencia pública de su zona:
+
+    - competidores: establecimientos del dataset en la misma ubicación.
+    - cuota_mercado: % de los puntos de venta de la zona que son nuestros (sedes propias / total).
+    - indice_saturacion: competidores de la zona frente a la mediana de todas las ubicaciones
+      del dataset (1.0 = zona típica, >1 más saturada).
+    - ingreso_por_competidor: ingresos de la sede por cada establecimiento competidor.
+    """
+    indice = _indice_por_clave(rollup)
+    sedes = df_sedes[["Nombre_Sede"]].copy()
+    sedes["clave"] = _resolver_claves(claves_ubicacion_sedes(df_sedes, nivel), indice)
+    nombre_por_clave = rollup.groupby(_claves_rollup(rollup))["ubicacion"].first()
+    sedes["ubicacion"] = sedes["clave"].map(nombre_por_clave)
+
+    citas = df_vista.dropna(subset=["ID_Cita"]) if "ID_Cita" in df_vista.columns else df_vista.iloc[0:0]
+    desempeno = citas.groupby("Nombre_Sede")["Precio"].agg(ingresos="sum", citas="count")
+    sedes = sedes.join(desempeno, on="Nombre_Sede")
+    sedes[["ingresos", "citas"]] = sedes[["ingresos", "citas"]].fillna(0)
+
+    sedes["competidores"] = sedes["clave"].map(indice).fillna(0).astype(int)
+    sedes_propias = sedes.groupby("clave", dropna=False)["Nombre_Sede"].transform("size")
+    ubicada = sedes["clave"].notna()
+
+    sedes["cuota_mercado"] = np.where(ubicada, sedes_propias / (sedes_propias + sedes["competidores"]) * 100, np.nan)
+    mediana = float(indice.median()) if not indice.empty else 0.0
+    sedes["indice_saturacion"] = np.where(ubicada & (mediana > 0), sedes["competidores"] / (mediana or 1), np.nan)
+    sedes["ingreso_por_competidor"] = np.where(ubicada, sedes["ingresos"] / sedes["competidores"].clip(lower=1), np.nan)
+
+    return sedes.drop(columns=["clave"]).sort_values("ingresos", ascending=False).reset_index(drop=True)
@@ -1,17 +1,35 @@
+import os
 import streamlit as st
 import pandas as pd
 import requests
+import instrumentation as perf
+import artefactos as art
+import cache_compartida as cc
 
-API_URL = st.secrets["API_URL"]
+# KB_API_URL permite apuntar a otra API (p. ej. la API simulada de benchmarks/api_simulada.py)
+API_URL = os.environ.get("KB_API_URL") or st.secrets["API_URL"]
 
+class DatosIncompletos(RuntimeError):
+    """La API no devolvió clientes o citas: el resultado no se comparte con otras réplicas."""
+
+
+def _descargar(endpoint):
+    with perf.span(f"api:{endpoint}"):
+        response = requests.get(f"{API_URL}/{endpoint}")
+        response.raise_for_status()
+        return pd.DataFrame(response.json())
+
+@perf.rastrear_cache("obtener_datos_api")
 @st.cache_data
 def obtener_datos_api(endpoint):
     """Función genérica para obtener datos de un endpoint de la API."""
+    perf.fallo_cache("obtener_datos_api")
     try:
-        url = f"{API_URL}/{endpoint}"
-        response = requests.get(url)
-        response.raise_for_status()
-        return pd.DataFrame(response.json())
+        # Con KB_CACHE, solo una réplica descarga cada endpoint; las demás leen su copia en Arrow
+        if cc.activa():
+            return cc.obtener_o_calcular(f"api:{API_URL}/{endpoint}", lambda: _descargar(endpoint),
+                                         lambda df: cc.frames_a_bytes([df]), lambda datos: cc.bytes_a_frames(datos)[0])
+        return _descargar(endpoint)
     except requests.exceptions.RequestException as e:
         st.error(f"Error de conexión al buscar '{endpoint}': {e}")
     except ValueError:
@@ -20,51 +38,134 @@ def obtener_datos_api(endpoint):
 
 def cargar_datos_completos_api():
     """Carga todos los dataframes necesarios desde la API y renombra las columnas para compatibilidad."""
-    df_clientes = obtener_datos_api("clientes")
-    df_barberos = obtener_datos_api("barberos")
-    df_servicios = obtener_datos_api("servicios")
-    df_citas = obtener_datos_api("historial/citas")
-    df_sedes = obtener_datos_api("sedes")
-
-    # Capa de traducción para compatibilidad
-    if not df_clientes.empty:
-        df_clientes.rename(columns={'id': 'ID_Cliente', 'nombreCliente': 'Nombre_Cliente', 'apellidoCliente': 'Apellido_Cliente', 'telefono': 'Telefono', 'email': 'Email'}, inplace=True)
-    if not df_barberos.empty:
-        if 'sede' in df_barberos.columns and not df_barberos['sede'].isnull().all():
-             df_barberos['ID_Sede'] = df_barberos['sede'].apply(lambda x: x.get('id') if isinstance(x, dict) else None)
-        df_barberos.rename(columns={'id': 'ID_Barbero', 'nombreBarbero': 'Nombre_Barbero', 'apellidoBarbero': 'Apellido_Barbero'}, inplace=True)
-    if not df_servicios.empty:
-        df_servicios.rename(columns={'id': 'ID_Servicio', 'nombreServicio': 'Nombre_Servicio', 'precio': 'Precio', 'duracionMin': 'Duracion_min'}, inplace=True)
-    if not df_citas.empty:
-        df_citas.rename(columns={'id': 'ID_Cita', 'idCliente': 'ID_Cliente', 'idBarbero': 'ID_Barbero', 'idServicio': 'ID_Servicio', 'idSede': 'ID_Sede', 'fecha': 'Fecha', 'hora': 'Hora'}, inplace=True)
-    if not df_sedes.empty:
-        df_sedes.rename(columns={'id': 'ID_Sede', 'nombreSede': 'Nombre_Sede'}, inplace=True)
-    
-    return df_clientes, df_barberos, df_servicios, df_citas, df_sedes
+    return tuple(art.traducir(endpoint, obtener_datos_api(endpoint)) for endpoint in art.ENDPOINTS)
+
+@st.cache_data(show_spinner=False, ttl=10)
+def manifiesto_vigente():
+    """
+    Manifiesto publicado por `artefactos.py` (o None). Se lee del disco como mucho una vez cada
+    pocos segundos: la carga de la vista y los obtener_* de un mismo rerun comparten la lectura.
+    """
+    return art.vigente()
+
+def version_publicada():
+    """Versión de los artefactos vigentes; las páginas la usan como clave de su caché de datos."""
+    manifiesto = manifiesto_vigente()
+    return None if manifiesto is None else manifiesto["version"]
+
+# cache_data y no cache_resource: cada sesión recibe su propia copia y no puede modificar la de las demás
+@st.cache_data(show_spinner=False, max_entries=2)
+def _vista_publicada(version, _manifiesto):
+    """Vista y sedes ya armadas por `artefactos.py`; se leen del disco una vez por versión publicada."""
+    with perf.span("vista:artefactos"):
+        return art.cargar_vista(_manifiesto)
 
 def obtener_vista_citas_completa():
     """Obtiene datos de la API, realiza los merges Y DEVUELVE AMBOS DATAFRAMES NECESARIOS."""
-    df_clientes, df_barberos, df_servicios, df_citas, df_sedes = cargar_datos_completos_api()
-    
-    if any(df.empty for df in [df_clientes, df_citas]):
+    # Si el ETL publicó artefactos recientes, las páginas no dependen de la API ni del tamaño de los datos
+    manifiesto = manifiesto_vigente()
+    if manifiesto is not None:
+        return _vista_publicada(manifiesto["version"], manifiesto)
+
+    try:
+        return _vista_api(API_URL)
+    except DatosIncompletos:
         st.warning("No se pudieron cargar los datos de clientes o citas desde la API.")
         # Devuelve dataframes vacíos pero con las columnas esperadas para evitar errores posteriores
         return pd.DataFrame(), pd.DataFrame(columns=['ID_Sede', 'Nombre_Sede'])
 
-    # Aseguramos que los IDs sean numéricos antes de unir
-    for df in [df_clientes, df_citas, df_barberos, df_sedes, df_servicios]:
-        for col in df.columns:
-            if 'ID' in col and col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-
-    df_clientes['Nombre_Completo_Cliente'] = df_clientes['Nombre_Cliente'] + ' ' + df_clientes['Apellido_Cliente']
-    df_barberos['Nombre_Completo_Barbero'] = df_barberos['Nombre_Barbero'] + ' ' + df_barberos['Apellido_Barbero']
-    
-    df_vista = pd.merge(df_clientes, df_citas, on="ID_Cliente", how="left")
-    df_vista = pd.merge(df_vista, df_sedes, on="ID_Sede", how="left")
-    df_vista = pd.merge(df_vista, df_barberos, on="ID_Barbero", how="left")
-    df_vista = pd.merge(df_vista, df_servicios, on="ID_Servicio", how="left")
-    
-    df_vista['Fecha'] = pd.to_datetime(df_vista['Fecha'], errors='coerce')
-    
-    return df_vista, df_sedes
\ No newline at end of file
+# Como los endpoints en obtener_datos_api, la vista unida se arma una vez por fuente y no en cada
+# rerun de cada página. Si faltan datos, DatosIncompletos no se guarda y el próximo rerun reintenta
+@st.cache_data(show_spinner=False, max_entries=2)
+def _vista_api(api_url):
+    """Vista y sedes armadas desde la API `api_url`; cada sesión recibe su propia copia."""
+    if cc.activa():
+        # La vista unida también se comparte: las réplicas no repiten los merges
+        return cc.obtener_o_calcular(f"vista:{api_url}", _armar_vista_api, cc.frames_a_bytes, cc.bytes_a_frames)
+    return _armar_vista_api()
+
+def _armar_vista_api():
+    with perf.span("vista:cargar_api"):
+        df_clientes, df_barberos, df_servicios, df_citas, df_sedes = cargar_datos_completos_api()
+
+    if any(df.empty for df in [df_clientes, df_citas]):
+        raise DatosIncompletos()
+
+    with perf.span("vista:merges"):
+        return art.construir_vista(df_clientes, df_barberos, df_servicios, df_citas, df_sedes)
+
+
+version_datos = art.version_datos
+
+
+def _publicado(version, etapa):
+    """Manifiesto vigente si trae la etapa pedida para esta misma versión de datos; None si no."""
+    manifiesto = manifiesto_vigente()
+    if manifiesto is not None and manifiesto["version_datos"] == version and etapa in manifiesto["etapas"]:
+        return manifiesto
+    return None
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def obtener_motor_consultas(version, _df_vista):
+    """Motor de consultas (DuckDB si está instalado, pandas si no) compartido por páginas y sesiones."""
+    import query_engine as qe
+    motor = qe.crear_motor(_df_vista, version=version)
+    manifiesto = _publicado(version, "indices")
+    if manifiesto is not None:
+        motor.precargar(art.cargar_indices(manifiesto))
+    return motor
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def obtener_agenda(version, _df_vista):
+    """Índice de intervalos ocupados por barbero para buscar huecos y citas cruzadas."""
+    manifiesto = _publicado(version, "agenda")
+    if manifiesto is not None:
+        return art.cargar_objeto(manifiesto, "agenda")
+    import agenda
+    with perf.span("agenda:indice"):
+        return agenda.IndiceAgenda(_df_vista)
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def obtener_pronosticos(version, _df_vista):
+    """Pronóstico de demanda (total, sede, barbero y servicio) ajustado una vez por versión de datos."""
+    manifiesto = _publicado(version, "pronostico")
+    if manifiesto is not None:
+        return art.cargar_objeto(manifiesto, "pronostico")
+    import pronostico
+    with perf.span("pronostico:ajuste"):
+        return pronostico.Pronosticos(_df_vista)
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def obtener_cohortes(version, _df_vista):
+    """Retención y valor de vida por cohorte de primera visita, calculados una vez por versión de datos."""
+    manifiesto = _publicado(version, "cohortes")
+    if manifiesto is not None:
+        return art.cargar_objeto(manifiesto, "cohortes")
+    import cohortes
+    with perf.span("cohortes:calculo"):
+        return cohortes.Cohortes(_df_vista)
+
+
+def obtener_anomalias(version, _df_vista):
+    """
+    Alertas al día con esta versión de datos, sin escribir nada: parte de las líneas base que
+    guardó `artefactos.py --alertas` y revisa en memoria los días cerrados desde entonces.
+    """
+    import anomalias
+    # Qué días están cerrados depende de la fecha, y el ETL puede guardar un estado nuevo sin que
+    # cambien los datos: ambas cosas forman parte de la clave
+    hoy = pd.Timestamp.now().date()
+    return _anomalias(version, hoy, anomalias.firma_estado(), _df_vista)
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _anomalias(version, hoy, firma, _df_vista):
+    import anomalias
+    with perf.span("anomalias:revisar"):
+        estado = anomalias.cargar()
+        anomalias.revisar(estado, _df_vista, hoy)
+        return estado
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import os
+import time
+
+import pandas as pd
+import requests
+
+import schema_resolver as sr
+
+# --- Configuración de la caché local ---
+# KB_DATASETS_DIR apunta a una carpeta con archivos <clave>.csv (p. ej. los de benchmarks/carga_paginas.py):
+# se leen en lugar de datos.gov.co y su caché vive dentro de esa carpeta, sin tocar la real.
+DATASETS_DIR = os.environ.get("KB_DATASETS_DIR")
+CACHE_DIR = (os.path.join(DATASETS_DIR, "cache") if DATASETS_DIR
+             else os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "datasets"))
+TAMANO_CHUNK = 50_000
+REVALIDAR_CADA_SEG = 6 * 60 * 60  # Solo se pregunta al servidor si el archivo cambió cada 6 horas
+TIMEOUT_DESCARGA = 120
+
+# --- Catálogo de datasets de datos.gov.co ---
+# Las columnas que se leen y sus tipos vienen del esquema declarado en schema_resolver.
+DATASETS = {
+    "Nacional - Establecimientos de Belleza": {
+        "clave": "nacional",
+        "url": "https://www.datos.gov.co/api/views/e27n-di57/rows.csv?accessType=DOWNLOAD",
+        "esquema": "nacional",
+    },
+    "Risaralda - Estética Facial y Corporal": {
+        "clave": "risaralda",
+        "url": "https://www.datos.gov.co/api/views/92e4-cjqu/rows.csv?accessType=DOWNLOAD",
+        "esquema": "risaralda",
+    },
+    "Estética Local (Ejemplo)": {
+        "clave": "local",
+        "url": "https://www.datos.gov.co/api/views/mwxa-drpn/rows.csv?accessType=DOWNLOAD",
+        "esquema": "local",
+    },
+}
+
+
+# --- Utilidades de archivos ---
+def _rutas(clave):
+    """Devuelve las rutas del CSV crudo, la copia Parquet y los metadatos de un dataset."""
+    base = os.path.join(CACHE_DIR, clave)
+    return base + ".csv", base + ".parquet", base + ".json"
+
+
+def _leer_meta(ruta_meta):
+    try:
+        with open(ruta_meta, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _escribir_meta(ruta_meta, meta):
+    tmp = ruta_meta + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, ruta_meta)
+
+
+def _firma_spec(spec):
+    """Huella del esquema declarado: si cambia, la copia Parquet deja de ser válida."""
+    contenido = json.dumps(sr.ESQUEMAS[spec["esquema"]], sort_keys=True)
+    return hashlib.sha1(contenido.encode("utf-8")).hexdigest()[:12]
+
+
+def _es_url(fuente):
+    return str(fuente).startswith(("http://", "https://"))
+
+
+# --- Descarga con revalidación ETag / Last-Modified ---
+def _descargar(url, destino, meta, condicional=True):
+    """
+    Descarga `url` a `destino` en streaming. Si `condicional` es True y tenemos ETag o
+    Last-Modified de la descarga anterior, el servidor puede responder 304 y no se baja nada.
+    Devuelve True si se descargó un archivo nuevo.
+    """
+    headers = {}
+    if condicional:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    with requests.get(url, headers=headers, stream=True, timeout=TIMEOUT_DESCARGA) as response:
+        if response.status_code == 304:
+            return False
+        response.raise_for_status()
+        huella = hashlib.sha256()
+        tmp = destino + ".part"
+        with open(tmp, "wb") as f:
+            for bloque in response.iter_content(chunk_size=1 << 20):
+                f.write(bloque)
+                huella.update(bloque)
+        os.replace(tmp, destino)
+        meta["etag"] = response.headers.get("ETag")
+        meta["last_modified"] = response.headers.get("Last-Modified")
+        meta["version"] = huella.hexdigest()[:16]
+    return True
+
+
+# --- Parseo por bloques ---
+def _leer_csv_por_bloques(ruta_csv, spec):
+    """Lee solo las columnas declaradas, en bloques y con tipos explícitos."""
+    encabezado = pd.read_csv(ruta_csv, nrows=0).columns.tolist()
+    mapeo = sr.resolver_columnas(spec["esquema"], encabezado)
+    tipos_esquema = sr.tipos(spec["esquema"])
+    tipos = {nombre: tipos_esquema[nombre] for nombre in mapeo.values()}
+    partes = []
+    lector = pd.read_csv(ruta_csv, usecols=list(mapeo), dtype=str, chunksize=TAMANO_CHUNK)
+    for chunk in lector:
+        chunk = chunk.rename(columns=mapeo)
+        partes.append(chunk.astype(tipos))
+
+    if not partes:
+        return pd.DataFrame({nombre: pd.Series(dtype=tipo) for nombre, tipo in tipos.items()}), encabezado
+
+    columnas = {}
+    for nombre, tipo in tipos.items():
+        if tipo == "category":
+            # Unimos las categorías de cada bloque sin pasar por object
+            columnas[nombre] = pd.api.types.union_categoricals([p[nombre] for p in partes])
+        else:
+            columnas[nombre] = pd.concat([p[nombre] for p in partes], ignore_index=True)
+    df = pd.DataFrame(columnas)
+    return df[list(mapeo.values())], encabezado
+
+
+# --- Punto de entrada ---
+def cargar_dataset(nombre, fuente=None, forzar=False):
+    """
+    Devuelve (df, meta) para el dataset `nombre` del catálogo.
+
+    La primera vez se descarga el CSV, se parsea por bloques y se guarda una copia Parquet;
+    las siguientes cargas leen el Parquet y solo revalidan contra el servidor cada
+    REVALIDAR_CADA_SEG. `fuente` permite apuntar a un archivo local (p. ej. en pruebas).
+    """
+    spec = DATASETS[nombre]
+    if not fuente and DATASETS_DIR:
+        fuente = os.path.join(DATASETS_DIR, spec["clave"] + ".csv")
+    fuente = fuente or spec["url"]
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    ruta_csv, ruta_parquet, ruta_meta = _rutas(spec["clave"])
+    meta = _leer_meta(ruta_meta)
+    firma = _firma_spec(spec)
+    parquet_valido = os.path.exists(ruta_parquet) and meta.get("firma") == firma and meta.get("fuente") == fuente
+
+    if _es_url(fuente):
+        hay_cambios = True
+        if parquet_valido and not forzar and time.time() - meta.get("verificado", 0) < REVALIDAR_CADA_SEG:
+            hay_cambios = False
+        elif parquet_valido and not forzar:
+            try:
+                hay_cambios = _descargar(fuente, ruta_csv, meta)
+            except requests.exceptions.RequestException:
+                # Sin conexión: servimos la última copia conocida
+                hay_cambios = False
+            meta["verificado"] = time.time()
+        else:
+            _descargar(fuente, ruta_csv, meta, condicional=False)
+            meta["verificado"] = time.time()
+        ruta_origen = ruta_csv
+    else:
+        stat = os.stat(fuente)
+        version_local = f"{int(stat.st_mtime)}-{stat.st_size}"
+        hay_cambios = not parquet_valido or forzar or meta.get("version") != version_local
+        meta["version"] = version_local
+        ruta_origen = fuente
+
+    if hay_cambios:
+        df, encabezado = _leer_csv_por_bloques(ruta_origen, spec)
+        tmp = ruta_parquet + ".tmp"
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, ruta_parquet)
+        meta.update({"firma": firma, "fuente": fuente, "columnas_detectadas": encabezado, "filas": len(df)})
+        _escribir_meta(ruta_meta, meta)
+        if ruta_origen == ruta_csv and os.path.exists(ruta_csv):
+            os.remove(ruta_csv)  # El Parquet ya contiene todo lo que usamos
+        return df, meta
+
+    _escribir_meta(ruta_meta, meta)
+    df = pd.read_parquet(ruta_parquet)
+    # El Parquet no guarda el almacenamiento de los string[pyarrow]: volvemos a los tipos del esquema
+    tipos = {nombre: tipo for nombre, tipo in sr.tipos(spec["esquema"]).items() if nombre in df.columns}
+    return df.astype(tipos), meta
+
+
+def columnas_detectadas(nombre):
+    """Columnas del último archivo descargado, útil para diagnosticar cambios de estructura."""
+    _, _, ruta_meta = _rutas(DATASETS[nombre]["clave"])
+    return _leer_meta(ruta_meta).get("columnas_detectadas", [])
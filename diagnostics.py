@@ -0,0 +1,128 @@
+import http.client
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urljoin, urlsplit
+
+# --- Configuración ---
+PLAZO_POR_DEFECTO = 8.0        # segundos por sonda
+MAX_BYTES_LEIDOS = 20 * 1024 * 1024
+BYTES_RANGO = 4096             # para los CSV solo pedimos los primeros KB
+MAX_REDIRECCIONES = 3
+USER_AGENT = "KingdomBarber-Diagnostico/1.0"
+
+
+def _resultado(nombre, ok, inicio, **extra):
+    base = {
+        "sonda": nombre, "ok": ok, "estado": None, "conexion_ms": None, "ttfb_ms": None,
+        "total_ms": round((time.perf_counter() - inicio) * 1000, 1), "bytes": 0, "detalle": "",
+    }
+    base.update(extra)
+    return base
+
+
+# --- Sondas ---
+def sonda_http(url, rango=None, plazo=PLAZO_POR_DEFECTO, max_bytes=MAX_BYTES_LEIDOS):
+    """
+    Crea una sonda que hace un GET a `url` midiendo conexión (TCP+TLS), tiempo hasta el
+    primer byte y tiempo total. Con `rango` se envía `Range: bytes=0-(rango-1)` y, aunque el
+    servidor lo ignore, nunca se leen más de `max_bytes`.
+    """
+    def ejecutar(nombre):
+        inicio = time.perf_counter()
+        actual, conexion_ms = url, None
+        for _ in range(MAX_REDIRECCIONES + 1):
+            partes = urlsplit(actual)
+            clase = http.client.HTTPSConnection if partes.scheme == "https" else http.client.HTTPConnection
+            conn = clase(partes.hostname, partes.port, timeout=plazo)
+            try:
+                t0 = time.perf_counter()
+                conn.connect()
+                if conexion_ms is None:
+                    conexion_ms = round((time.perf_counter() - t0) * 1000, 1)
+                ruta = (partes.path or "/") + (f"?{partes.query}" if partes.query else "")
+                headers = {"User-Agent": USER_AGENT}
+                if rango:
+                    headers["Range"] = f"bytes=0-{rango - 1}"
+                conn.request("GET", ruta, headers=headers)
+                respuesta = conn.getresponse()
+                ttfb_ms = round((time.perf_counter() - inicio) * 1000, 1)
+                if respuesta.status in (301, 302, 303, 307, 308) and respuesta.getheader("Location"):
+                    actual = urljoin(actual, respuesta.getheader("Location"))
+                    continue
+                limite = min(max_bytes, rango) if rango else max_bytes
+                cuerpo = respuesta.read(limite)
+                return _resultado(
+                    nombre, respuesta.status < 400, inicio, estado=respuesta.status,
+                    conexion_ms=conexion_ms, ttfb_ms=ttfb_ms, bytes=len(cuerpo),
+                    detalle=f"Tamaño declarado: {respuesta.getheader('Content-Length') or 'desconocido'}",
+                )
+            finally:
+                conn.close()
+        return _resultado(nombre, False, inicio, conexion_ms=conexion_ms, detalle="Demasiadas redirecciones")
+
+    return ejecutar
+
+
+def sonda_gemini(api_key, modelo_esperado):
+    """
+    Sonda que lista los modelos de Gemini (el SDK se importa solo al ejecutarla). Falla si
+    el modelo que usa la app no está en la lista: la clave funciona pero el asistente no.
+    """
+    def ejecutar(nombre):
+        inicio = time.perf_counter()
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        modelos = [m.name for m in genai.list_models()]
+        encontrado = f"models/{modelo_esperado}" in modelos
+        return _resultado(
+            nombre, encontrado, inicio, estado=None if encontrado else "modelo no disponible",
+            bytes=len(modelos), modelos=modelos,
+            detalle=f"{len(modelos)} modelos; '{modelo_esperado}' {'encontrado' if encontrado else 'NO encontrado'}",
+        )
+
+    return ejecutar
+
+
+# --- Motor ---
+def _ejecutar_protegida(funcion, nombre):
+    """Corre una sonda en su hilo; los errores se convierten en un resultado fallido con su propia latencia."""
+    inicio = time.perf_counter()
+    try:
+        return funcion(nombre)
+    except Exception as e:
+        return _resultado(nombre, False, inicio, detalle=f"{type(e).__name__}: {e}")
+
+
+def ejecutar_sondas(sondas, plazo=PLAZO_POR_DEFECTO):
+    """
+    Ejecuta todas las sondas en paralelo. `sondas` es {nombre: función(nombre) -> dict} o
+    {nombre: (función, plazo_propio)}. Cualquier función con esa firma sirve, así que en
+    pruebas se pueden usar sustitutos locales. Cada sonda tiene su propio plazo: las que no
+    terminan a tiempo se reportan como 'timeout' sin esperar a que acaben.
+    """
+    normalizadas = {n: s if isinstance(s, tuple) else (s, plazo) for n, s in sondas.items()}
+    inicio = time.perf_counter()
+    executor = ThreadPoolExecutor(max_workers=max(1, len(normalizadas)), thread_name_prefix="sonda")
+    futuros = {nombre: executor.submit(_ejecutar_protegida, funcion, nombre) for nombre, (funcion, _) in normalizadas.items()}
+    limites = {nombre: inicio + p for nombre, (_, p) in normalizadas.items()}
+
+    pendientes = set(futuros)
+    while pendientes:
+        ahora = time.perf_counter()
+        pendientes = {n for n in pendientes if not futuros[n].done() and limites[n] > ahora}
+        if not pendientes:
+            break
+        wait([futuros[n] for n in pendientes], timeout=min(limites[n] for n in pendientes) - ahora, return_when="FIRST_COMPLETED")
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    resultados = []
+    for nombre, futuro in futuros.items():
+        plazo_sonda = normalizadas[nombre][1]
+        if not futuro.done():
+            resultados.append(_resultado(nombre, False, inicio, estado="timeout", detalle=f"Sin respuesta en {plazo_sonda:.0f} s"))
+            continue
+        resultado = futuro.result()
+        if resultado["total_ms"] > plazo_sonda * 1000:
+            resultado.update(ok=False, estado="timeout", detalle=f"Superó el plazo de {plazo_sonda:.0f} s")
+        resultados.append(resultado)
+    return sorted(resultados, key=lambda r: r["total_ms"], reverse=True)
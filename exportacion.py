@@ -0,0 +1,130 @@
+import csv
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+# --- Configuración ---
+FILAS_POR_BLOQUE = int(os.environ.get("KB_EXPORTAR_BLOQUE", 50_000))
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), "kingdom_barber_exportaciones")
+MAX_EDAD_SEG = 3600           # los archivos de exportaciones viejas se borran después de una hora
+FORMATOS = {
+    "CSV": (".csv", "text/csv"),
+    "Excel (XLSX)": (".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "Parquet": (".parquet", "application/vnd.apache.parquet"),
+}
+
+
+def formatos_disponibles():
+    """CSV siempre; XLSX y Parquet según estén instalados openpyxl y pyarrow."""
+    disponibles = ["CSV"]
+    for formato, modulo in (("Excel (XLSX)", "openpyxl"), ("Parquet", "pyarrow")):
+        try:
+            __import__(modulo)
+            disponibles.append(formato)
+        except ImportError:
+            pass
+    return disponibles
+
+
+def _limpiar_antiguos():
+    ahora = time.time()
+    for nombre in os.listdir(EXPORT_DIR):
+        ruta = os.path.join(EXPORT_DIR, nombre)
+        try:
+            if ahora - os.path.getmtime(ruta) > MAX_EDAD_SEG:
+                os.remove(ruta)
+        except OSError:
+            pass
+
+
+# Todos los escritores reciben el nombre de `hoja`; solo el XLSX lo usa
+def _escribir_csv(bloques, ruta, hoja):
+    # utf-8-sig: Excel abre el CSV con tildes y eñes correctas
+    with open(ruta, "w", encoding="utf-8-sig", newline="") as f:
+        for i, bloque in enumerate(bloques):
+            bloque.to_csv(f, index=False, header=i == 0, date_format="%Y-%m-%d", quoting=csv.QUOTE_MINIMAL)
+            yield len(bloque)
+
+
+def _escribir_xlsx(bloques, ruta, hoja):
+    from openpyxl import Workbook
+    libro = Workbook(write_only=True)     # fila a fila, sin mantener la hoja en memoria
+    hoja = libro.create_sheet(hoja)
+    for i, bloque in enumerate(bloques):
+        if i == 0:
+            hoja.append(list(bloque.columns))
+        # Las celdas vacías van como None; los Timestamp de pandas se escriben como datetime
+        valores = bloque.astype(object).where(bloque.notna(), None)
+        for fila in valores.itertuples(index=False, name=None):
+            hoja.append(fila)
+        yield len(bloque)
+    libro.save(ruta)
+
+
+def _esquema_arrow(bloque):
+    """Esquema fijo a partir de los dtypes: un bloque con una columna toda nula no debe cambiarlo."""
+    import pyarrow as pa
+    campos = []
+    for columna, dtype in bloque.dtypes.items():
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            tipo = pa.timestamp("ms")
+        elif pd.api.types.is_integer_dtype(dtype):
+            tipo = pa.int64()
+        elif pd.api.types.is_numeric_dtype(dtype):
+            tipo = pa.float64()
+        else:
+            tipo = pa.string()
+        campos.append(pa.field(columna, tipo))
+    return pa.schema(campos)
+
+
+def _escribir_parquet(bloques, ruta, hoja):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    escritor = None
+    try:
+        for bloque in bloques:
+            if escritor is None:
+                esquema = _esquema_arrow(bloque)
+                escritor = pq.ParquetWriter(ruta, esquema, compression="zstd")
+            bloque = bloque.astype({c.name: "string" for c in esquema if pa.types.is_string(c.type)})
+            escritor.write_table(pa.Table.from_pandas(bloque, schema=esquema, preserve_index=False))
+            yield len(bloque)
+    finally:
+        if escritor is not None:
+            escritor.close()
+
+
+ESCRITORES = {"CSV": _escribir_csv, "Excel (XLSX)": _escribir_xlsx, "Parquet": _escribir_parquet}
+
+
+def escribir_archivo(bloques, formato, al_avanzar=None, total=0, hoja="Datos"):
+    """
+    Escribe los DataFrames de `bloques` en un archivo temporal del formato pedido, uno a la vez:
+    en memoria solo vive el bloque en curso, nunca el archivo completo como texto. Devuelve la
+    ruta. `al_avanzar(filas_escritas, total)` permite mostrar una barra de progreso.
+    """
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    _limpiar_antiguos()
+    extension, _ = FORMATOS[formato]
+    descriptor, ruta = tempfile.mkstemp(suffix=extension, dir=EXPORT_DIR)
+    os.close(descriptor)
+
+    escritas = 0
+    try:
+        for filas in ESCRITORES[formato](bloques, ruta, hoja):
+            escritas += filas
+            if al_avanzar:
+                al_avanzar(escritas, total)
+    except BaseException:
+        os.remove(ruta)
+        raise
+    return ruta
+
+
+def exportar(motor, filtros, columnas, formato, al_avanzar=None, filas_por_bloque=FILAS_POR_BLOQUE):
+    """Escribe las citas filtradas en un archivo temporal del formato pedido, bloque a bloque. Devuelve la ruta."""
+    return escribir_archivo(motor.iterar(filtros, columnas, filas_por_bloque), formato, al_avanzar,
+                            total=motor.contar(filtros), hoja="Citas")
@@ -0,0 +1,72 @@
+import functools
+import os
+
+import pandas as pd
+
+import text_utils as tu
+
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "gazetteer_municipios.csv")
+CENTRO_COLOMBIA = {"lat": 4.6, "lon": -74.1}
+
+
+@functools.lru_cache(maxsize=1)
+def cargar_gazetteer():
+    """
+    Gazetteer offline de municipios (código DANE y centroide), con una fila por nombre
+    normalizado: el nombre oficial más cada alias declarado en la columna 'alias'.
+    """
+    gaz = pd.read_csv(GAZETTEER_PATH, dtype={"codigo_dane": str}, keep_default_na=False)
+    gaz["nombres"] = (gaz["municipio"] + "|" + gaz["alias"]).str.split("|")
+    gaz = gaz.explode("nombres")
+    gaz = gaz[gaz["nombres"] != ""]
+    gaz["clave"] = tu.normalizar_texto(gaz["nombres"])
+    gaz["clave_departamento"] = tu.normalizar_texto(gaz["departamento"])
+    gaz = gaz.drop_duplicates(["clave", "clave_departamento"])
+    return gaz[["clave", "clave_departamento", "codigo_dane", "municipio", "departamento", "latitud", "longitud"]].reset_index(drop=True)
+
+
+def _unir_gazetteer(rollup):
+    """Añade código DANE y centroide: primero por municipio+departamento, luego solo por nombre si no es ambiguo."""
+    gaz = cargar_gazetteer()
+    columnas_geo = ["codigo_dane", "latitud", "longitud"]
+
+    if "clave_departamento" in rollup.columns:
+        rollup = rollup.merge(gaz[["clave", "clave_departamento"] + columnas_geo], on=["clave", "clave_departamento"], how="left")
+    else:
+        rollup = rollup.assign(**{c: pd.NA for c in columnas_geo})
+
+    unicos = gaz[~gaz["clave"].duplicated(keep=False)].set_index("clave")
+    sin_ubicar = rollup["codigo_dane"].isna()
+    for col in columnas_geo:
+        rollup.loc[sin_ubicar, col] = rollup.loc[sin_ubicar, "clave"].map(unicos[col])
+    rollup["latitud"] = pd.to_numeric(rollup["latitud"], errors="coerce")
+    rollup["longitud"] = pd.to_numeric(rollup["longitud"], errors="coerce")
+    return rollup
+
+
+def construir_rollup(df, columna, columna_departamento=None, georreferenciar=True):
+    """
+    Tabla con un registro por ubicación (municipio o barrio) y su número de establecimientos,
+    ordenada de mayor a menor. Se calcula una vez por versión del dataset; los filtros por
+    ubicación y los Top 15 se resuelven sobre esta tabla sin volver a recorrer las filas.
+    """
+    columnas = ["ubicacion", "establecimientos", "porcentaje"]
+    if columna not in df.columns or df.empty:
+        return pd.DataFrame(columns=columnas)
+
+    conteos = df[columna].value_counts()
+    conteos = conteos[conteos > 0]
+    rollup = pd.DataFrame({"ubicacion": conteos.index.astype(str), "establecimientos": conteos.to_numpy()})
+    rollup["porcentaje"] = rollup["establecimientos"] / rollup["establecimientos"].sum() * 100
+
+    if columna_departamento and columna_departamento in df.columns:
+        # Departamento dominante de cada ubicación (hay municipios homónimos en varios departamentos)
+        pares = df.groupby([columna, columna_departamento], observed=True).size().sort_values(ascending=False).reset_index()
+        dominante = pares.drop_duplicates(columna).set_index(columna)[columna_departamento]
+        rollup["departamento"] = rollup["ubicacion"].map(dominante.astype(str))
+        rollup["clave_departamento"] = tu.normalizar_texto(rollup["departamento"])
+
+    rollup["clave"] = tu.normalizar_texto(rollup["ubicacion"])
+    if georreferenciar:
+        rollup = _unir_gazetteer(rollup)
+    return rollup.drop(columns=["clave_departamento"], errors="ignore")
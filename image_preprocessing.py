@@ -0,0 +1,109 @@
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from PIL import Image, ImageOps
+
+from asset_pipeline import MIME, soporta
+
+# --- Configuración ---
+LADO_MAX = 1024               # Gemini reescala internamente; más resolución solo cuesta latencia y tokens
+FORMATO_PREFERIDO = "WEBP"    # con respaldo a JPEG si Pillow no trae WebP
+CALIDAD = {"WEBP": 82, "JPEG": 85}
+MAX_EN_CACHE = 32
+# Margen alrededor del rostro detectado (en anchos/altos del rostro) para conservar el cabello
+MARGEN_ROSTRO = {"lados": 0.8, "arriba": 1.0, "abajo": 0.6}
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class FotoProcesada:
+    imagen: Image.Image
+    datos: bytes
+    mime: str
+    huella: str                   # sha256 de los bytes originales + parámetros
+    info: dict = field(default_factory=dict)
+
+
+def _detectar_rostro(img):
+    """Caja (x, y, ancho, alto) del rostro más grande con el Haar cascade de OpenCV, o None.
+    OpenCV es opcional: si no está instalado no se recorta."""
+    try:
+        import cv2
+        import numpy as np
+    except ImportError:
+        return None
+    gris = cv2.cvtColor(np.asarray(img.convert("RGB")), cv2.COLOR_RGB2GRAY)
+    detector = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+    minimo = max(40, min(gris.shape) // 10)
+    rostros = detector.detectMultiScale(gris, scaleFactor=1.1, minNeighbors=5, minSize=(minimo, minimo))
+    if len(rostros) == 0:
+        return None
+    return max(rostros, key=lambda r: r[2] * r[3])
+
+
+def _recortar_rostro(img):
+    caja = _detectar_rostro(img)
+    if caja is None:
+        return img, False
+    x, y, w, h = (int(v) for v in caja)
+    izquierda = max(0, x - int(w * MARGEN_ROSTRO["lados"]))
+    derecha = min(img.width, x + w + int(w * MARGEN_ROSTRO["lados"]))
+    arriba = max(0, y - int(h * MARGEN_ROSTRO["arriba"]))
+    abajo = min(img.height, y + h + int(h * MARGEN_ROSTRO["abajo"]))
+    return img.crop((izquierda, arriba, derecha, abajo)), True
+
+
+def _procesar(datos, lado_max, recortar_rostro, formato):
+    with Image.open(io.BytesIO(datos)) as original:
+        formato_original, tamano_original = original.format, original.size
+        original.draft("RGB", (lado_max * 2, lado_max * 2))  # JPEG: decodifica ya reducido (escalado DCT)
+        img = ImageOps.exif_transpose(original)   # las fotos de celular vienen rotadas por EXIF
+        img = img.convert("RGB")
+    # Reducir antes de detectar: el detector es mucho más rápido y no pierde precisión útil
+    img.thumbnail((lado_max * 2, lado_max * 2), Image.LANCZOS)
+    recortada = False
+    if recortar_rostro:
+        img, recortada = _recortar_rostro(img)
+    img.thumbnail((lado_max, lado_max), Image.LANCZOS)
+
+    buffer = io.BytesIO()
+    img.save(buffer, format=formato, quality=CALIDAD[formato], **({"method": 4} if formato == "WEBP" else {"optimize": True}))
+    info = {
+        "formato_original": formato_original, "tamano_original": tamano_original, "tamano_final": img.size,
+        "bytes_originales": len(datos), "bytes_finales": buffer.tell(), "rostro_recortado": recortada,
+    }
+    return img, buffer.getvalue(), info
+
+
+def preprocesar_foto(datos, lado_max=LADO_MAX, recortar_rostro=True, formato=FORMATO_PREFERIDO):
+    """
+    Prepara una foto subida para enviarla al modelo: orientación EXIF, recorte opcional al
+    rostro, reducción a `lado_max` px y recodificación compacta. El resultado se guarda por
+    huella del contenido, así que la misma foto en otra pestaña o en otro rerun no se reprocesa.
+    """
+    formato = formato if soporta(formato) else "JPEG"
+    huella = hashlib.sha256(datos).hexdigest() + f":{lado_max}:{int(recortar_rostro)}:{formato}"
+    with _lock:
+        if huella in _cache:
+            _cache.move_to_end(huella)
+            return _cache[huella]
+    img, codificados, info = _procesar(datos, lado_max, recortar_rostro, formato)
+    foto = FotoProcesada(img, codificados, MIME[formato], huella, info)
+    with _lock:
+        _cache[huella] = foto
+        while len(_cache) > MAX_EN_CACHE:
+            _cache.popitem(last=False)
+    return foto
+
+
+def resumen(foto):
+    """Texto corto para mostrar al usuario cuánto se redujo la imagen."""
+    i = foto.info
+    return (f"{i['tamano_original'][0]}×{i['tamano_original'][1]} → {i['tamano_final'][0]}×{i['tamano_final'][1]} px · "
+            f"{i['bytes_originales'] / 1024:,.0f} KB → {i['bytes_finales'] / 1024:,.0f} KB"
+            + (" · recortada al rostro" if i["rostro_recortado"] else ""))
@@ -1,85 +1,66 @@
 import streamlit as st
 import sys
 import os
-import base64
-import pandas as pd
-import requests
-import google.generativeai as genai
-
-# --- FUNCIÓN PARA CODIFICAR IMÁGENES ---
-def get_image_as_base64(path):
-    try:
-        with open(path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode()
-    except FileNotFoundError:
-        return None
+import asset_pipeline as ap
 
 # --- FUNCIÓN DE DIAGNÓSTICO ---
 def run_diagnostics():
-    """Ejecuta y muestra los resultados de las pruebas del sistema directamente en la página."""
+    """Ejecuta en paralelo las pruebas del sistema y muestra una tabla de latencias."""
+    # Importaciones diferidas: solo se pagan al pulsar el botón de diagnóstico
+    import pandas as pd
+    import diagnostics as diag
+    import ai_client as ai
+    import dataset_loader as dl
+
     st.markdown("Esta sección comprueba las conexiones a la API de Gemini, la API desplegada y los datasets externos.")
     st.markdown("---")
 
-    # TEST 1: Conexión a la API de Gemini
-    st.subheader("1. Prueba de Conexión con Google Gemini")
+    sondas = {}
     try:
-        api_key = st.secrets["GOOGLE_API_KEY"]
-        genai.configure(api_key=api_key)
-        st.info("Intentando listar los modelos de Gemini disponibles...")
-        models_list = [m.name for m in genai.list_models()]
-        st.success("✅ ¡ÉXITO! Conexión con la API de Google Gemini establecida.")
-        with st.expander("Ver modelos encontrados"):
-            st.write(models_list)
-            if 'models/gemini-2.5-flash-preview-05-20' in models_list:
-                st.success("El modelo usado en el proyecto fue encontrado (gemini-2.5-flash-preview-05-20).")
-            else:
-                st.warning("ADVERTENCIA: El modelo usado en  no aparece en la lista.")
-    except Exception as e:
-        st.error("❌ ERROR: No se pudo conectar con la API de Google Gemini.")
-        st.error(f"Detalle: {e}")
-        st.error("Verifica que tu API Key sea correcta y esté en el archivo `.streamlit/secrets.toml`.")
-
-    st.markdown("---")
-
-    # TEST 2: Conexión a tu API Local
-    st.subheader("2. Prueba de Conexión a la API")
+        sondas["Google Gemini"] = diag.sonda_gemini(st.secrets["GOOGLE_API_KEY"], ai.MODELO_GEMINI)
+    except Exception:
+        st.error("❌ No se encontró `GOOGLE_API_KEY` en el archivo `.streamlit/secrets.toml`.")
     API_URL = st.secrets["API_URL"]
-    endpoints = ["clientes", "historial/citas", "barberos", "sedes", "servicios"]
-    with st.spinner("Probando conexión con los endpoints de la API..."):
-        all_successful = True
-        for endpoint in endpoints:
-            try:
-                response = requests.get(f"{API_URL}/{endpoint}", timeout=5)
-                response.raise_for_status()
-                st.success(f"✅ Conexión exitosa con `/{endpoint}` ({len(response.json())} registros).")
-            except Exception as e:
-                st.error(f"❌ ERROR al conectar con `/{endpoint}`. Revisa que tu API (ApiApplication.java) esté corriendo.")
-                st.expander("Ver detalle del error").error(e)
-                all_successful = False
-        if all_successful:
-            st.success("✅ ¡ÉXITO! Todos los endpoints de la API respondieron correctamente.")
-
-    st.markdown("---")
+    for endpoint in ["clientes", "historial/citas", "barberos", "sedes", "servicios"]:
+        # La tupla fija el plazo de la sonda en el motor, no solo el timeout del socket
+        sondas[f"API /{endpoint}"] = (diag.sonda_http(f"{API_URL}/{endpoint}", plazo=5), 5)
+    for nombre, spec in dl.DATASETS.items():
+        # Solo pedimos los primeros KB del CSV: basta para saber si datos.gov.co responde
+        sondas[nombre] = diag.sonda_http(spec["url"], rango=diag.BYTES_RANGO)
+
+    with st.spinner("Ejecutando todas las pruebas en paralelo..."):
+        resultados = diag.ejecutar_sondas(sondas)
+
+    fallidas = [r for r in resultados if not r["ok"]]
+    if fallidas:
+        st.error(f"❌ {len(fallidas)} de {len(resultados)} pruebas fallaron: {', '.join(r['sonda'] for r in fallidas)}.")
+    else:
+        st.success(f"✅ ¡ÉXITO! Las {len(resultados)} pruebas respondieron correctamente.")
+    mas_lenta = resultados[0]
+    st.info(f"🐢 Dependencia más lenta: **{mas_lenta['sonda']}** ({mas_lenta['total_ms']:,.0f} ms).")
+
+    tabla = pd.DataFrame(resultados)
+    tabla["estado_txt"] = tabla["ok"].map({True: "✅", False: "❌"})
+    tabla["kb"] = tabla["bytes"] / 1024
+    st.dataframe(
+        tabla[["estado_txt", "sonda", "estado", "conexion_ms", "ttfb_ms", "total_ms", "kb", "detalle"]],
+        use_container_width=True, hide_index=True,
+        column_config={
+            "estado_txt": st.column_config.TextColumn("", width="small"),
+            "sonda": "Prueba",
+            "estado": st.column_config.TextColumn("HTTP"),
+            "conexion_ms": st.column_config.NumberColumn("Conexión (ms)", format="%.0f"),
+            "ttfb_ms": st.column_config.NumberColumn("Primer byte (ms)", format="%.0f"),
+            "total_ms": st.column_config.ProgressColumn("Total (ms)", format="%.0f", min_value=0, max_value=float(tabla["total_ms"].max() or 1)),
+            "kb": st.column_config.NumberColumn("Tamaño (KB)", format="%.1f"),
+            "detalle": "Detalle",
+        },
+    )
 
-    # TEST 3: Prueba de Carga de Datasets Externos
-    st.subheader("3. Prueba de Carga de Datasets Externos")
-    datasets_externos = {
-        "Nacional - Establecimientos de Belleza": "https://www.datos.gov.co/api/views/e27n-di57/rows.csv?accessType=DOWNLOAD",
-        "Risaralda - Estética Facial y Corporal": "https://www.datos.gov.co/api/views/92e4-cjqu/rows.csv?accessType=DOWNLOAD",
-        "Estética Local (Ejemplo)": "https://www.datos.gov.co/api/views/mwxa-drpn/rows.csv?accessType=DOWNLOAD",
-    }
-    with st.spinner("Probando la descarga y lectura de los datasets de datos.gov.co..."):
-        all_successful_external = True
-        for nombre, url in datasets_externos.items():
-            try:
-                df = pd.read_csv(url, nrows=10) # Leemos solo 10 filas para una prueba rápida
-                st.success(f"✅ Carga exitosa de '{nombre}'.")
-            except Exception as e:
-                st.error(f"❌ ERROR al cargar el dataset '{nombre}'.")
-                st.expander("Ver detalle del error").error(e)
-                all_successful_external = False
-        if all_successful_external:
-            st.success("✅ ¡ÉXITO! Todos los datasets externos se cargaron correctamente.")
+    gemini = next((r for r in resultados if r["sonda"] == "Google Gemini" and r.get("modelos")), None)
+    if gemini:
+        with st.expander("Ver modelos de Gemini encontrados"):
+            st.write(gemini["modelos"])
 
 
 # --- Rutas a las imágenes ---
@@ -90,10 +71,11 @@ img_dev1_path = os.path.join(ASSETS_DIR, "1Desarrollador.png")
 img_dev2_path = os.path.join(ASSETS_DIR, "2Desarrollador.png")
 img_dev3_path = os.path.join(ASSETS_DIR, "3Desarrollador.png")
 
-# Codificamos las imágenes
-dev1_base64 = get_image_as_base64(img_dev1_path)
-dev2_base64 = get_image_as_base64(img_dev2_path)
-dev3_base64 = get_image_as_base64(img_dev3_path)
+# Versiones reducidas (WebP/AVIF) servidas como archivos estáticos en lugar de base64
+ATRIBUTOS_DEV = 'class="developer-image" width="120" height="160" loading="lazy"'
+dev1_html = ap.etiqueta_picture(img_dev1_path, 240, ATRIBUTOS_DEV)
+dev2_html = ap.etiqueta_picture(img_dev2_path, 240, ATRIBUTOS_DEV)
+dev3_html = ap.etiqueta_picture(img_dev3_path, 240, ATRIBUTOS_DEV)
 
 # --- Configuración de la Página ---
 st.set_page_config(
@@ -107,7 +89,7 @@ st.set_page_config(
 col1, col2 = st.columns([0.6, 0.4], gap="large")
 with col1:
     if img_hero_path and os.path.exists(img_hero_path):
-        st.image(img_hero_path, caption="El arte del cuidado masculino.", use_container_width=True)
+        st.image(ap.ruta_optimizada(img_hero_path, 1024), caption="El arte del cuidado masculino.", use_container_width=True)
 
 with col2:
     st.markdown("""
@@ -149,13 +131,13 @@ with col2:
     )
 
 # --- Barra Lateral (Sidebar) ---
-logo_base64 = get_image_as_base64(img_logo_path)
-if logo_base64:
+logo_html = ap.etiqueta_picture(img_logo_path, 200, 'width="100" style="cursor: pointer;"')
+if logo_html:
     # **CAMBIO CLAVE**: Se usa HTML para hacer el logo clickeable y que recargue la página.
     st.sidebar.markdown(
         f"""
         <a href="." target="_self">
-            <img src="data:image/png;base64,{logo_base64}" width="100" style="cursor: pointer;">
+            {logo_html}
         </a>
         """,
         unsafe_allow_html=True
@@ -175,14 +157,14 @@ st.markdown("<br><br><h2 style='text-align: center; color: #D4AF37;'>Conoce a lo
 st.markdown("""<style>.developer-card{background-color:#262730;border-radius:15px;padding:20px;text-align:center;height:100%;display:flex;flex-direction:column;justify-content:center;align-items:center;}.developer-image{width:120px;height:160px;border-radius:10px;object-fit:cover;margin-bottom:15px;border:3px solid #D4AF37;}</style>""", unsafe_allow_html=True)
 col_dev1, col_dev2, col_dev3 = st.columns(3, gap="large")
 with col_dev1:
-    if dev1_base64:
-        st.markdown(f'<div class="developer-card"><img src="data:image/png;base64,{dev1_base64}" class="developer-image"><h4>Andrés Dario Vallejo Uchima</h4><p>📞 +57 319 3754588<br>📧 <a href="mailto:advallejouc@cesde.net">advallejouc@cesde.net</a><br>🐙 <a href="https://github.com/AndresVallejo1" target="_blank">AndresVallejo1</a></p></div>', unsafe_allow_html=True)
+    if dev1_html:
+        st.markdown(f'<div class="developer-card">{dev1_html}<h4>Andrés Dario Vallejo Uchima</h4><p>📞 +57 319 3754588<br>📧 <a href="mailto:advallejouc@cesde.net">advallejouc@cesde.net</a><br>🐙 <a href="https://github.com/AndresVallejo1" target="_blank">AndresVallejo1</a></p></div>', unsafe_allow_html=True)
 with col_dev2:
-    if dev2_base64:
-        st.markdown(f'<div class="developer-card"><img src="data:image/png;base64,{dev2_base64}" class="developer-image"><h4>Juan Manuel Rivera Restrepo</h4><p>📞 +57 302 3676712<br>📧 <a href="mailto:jmriverare@cesde.net">jmriverare@cesde.net</a><br>🐙 <a href="https://github.com/JuanRivera24" target="_blank">JuanRivera24</a></p></div>', unsafe_allow_html=True)
+    if dev2_html:
+        st.markdown(f'<div class="developer-card">{dev2_html}<h4>Juan Manuel Rivera Restrepo</h4><p>📞 +57 302 3676712<br>📧 <a href="mailto:jmriverare@cesde.net">jmriverare@cesde.net</a><br>🐙 <a href="https://github.com/JuanRivera24" target="_blank">JuanRivera24</a></p></div>', unsafe_allow_html=True)
 with col_dev3:
-    if dev3_base64:
-        st.markdown(f'<div class="developer-card"><img src="data:image/png;base64,{dev3_base64}" class="developer-image"><h4>Alejandro Urrego Cardona</h4><p>📞 +57 314 7692898<br>📧 <a href="mailto:aurregoc@cesde.net">aurregoc@cesde.net</a><br>🐙 <a href="https://github.com/alejourrego" target="_blank">AlejoU</a></p></div>', unsafe_allow_html=True)
+    if dev3_html:
+        st.markdown(f'<div class="developer-card">{dev3_html}<h4>Alejandro Urrego Cardona</h4><p>📞 +57 314 7692898<br>📧 <a href="mailto:aurregoc@cesde.net">aurregoc@cesde.net</a><br>🐙 <a href="https://github.com/alejourrego" target="_blank">AlejoU</a></p></div>', unsafe_allow_html=True)
 
 
 # --- SECCIÓN DE DIAGNÓSTICO ---
@@ -0,0 +1,258 @@
+import contextlib
+import functools
+import json
+import os
+import resource
+import statistics
+import threading
+import time
+from collections import Counter, deque
+
+# --- Configuración ---
+# Se activa con la variable de entorno KB_PERF=1 o abriendo cualquier página con ?perf=1
+# (queda activo para esa sesión). Desactivado, cada span cuesta una consulta a un thread-local.
+HABILITADO_GLOBAL = os.environ.get("KB_PERF") == "1"
+EXPORT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".perf")
+MAX_RERUNS = 50
+
+_local = threading.local()      # Cada sesión de Streamlit ejecuta su script en su propio hilo
+_lock = threading.Lock()
+_historial = deque(maxlen=MAX_RERUNS)
+_contadores = Counter()
+_NULO = contextlib.nullcontext()
+
+
+class _Span:
+    __slots__ = ("nombre", "inicio", "duracion_ms", "hijos")
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self.inicio = time.perf_counter()
+        self.duracion_ms = None
+        self.hijos = []
+
+    def a_dict(self):
+        return {"nombre": self.nombre, "duracion_ms": self.duracion_ms, "hijos": [h.a_dict() for h in self.hijos]}
+
+
+def activo():
+    """True si hay una traza abierta en el hilo actual."""
+    return bool(getattr(_local, "pila", None))
+
+
+# --- Spans y contadores ---
+@contextlib.contextmanager
+def _span_activo(nombre):
+    pila = _local.pila
+    nodo = _Span(nombre)
+    pila[-1].hijos.append(nodo)
+    pila.append(nodo)
+    try:
+        yield nodo
+    finally:
+        nodo.duracion_ms = (time.perf_counter() - nodo.inicio) * 1000
+        pila.pop()
+
+
+def span(nombre):
+    """Context manager que mide una etapa y la cuelga del span actual del rerun."""
+    if not getattr(_local, "pila", None):
+        return _NULO
+    return _span_activo(nombre)
+
+
+def medir(nombre):
+    """Decorador equivalente a envolver toda la función en `span(nombre)`."""
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if not getattr(_local, "pila", None):
+                return funcion(*args, **kwargs)
+            with _span_activo(nombre):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+def contar(nombre, n=1):
+    if HABILITADO_GLOBAL or getattr(_local, "pila", None):
+        with _lock:
+            _contadores[nombre] += n
+
+
+def rastrear_cache(nombre):
+    """
+    Decorador para poner *encima* de @st.cache_data: cuenta llamadas. Dentro del cuerpo de la
+    función cacheada se llama a `fallo_cache(nombre)`, que solo se ejecuta cuando no hay acierto.
+    """
+    def decorador(funcion_cacheada):
+        @functools.wraps(funcion_cacheada)
+        def envoltura(*args, **kwargs):
+            contar(f"cache.{nombre}.llamadas")
+            return funcion_cacheada(*args, **kwargs)
+        envoltura.clear = funcion_cacheada.clear
+        return envoltura
+    return decorador
+
+
+def fallo_cache(nombre):
+    contar(f"cache.{nombre}.fallos")
+
+
+# --- Ciclo de vida del rerun ---
+def _habilitado_para_sesion():
+    if HABILITADO_GLOBAL:
+        return True
+    import streamlit as st
+    try:
+        if st.query_params.get("perf") == "1":
+            st.session_state["_perf_habilitado"] = True
+        return bool(st.session_state.get("_perf_habilitado"))
+    except Exception:
+        return False
+
+
+def iniciar_rerun(pagina):
+    """Abre la traza raíz del rerun actual (llamar justo después de st.set_page_config)."""
+    _local.pila = None
+    if _habilitado_para_sesion():
+        raiz = _Span(pagina)
+        _local.pila = [raiz]
+
+
+def finalizar_rerun():
+    """Cierra la traza del rerun y la guarda en el historial del proceso."""
+    pila = getattr(_local, "pila", None)
+    if not pila:
+        return None
+    raiz = pila[0]
+    raiz.duracion_ms = (time.perf_counter() - raiz.inicio) * 1000
+    _local.pila = None
+    registro = {"pagina": raiz.nombre, "fecha": time.time(), "arbol": raiz.a_dict(), "memoria": memoria_mb()}
+    with _lock:
+        _historial.append(registro)
+    return registro
+
+
+# --- Consultas ---
+def memoria_mb():
+    """RSS actual (si /proc está disponible) y pico del proceso, en MB."""
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    try:
+        with open("/proc/self/statm") as f:
+            actual = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (OSError, ValueError):
+        actual = None
+    return {"rss_mb": actual, "pico_mb": pico}
+
+
+def _aplanar(arbol, profundidad=0):
+    filas = [{"etapa": arbol["nombre"], "profundidad": profundidad, "duracion_ms": arbol["duracion_ms"]}]
+    for hijo in arbol["hijos"]:
+        filas.extend(_aplanar(hijo, profundidad + 1))
+    return filas
+
+
+def etapas_mas_lentas(limite=15):
+    """Agrega todas las etapas del historial: número de veces, mediana, máximo y total."""
+    with _lock:
+        registros = list(_historial)
+    duraciones = {}
+    for registro in registros:
+        for fila in _aplanar(registro["arbol"])[1:]:
+            duraciones.setdefault(fila["etapa"], []).append(fila["duracion_ms"])
+    resumen = [
+        {"etapa": e, "veces": len(d), "mediana_ms": statistics.median(d), "max_ms": max(d), "total_ms": sum(d)}
+        for e, d in duraciones.items()
+    ]
+    return sorted(resumen, key=lambda r: r["total_ms"], reverse=True)[:limite]
+
+
+def tasas_de_acierto():
+    with _lock:
+        contadores = dict(_contadores)
+    tasas = {}
+    for clave, llamadas in contadores.items():
+        if clave.startswith("cache.") and clave.endswith(".llamadas") and llamadas:
+            nombre = clave[len("cache."):-len(".llamadas")]
+            fallos = contadores.get(f"cache.{nombre}.fallos", 0)
+            tasas[nombre] = {"llamadas": llamadas, "fallos": fallos, "acierto": max(0.0, 1 - fallos / llamadas)}
+    return tasas
+
+
+# --- Exportación ---
+def exportar_json(ruta=None):
+    ruta = ruta or os.path.join(EXPORT_DIR, "rendimiento.json")
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with _lock:
+        datos = {"reruns": list(_historial), "contadores": dict(_contadores)}
+    datos["memoria"] = memoria_mb()
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(datos, f, ensure_ascii=False, indent=2)
+    return ruta
+
+
+def texto_prometheus():
+    """Métricas en formato de exposición de texto de Prometheus."""
+    lineas = ["# TYPE kb_etapa_duracion_ms summary"]
+    for r in etapas_mas_lentas(limite=None):
+        etiqueta = r["etapa"].replace('"', "'")
+        lineas.append(f'kb_etapa_duracion_ms_sum{{etapa="{etiqueta}"}} {r["total_ms"]:.3f}')
+        lineas.append(f'kb_etapa_duracion_ms_count{{etapa="{etiqueta}"}} {r["veces"]}')
+    lineas.append("# TYPE kb_contador_total counter")
+    with _lock:
+        contadores = dict(_contadores)
+    for nombre, valor in sorted(contadores.items()):
+        lineas.append(f'kb_contador_total{{nombre="{nombre}"}} {valor}')
+    memoria = memoria_mb()
+    lineas.append("# TYPE kb_memoria_pico_bytes gauge")
+    lineas.append(f"kb_memoria_pico_bytes {int(memoria['pico_mb'] * 1024 ** 2)}")
+    if memoria["rss_mb"] is not None:
+        lineas.append("# TYPE kb_memoria_rss_bytes gauge")
+        lineas.append(f"kb_memoria_rss_bytes {int(memoria['rss_mb'] * 1024 ** 2)}")
+    return "\n".join(lineas) + "\n"
+
+
+def exportar_prometheus(ruta=None):
+    ruta = ruta or os.path.join(EXPORT_DIR, "metrics.prom")
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, "w", encoding="utf-8") as f:
+        f.write(texto_prometheus())
+    return ruta
+
+
+# --- Panel ---
+def mostrar_panel():
+    """Cierra la traza del rerun y, si la instrumentación está activa, la muestra en la barra lateral."""
+    registro = finalizar_rerun()
+    if registro is None:
+        return
+    import pandas as pd
+    import streamlit as st
+
+    with st.sidebar.expander("⏱️ Rendimiento", expanded=False):
+        memoria = registro["memoria"]
+        col1, col2 = st.columns(2)
+        col1.metric("Rerun", f"{registro['arbol']['duracion_ms']:,.0f} ms")
+        col2.metric("RSS", f"{memoria['rss_mb']:,.0f} MB" if memoria["rss_mb"] else f"{memoria['pico_mb']:,.0f} MB pico")
+
+        st.caption("Etapas de este rerun")
+        filas = _aplanar(registro["arbol"])
+        st.dataframe(
+            pd.DataFrame([{"Etapa": "  " * f["profundidad"] + f["etapa"], "ms": round(f["duracion_ms"], 1)} for f in filas]),
+            hide_index=True, use_container_width=True,
+        )
+
+        st.caption(f"Etapas más lentas (últimos {len(_historial)} reruns)")
+        st.dataframe(pd.DataFrame(etapas_mas_lentas()), hide_index=True, use_container_width=True)
+
+        tasas = tasas_de_acierto()
+        if tasas:
+            st.caption("Aciertos de caché")
+            st.dataframe(pd.DataFrame.from_dict(tasas, orient="index").style.format({"acierto": "{:.0%}"}), use_container_width=True)
+
+        col_json, col_prom = st.columns(2)
+        if col_json.button("Exportar JSON", key="perf_json"):
+            st.caption(f"Guardado en `{exportar_json()}`")
+        if col_prom.button("Exportar Prometheus", key="perf_prom"):
+            st.caption(f"Guardado en `{exportar_prometheus()}`")
@@ -0,0 +1,217 @@
+import hashlib
+import heapq
+import itertools
+import json
+import random
+import threading
+import time
+from concurrent.futures import CancelledError, Future
+
+# --- Configuración por defecto ---
+MAX_CONCURRENTES = 4
+PETICIONES_POR_MINUTO = 30
+RAFAGA = 5                    # tokens acumulables cuando no hay tráfico
+MAX_REINTENTOS = 4
+ESPERA_BASE_SEG = 1.0
+ESPERA_MAX_SEG = 20.0
+PLAZO_COLA_SEG = 180.0        # tiempo máximo que una solicitud espera turno antes de rendirse
+CODIGOS_REINTENTABLES = {429, 503}
+ERRORES_REINTENTABLES = {"ResourceExhausted", "TooManyRequests", "ServiceUnavailable"}
+
+
+class PasarelaSaturadaError(RuntimeError):
+    """La solicitud no consiguió turno dentro del plazo de la cola."""
+
+
+def es_reintentable(error):
+    """429/503 del SDK de Google (api_core expone `.code` como entero HTTP) o equivalentes por nombre."""
+    codigo = getattr(error, "code", None)
+    if isinstance(codigo, int) and codigo in CODIGOS_REINTENTABLES:
+        return True
+    return type(error).__name__ in ERRORES_REINTENTABLES
+
+
+def huella_solicitud(modelo, contenido, kwargs):
+    """Clave de coalescencia: modelo + contenido (texto, bytes, blobs o imágenes PIL) + parámetros."""
+    h = hashlib.sha256(str(getattr(modelo, "model_name", type(modelo).__name__)).encode())
+    partes = contenido if isinstance(contenido, (list, tuple)) else [contenido]
+    for parte in partes:
+        if isinstance(parte, str):
+            h.update(b"t" + parte.encode("utf-8"))
+        elif isinstance(parte, (bytes, bytearray)):
+            h.update(b"b" + bytes(parte))
+        elif isinstance(parte, dict) and "data" in parte:
+            h.update(b"d" + str(parte.get("mime_type")).encode() + bytes(parte["data"]))
+        elif hasattr(parte, "tobytes") and hasattr(parte, "size"):
+            h.update(f"i{getattr(parte, 'mode', '')}{parte.size}".encode() + parte.tobytes())
+        else:
+            h.update(b"r" + repr(parte).encode())
+    h.update(json.dumps(kwargs, sort_keys=True, default=repr).encode())
+    return h.hexdigest()
+
+
+class CuboTokens:
+    """Limitador de tasa token-bucket. No es thread-safe: lo protege el candado de la pasarela."""
+
+    def __init__(self, por_minuto, rafaga):
+        self.tasa = por_minuto / 60.0
+        self.capacidad = float(rafaga)
+        self.tokens = float(rafaga)
+        self._ultimo = time.monotonic()
+
+    def _recargar(self):
+        ahora = time.monotonic()
+        self.tokens = min(self.capacidad, self.tokens + (ahora - self._ultimo) * self.tasa)
+        self._ultimo = ahora
+
+    def espera(self):
+        """Segundos hasta que haya un token disponible (0 si ya lo hay)."""
+        self._recargar()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.tasa
+
+    def tomar(self):
+        self.tokens -= 1
+
+    def vaciar(self):
+        """Tras un 429 el servidor ya nos está limitando: no gastar la ráfaga acumulada."""
+        self._recargar()
+        self.tokens = min(self.tokens, 0.0)
+
+
+class PasarelaLLM:
+    """
+    Pasarela compartida por todas las sesiones del proceso para las llamadas a `generate_content`.
+
+    - Cola FIFO por número de turno; quien espera recibe su posición con `al_esperar(posicion)`.
+    - Como máximo `max_concurrentes` llamadas en curso y `por_minuto` iniciadas por minuto.
+    - Los 429/503 se reintentan con backoff exponencial con jitter, conservando el turno original.
+    - Las solicitudes idénticas que coinciden en el tiempo comparten una sola llamada al modelo,
+      salvo las que piden `coalescer=False` (prompts creativos cuya respuesta debe variar).
+
+    `modelo` puede ser cualquier objeto con `generate_content(contenido, **kwargs)`, así que se
+    puede ejercitar con un modelo falso local (ver benchmarks/carga_llm.py).
+    """
+
+    def __init__(self, max_concurrentes=MAX_CONCURRENTES, por_minuto=PETICIONES_POR_MINUTO, rafaga=RAFAGA,
+                 max_reintentos=MAX_REINTENTOS, espera_base=ESPERA_BASE_SEG, espera_max=ESPERA_MAX_SEG,
+                 plazo_cola=PLAZO_COLA_SEG):
+        self.max_concurrentes = max_concurrentes
+        self.max_reintentos = max_reintentos
+        self.espera_base = espera_base
+        self.espera_max = espera_max
+        self.plazo_cola = plazo_cola
+        self._cubo = CuboTokens(por_minuto, rafaga)
+        self._cond = threading.Condition()
+        self._cola = []                 # heap de turnos esperando
+        self._turnos = itertools.count()
+        self._activos = 0
+        self._en_vuelo = {}             # huella -> Future compartido
+        self.estadisticas = {"solicitudes": 0, "llamadas": 0, "coalescidas": 0, "reintentos": 0, "saturadas": 0}
+
+    # --- Turnos ---
+    def _adquirir(self, turno, al_esperar, limite):
+        ultima_posicion = None
+        with self._cond:
+            heapq.heappush(self._cola, turno)
+        try:
+            while True:
+                with self._cond:
+                    posicion = 1 + sum(1 for t in self._cola if t < turno)
+                    espera = 0.5
+                    if posicion == 1 and self._activos < self.max_concurrentes:
+                        espera = self._cubo.espera()
+                        if espera == 0:
+                            heapq.heappop(self._cola)
+                            self._cubo.tomar()
+                            self._activos += 1
+                            self.estadisticas["llamadas"] += 1
+                            self._cond.notify_all()
+                            return
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        self.estadisticas["saturadas"] += 1
+                        raise PasarelaSaturadaError(
+                            f"El asistente está saturado: la solicitud esperó {self.plazo_cola:.0f} s sin turno. Intenta de nuevo en unos minutos."
+                        )
+                    if posicion == ultima_posicion or al_esperar is None:
+                        self._cond.wait(min(espera, restante, 0.5))
+                        continue
+                # La notificación se hace fuera del candado: puede tocar la interfaz
+                ultima_posicion = posicion
+                al_esperar(posicion)
+        except BaseException:
+            # Plazo agotado o sesión interrumpida mientras esperaba (los avisos de Streamlit lanzan
+            # RerunException/StopException): el turno sale de la cola para no bloquear a los demás
+            with self._cond:
+                if turno in self._cola:
+                    self._cola.remove(turno)
+                    heapq.heapify(self._cola)
+                self._cond.notify_all()
+            raise
+
+    def _liberar(self):
+        with self._cond:
+            self._activos -= 1
+            self._cond.notify_all()
+
+    def _ejecutar(self, modelo, contenido, al_esperar, kwargs):
+        turno = next(self._turnos)
+        limite = time.monotonic() + self.plazo_cola
+        for intento in range(self.max_reintentos + 1):
+            self._adquirir(turno, al_esperar, limite)
+            try:
+                return modelo.generate_content(contenido, **kwargs)
+            except Exception as e:
+                if not es_reintentable(e) or intento == self.max_reintentos:
+                    raise
+                with self._cond:
+                    self._cubo.vaciar()
+                    self.estadisticas["reintentos"] += 1
+            finally:
+                self._liberar()
+            time.sleep(random.uniform(0, min(self.espera_max, self.espera_base * 2 ** intento)))
+
+    # --- API pública ---
+    def generar(self, modelo, contenido, al_esperar=None, coalescer=True, **kwargs):
+        """Equivalente a `modelo.generate_content(contenido, **kwargs)` pasando por la cola."""
+        if not coalescer:
+            with self._cond:
+                self.estadisticas["solicitudes"] += 1
+            return self._ejecutar(modelo, contenido, al_esperar, kwargs)
+        clave = huella_solicitud(modelo, contenido, kwargs)
+        with self._cond:
+            self.estadisticas["solicitudes"] += 1
+        while True:
+            with self._cond:
+                futuro = self._en_vuelo.get(clave)
+                propio = futuro is None
+                if propio:
+                    futuro = self._en_vuelo[clave] = Future()
+                else:
+                    self.estadisticas["coalescidas"] += 1
+            if propio:
+                break
+            try:
+                return futuro.result()
+            except CancelledError:
+                continue  # quien hacía la llamada fue interrumpido: se vuelve a pedir
+        try:
+            resultado = self._ejecutar(modelo, contenido, al_esperar, kwargs)
+        except BaseException as e:
+            with self._cond:
+                self._en_vuelo.pop(clave, None)
+            # Los errores del modelo se comparten; una interrupción de esta sesión (rerun, stop) no
+            # es asunto de las demás: se cancela el futuro y quienes esperaban lo vuelven a pedir
+            if isinstance(e, Exception):
+                futuro.set_exception(e)
+            else:
+                futuro.cancel()
+            raise
+        with self._cond:
+            self._en_vuelo.pop(clave, None)
+        futuro.set_result(resultado)
+        return resultado
+
+    def estado(self):
+        with self._cond:
+            return {**self.estadisticas, "en_cola": len(self._cola), "activos": self._activos}
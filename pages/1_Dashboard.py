@@ -1,76 +1,86 @@
 import streamlit as st
 import plotly.express as px
+import plotly.graph_objects as go
 import pandas as pd
 import data_manager as dm
+import query_engine as qe
+import pronostico as pr
+import instrumentation as perf
 # import locale  <-- LÍNEA ELIMINADA
 
 # --- 1. CONFIGURACIÓN INICIAL ---
 # Bloque try-except de locale ELIMINADO
 
+MAX_COHORTES_GRAFICO = 24   # cohortes (filas) y meses (columnas) que se dibujan en el mapa de calor
+
 st.set_page_config(page_title="Dashboard | Kingdom Barber", page_icon="📊", layout="wide")
+perf.iniciar_rerun("Dashboard")
 st.markdown("<h1 style='text-align: center; color: #D4AF37;'>📊 Dashboard General</h1>", unsafe_allow_html=True)
 st.markdown("---")
 
 # --- 2. CARGA DE DATOS CORREGIDA ---
 @st.cache_data
-def cargar_y_procesar_datos():
-    """Carga y procesa todos los datos necesarios para el dashboard."""
+def cargar_y_procesar_datos(version_publicada):
+    """Carga y procesa todos los datos necesarios para el dashboard (una vez por versión de artefactos)."""
     df_vista, df_sedes = dm.obtener_vista_citas_completa()
     return df_vista, df_sedes
 
-df_vista_completa, df_sedes = cargar_y_procesar_datos()
+df_vista_completa, df_sedes = cargar_y_procesar_datos(dm.version_publicada())
 
 if df_vista_completa.empty:
     st.error("No se pudieron cargar los datos desde la API. Asegúrate de que la API de Java esté corriendo en http://localhost:8080.")
     st.stop()
 
+# Una sola huella por rerun: la comparten el motor, las anomalías, los pronósticos y las cohortes
+version = dm.version_datos(df_vista_completa)
+motor = dm.obtener_motor_consultas(version, df_vista_completa)
+
 # --- 3. FILTROS EN LA BARRA LATERAL ---
 st.sidebar.header("Filtros del Dashboard")
 lista_sedes = ['Todas'] + df_sedes['Nombre_Sede'].unique().tolist()
 sede_seleccionada = st.sidebar.selectbox("Selecciona una Sede", lista_sedes)
 
-if sede_seleccionada == 'Todas':
-    df_filtrado_parcial = df_vista_completa.copy()
-else:
-    df_filtrado_parcial = df_vista_completa[df_vista_completa['Nombre_Sede'] == sede_seleccionada]
-
-lista_barberos = ['Todos'] + sorted(df_filtrado_parcial['Nombre_Completo_Barbero'].dropna().unique().tolist())
-barbero_seleccionado = st.sidebar.selectbox("Selecciona un Barbero", lista_barberos)
-
-if barbero_seleccionado != 'Todos':
-    df_filtrado_parcial = df_filtrado_parcial[df_filtrado_parcial['Nombre_Completo_Barbero'] == barbero_seleccionado]
+# Los filtros se acumulan en un FiltroCitas y el motor reutiliza las filas ya filtradas por otras páginas
+with perf.span("filtros"):
+    filtros = qe.FiltroCitas(sede=sede_seleccionada)
+    lista_barberos = ['Todos'] + motor.opciones('Nombre_Completo_Barbero', filtros)
+    filtros = filtros.con(barbero=st.sidebar.selectbox("Selecciona un Barbero", lista_barberos))
 
-lista_clientes = ['Todos'] + sorted(df_filtrado_parcial['Nombre_Completo_Cliente'].dropna().unique().tolist())
-cliente_seleccionado = st.sidebar.selectbox("Selecciona un Cliente", lista_clientes)
-
-if cliente_seleccionado != 'Todos':
-    df_vista_filtrada = df_filtrado_parcial[df_filtrado_parcial['Nombre_Completo_Cliente'] == cliente_seleccionado]
-else:
-    df_vista_filtrada = df_filtrado_parcial.copy()
+    lista_clientes = ['Todos'] + motor.opciones('Nombre_Completo_Cliente', filtros)
+    filtros = filtros.con(cliente=st.sidebar.selectbox("Selecciona un Cliente", lista_clientes))
 
 # --- 4. CÁLCULO Y VISUALIZACIÓN DE MÉTRICAS CLAVE ---
 st.header("Métricas Clave del Negocio")
-df_citas_reales = df_vista_filtrada.dropna(subset=['ID_Cita'])
-
-if not df_citas_reales.empty:
-    total_ingresos = df_citas_reales['Precio'].sum()
-    total_citas = len(df_citas_reales)
-    servicio_popular = df_citas_reales['Nombre_Servicio'].mode().iloc[0]
-    ingresos_por_barbero = df_citas_reales.groupby('Nombre_Completo_Barbero')['Precio'].sum()
-    barbero_top = ingresos_por_barbero.idxmax() if not ingresos_por_barbero.empty else "N/A"
+with perf.span(f"kpis:{motor.nombre}"):
+    kpis = motor.kpis(filtros)
 
+if kpis is not None:
     col1, col2, col3, col4 = st.columns(4, gap="large")
     with col1:
-        st.metric(label="💰 Ingresos Totales", value=f"${total_ingresos:,.0f}")
+        st.metric(label="💰 Ingresos Totales", value=f"${kpis['total_ingresos']:,.0f}")
     with col2:
-        st.metric(label="🗓️ Citas Registradas", value=total_citas)
+        st.metric(label="🗓️ Citas Registradas", value=kpis['total_citas'])
     with col3:
-        st.metric(label="⭐ Servicio Popular", value=servicio_popular)
+        st.metric(label="⭐ Servicio Popular", value=kpis['servicio_popular'])
     with col4:
-        st.metric(label="👑 Barbero Top (Ingresos)", value=barbero_top)
+        st.metric(label="👑 Barbero Top (Ingresos)", value=kpis['barbero_top'])
 else:
     st.warning("No hay datos de citas para los filtros seleccionados.")
 
+# Días recientes cuyas citas o ingresos se salieron de lo normal para ese día de la semana
+anomalias = dm.obtener_anomalias(version, df_vista_completa)
+if filtros.barbero is not None:
+    claves_alertas = {("barbero", filtros.barbero)}
+elif filtros.sede is not None:
+    claves_alertas = {("sede", filtros.sede)} | {("barbero", b) for b in lista_barberos[1:]}
+else:
+    claves_alertas = None
+alertas = anomalias.alertas(claves_alertas)
+if not alertas.empty:
+    caidas = int((alertas['direccion'] == 'caída').sum())
+    with st.expander(f"🚨 {len(alertas)} anomalías en los últimos días ({caidas} caídas)", expanded=caidas > 0):
+        st.dataframe(alertas.rename(columns=str.capitalize), hide_index=True, use_container_width=True)
+
 st.markdown("---")
 
 # --- 5. VISUALIZACIONES Y GRÁFICOS COMPLETOS ---
@@ -79,21 +89,22 @@ col_graf1, col_graf2 = st.columns(2, gap="large")
 
 with col_graf1:
     st.subheader("Distribución de Ingresos por Servicio")
-    if not df_citas_reales.empty:
-        ingresos_servicio = df_citas_reales.groupby('Nombre_Servicio')['Precio'].sum().reset_index()
-        fig_pie = px.pie(ingresos_servicio, names='Nombre_Servicio', values='Precio',
-                         title='Proporción de Ingresos', color_discrete_sequence=px.colors.sequential.Aggrnyl)
+    if kpis is not None:
+        ingresos_servicio = kpis['ingresos_por_servicio']
+        with perf.span("grafico:ingresos_servicio"):
+            fig_pie = px.pie(ingresos_servicio, names='Nombre_Servicio', values='Precio',
+                             title='Proporción de Ingresos', color_discrete_sequence=px.colors.sequential.Aggrnyl)
         st.plotly_chart(fig_pie, use_container_width=True)
     else:
         st.info("Sin datos de ingresos por servicio.")
 
 with col_graf2:
     st.subheader("Carga de Trabajo por Barbero")
-    if not df_citas_reales.empty:
-        citas_barbero = df_citas_reales['Nombre_Completo_Barbero'].value_counts().reset_index()
-        citas_barbero.columns = ['Barbero', 'Cantidad de Citas']
-        fig_bar = px.bar(citas_barbero.head(15), x='Barbero', y='Cantidad de Citas', title='Top 15 Barberos por Citas',
-                         text='Cantidad de Citas', color='Barbero')
+    if kpis is not None:
+        citas_barbero = kpis['citas_por_barbero']
+        with perf.span("grafico:citas_barbero"):
+            fig_bar = px.bar(citas_barbero.head(15), x='Barbero', y='Cantidad de Citas', title='Top 15 Barberos por Citas',
+                             text='Cantidad de Citas', color='Barbero')
         st.plotly_chart(fig_bar, use_container_width=True)
     else:
         st.info("Sin datos de citas por barbero.")
@@ -103,46 +114,114 @@ col_graf3, col_graf4 = st.columns(2, gap="large")
 
 with col_graf3:
     st.subheader("Ingresos Generados por Barbero")
-    if not df_citas_reales.empty and 'ingresos_por_barbero' in locals() and not ingresos_por_barbero.empty:
-        df_ingresos_barbero = ingresos_por_barbero.reset_index()
+    if kpis is not None and not kpis['ingresos_por_barbero'].empty:
+        df_ingresos_barbero = kpis['ingresos_por_barbero'].reset_index()
         df_ingresos_barbero.columns = ['Barbero', 'Ingresos']
-        fig_ingresos_barbero = px.bar(df_ingresos_barbero.sort_values('Ingresos', ascending=False).head(15),
-                                      x='Barbero', y='Ingresos', title='Top 15 Barberos por Ingresos',
-                                      text='Ingresos', color='Barbero',
-                                      color_discrete_sequence=px.colors.sequential.YlOrRd)
-        fig_ingresos_barbero.update_traces(texttemplate='$%{y:,.0f}', textposition='outside')
+        with perf.span("grafico:ingresos_barbero"):
+            fig_ingresos_barbero = px.bar(df_ingresos_barbero.sort_values('Ingresos', ascending=False).head(15),
+                                          x='Barbero', y='Ingresos', title='Top 15 Barberos por Ingresos',
+                                          text='Ingresos', color='Barbero',
+                                          color_discrete_sequence=px.colors.sequential.YlOrRd)
+            fig_ingresos_barbero.update_traces(texttemplate='$%{y:,.0f}', textposition='outside')
         st.plotly_chart(fig_ingresos_barbero, use_container_width=True)
     else:
         st.info("Sin datos de ingresos por barbero.")
 
 with col_graf4:
     st.subheader("Evolución de Citas en el Tiempo")
-    if not df_citas_reales.empty:
+    if kpis is not None:
         agrupacion = st.radio("Ver por:", ('Día', 'Semana', 'Mes'), horizontal=True, key='agrupacion_tiempo')
-        df_temp = df_citas_reales.copy()
-        df_temp['Fecha_dt'] = pd.to_datetime(df_temp['Fecha'])
-
-        if agrupacion == 'Día':
-            df_agrupado = df_temp.groupby(df_temp['Fecha_dt'].dt.date).size().reset_index(name='Numero de Citas')
-            df_agrupado.rename(columns={'Fecha_dt': 'Fecha'}, inplace=True)
-        elif agrupacion == 'Semana':
-            df_agrupado = df_temp.set_index('Fecha_dt').resample('W-Mon').size().reset_index(name='Numero de Citas')
-            df_agrupado.rename(columns={'Fecha_dt': 'Fecha'}, inplace=True)
-        else: # Mes
-            df_agrupado = df_temp.set_index('Fecha_dt').resample('M').size().reset_index(name='Numero de Citas')
-            df_agrupado.rename(columns={'Fecha_dt': 'Fecha'}, inplace=True)
-            df_agrupado['Fecha'] = df_agrupado['Fecha'].dt.strftime('%Y-%m')
-
-        fig_linea_tiempo = px.line(df_agrupado, x='Fecha', y='Numero de Citas', title=f'Citas por {agrupacion}', 
-                                   markers=True, text='Numero de Citas')
-        fig_linea_tiempo.update_traces(textposition="top center")
+        mostrar_pronostico = st.toggle("Mostrar pronóstico", value=True, key='mostrar_pronostico')
+        df_agrupado = motor.serie_citas(filtros, agrupacion)
+
+        with perf.span("grafico:evolucion_citas"):
+            fig_linea_tiempo = px.line(df_agrupado, x='Fecha', y='Numero de Citas', title=f'Citas por {agrupacion}', 
+                                       markers=True, text='Numero de Citas')
+            fig_linea_tiempo.update_traces(textposition="top center")
         
         if not df_agrupado.empty:
             promedio_citas = df_agrupado['Numero de Citas'].mean()
             fig_linea_tiempo.add_hline(y=promedio_citas, line_dash="dot",
                                      annotation_text=f"Promedio: {promedio_citas:.1f}",
                                      annotation_position="bottom right")
+
+        # Pronóstico de la serie que corresponde a los filtros (no hay series por cliente)
+        if filtros.barbero is not None:
+            clave_serie = ("barbero", filtros.barbero)
+        elif filtros.sede is not None:
+            clave_serie = ("sede", filtros.sede)
+        else:
+            clave_serie = ("total", "Todas")
+        pronosticos = dm.obtener_pronosticos(version, df_vista_completa)
+        if mostrar_pronostico and filtros.cliente is None and clave_serie in pronosticos:
+            with perf.span("grafico:pronostico"):
+                df_pronostico = pr.agrupar_con_historia(motor.citas_por_dia(filtros), pronosticos.serie(*clave_serie), agrupacion)
+                if not df_pronostico.empty:
+                    fig_linea_tiempo.add_trace(go.Scatter(
+                        x=pd.concat([df_pronostico['Fecha'], df_pronostico['Fecha'][::-1]]),
+                        y=pd.concat([df_pronostico['Superior'], df_pronostico['Inferior'][::-1]]),
+                        fill='toself', fillcolor='rgba(212, 175, 55, 0.2)', line=dict(width=0),
+                        hoverinfo='skip', name='Banda 80%'))
+                    fig_linea_tiempo.add_trace(go.Scatter(
+                        x=df_pronostico['Fecha'], y=df_pronostico['Pronostico'].round(1), mode='lines+markers',
+                        line=dict(color='#D4AF37', dash='dash'), name='Pronóstico'))
         
         st.plotly_chart(fig_linea_tiempo, use_container_width=True)
+
+        if mostrar_pronostico and pronosticos.modelo is not None:
+            with st.expander("📈 Demanda prevista para planear turnos (próximos 7 días)"):
+                barberos_sede = motor.opciones('Nombre_Completo_Barbero', {"sede": sede_seleccionada})
+                previstos_barbero = pronosticos.resumen("barbero")
+                col_prev1, col_prev2 = st.columns(2)
+                with col_prev1:
+                    st.dataframe(previstos_barbero[previstos_barbero['Barbero'].isin(barberos_sede)].round(1), hide_index=True, use_container_width=True)
+                with col_prev2:
+                    st.dataframe(pronosticos.resumen("servicio").round(1), hide_index=True, use_container_width=True)
     else:
-        st.info("Sin datos para mostrar la evolución de citas.")
\ No newline at end of file
+        st.info("Sin datos para mostrar la evolución de citas.")
+
+st.markdown("---")
+
+# --- 6. RETENCIÓN Y VALOR DE VIDA POR COHORTES ---
+st.header("Retención de Clientes por Cohorte")
+cohortes = dm.obtener_cohortes(version, df_vista_completa)
+if cohortes and (filtros.sede is None or filtros.sede in cohortes.sedes):
+    # Cohorte = mes de la primera visita (en la sede elegida, o en cualquiera con "Todas")
+    resumen_cohortes = cohortes.resumen(filtros.sede)
+    col_c1, col_c2, col_c3, col_c4 = st.columns(4, gap="large")
+    col_c1.metric("👥 Clientes", f"{resumen_cohortes['clientes']:,}")
+    col_c2.metric("🔁 Vuelven al mes siguiente",
+                  f"{resumen_cohortes['retencion_mes_1']:.1f}%" if resumen_cohortes['retencion_mes_1'] is not None else "—")
+    col_c3.metric("💎 Valor de vida por cliente", f"${resumen_cohortes['valor_vida']:,.0f}")
+    col_c4.metric("📅 Valor a 12 meses",
+                  f"${resumen_cohortes['valor_a_meses']:,.0f}" if resumen_cohortes['valor_a_meses'] is not None else "—")
+
+    with perf.span("grafico:cohortes"):
+        retencion = cohortes.retencion(filtros.sede).tail(MAX_COHORTES_GRAFICO).iloc[:, :MAX_COHORTES_GRAFICO]
+        fig_cohortes = px.imshow(retencion, text_auto='.0f', aspect='auto', color_continuous_scale='YlOrBr',
+                                 labels=dict(x="Meses desde la primera visita", y="Cohorte", color="% activos"),
+                                 title=f"% de clientes que vuelven (últimas {len(retencion)} cohortes)")
+    st.plotly_chart(fig_cohortes, use_container_width=True)
+
+    col_coh1, col_coh2 = st.columns(2, gap="large")
+    with col_coh1:
+        curva = cohortes.valor_vida_acumulado(filtros.sede).tail(6).T
+        fig_ltv = px.line(curva, markers=True, title="Ingreso acumulado por cliente (últimas 6 cohortes)",
+                          labels=dict(index="Meses desde la primera visita", value="Ingreso por cliente", variable="Cohorte"))
+        st.plotly_chart(fig_ltv, use_container_width=True)
+    with col_coh2:
+        ingresos_cohorte = cohortes.ingresos_por_sede().tail(MAX_COHORTES_GRAFICO)
+        if filtros.sede is not None:
+            ingresos_cohorte = ingresos_cohorte[[filtros.sede]]
+        fig_ingresos_cohorte = px.bar(ingresos_cohorte, title="Ingresos de cada cohorte por sede",
+                                      labels=dict(value="Ingresos", variable="Sede"))
+        st.plotly_chart(fig_ingresos_cohorte, use_container_width=True)
+
+    with st.expander("💎 Valor de vida por cohorte"):
+        st.dataframe(cohortes.valor_vida(filtros.sede).round(1), use_container_width=True)
+    if filtros.barbero is not None or filtros.cliente is not None:
+        st.caption("Las cohortes se calculan por sede; los filtros de barbero y cliente no se aplican aquí.")
+else:
+    st.info("Sin datos suficientes para el análisis de cohortes.")
+
+perf.mostrar_panel()
@@ -1,9 +1,13 @@
+import os
 import streamlit as st
-import pandas as pd
 import data_manager as dm
+import query_engine as qe
+import exportacion as ex
+import instrumentation as perf
 from datetime import datetime
 
 st.set_page_config(page_title="Gestión de Citas | Kingdom Barber", page_icon="🗓️", layout="wide")
+perf.iniciar_rerun("Gestión de Citas")
 
 st.markdown("<h1 style='text-align: center; color: #D4AF37;'>🗓️ Gestión de Citas</h1>", unsafe_allow_html=True)
 st.markdown("### Filtra, busca y gestiona todas las citas de la barbería.")
@@ -18,50 +22,47 @@ if df_vista.empty:
 st.sidebar.header("🔍 Filtros Avanzados")
 
 # --- LÓGICA DE FILTRADO SECUENCIAL Y DINÁMICO ---
+# Cada paso acota las opciones del siguiente; el motor combina los filtros en una sola consulta.
+# Una sola huella por rerun: la comparten el motor de consultas y la agenda
+version = dm.version_datos(df_vista)
+motor = dm.obtener_motor_consultas(version, df_vista)
+
+with perf.span("filtros"):
+    # PASO 1: Filtrar por Sede
+    lista_sedes = ['Todas'] + df_sedes['Nombre_Sede'].unique().tolist()
+    filtros = qe.FiltroCitas(sede=st.sidebar.selectbox("Filtrar por Sede:", options=lista_sedes))
+
+    # PASO 2: Filtrar por Barbero (las opciones se basan en el resultado del filtro de sede)
+    opciones_barbero = ["Todos"] + motor.opciones('Nombre_Completo_Barbero', filtros)
+    filtros = filtros.con(barbero=st.sidebar.selectbox("Filtrar por Barbero:", options=opciones_barbero))
+
+    # PASO 3: Filtrar por Cliente (las opciones se basan en el resultado de los filtros de sede Y barbero)
+    opciones_cliente = ["Todos"] + motor.opciones('Nombre_Completo_Cliente', filtros)
+    filtros = filtros.con(cliente=st.sidebar.selectbox("Filtrar por Cliente:", options=opciones_cliente))
+
+    # PASO 4: Filtrar por Fecha (el rango de fechas se basa en el resultado de TODOS los filtros anteriores)
+    min_fecha, max_fecha = motor.rango_fechas(filtros)
+    min_fecha = min_fecha or datetime.now().date()
+    max_fecha = max_fecha or datetime.now().date()
+
+    fecha_sel = st.sidebar.date_input(
+        "Filtrar por Rango de Fecha:",
+        value=(min_fecha, max_fecha),
+        min_value=min_fecha,
+        max_value=max_fecha,
+        key="date_range_picker_gestion"
+    )
 
-# Creamos una copia maestra para irla reduciendo
-df_filtrado = df_vista.copy()
-
-# PASO 1: Filtrar por Sede
-lista_sedes = ['Todas'] + df_sedes['Nombre_Sede'].unique().tolist()
-sede_sel = st.sidebar.selectbox("Filtrar por Sede:", options=lista_sedes)
-if sede_sel != "Todas":
-    df_filtrado = df_filtrado[df_filtrado['Nombre_Sede'] == sede_sel]
-
-# PASO 2: Filtrar por Barbero (las opciones se basan en el resultado del filtro de sede)
-opciones_barbero = ["Todos"] + sorted(list(df_filtrado['Nombre_Completo_Barbero'].dropna().unique()))
-barbero_sel = st.sidebar.selectbox("Filtrar por Barbero:", options=opciones_barbero)
-if barbero_sel != "Todos":
-    df_filtrado = df_filtrado[df_filtrado['Nombre_Completo_Barbero'] == barbero_sel]
-
-# PASO 3: Filtrar por Cliente (las opciones se basan en el resultado de los filtros de sede Y barbero)
-opciones_cliente = ["Todos"] + sorted(list(df_filtrado['Nombre_Completo_Cliente'].dropna().unique()))
-cliente_sel = st.sidebar.selectbox("Filtrar por Cliente:", options=opciones_cliente)
-if cliente_sel != "Todos":
-    df_filtrado = df_filtrado[df_filtrado['Nombre_Completo_Cliente'] == cliente_sel]
-
-# PASO 4: Filtrar por Fecha (el rango de fechas se basa en el resultado de TODOS los filtros anteriores)
-fechas_validas = df_filtrado['Fecha'].dropna()
-min_fecha = fechas_validas.min().date() if not fechas_validas.empty else datetime.now().date()
-max_fecha = fechas_validas.max().date() if not fechas_validas.empty else datetime.now().date()
-
-fecha_sel = st.sidebar.date_input(
-    "Filtrar por Rango de Fecha:",
-    value=(min_fecha, max_fecha),
-    min_value=min_fecha,
-    max_value=max_fecha,
-    key="date_range_picker_gestion"
-)
-
-if len(fecha_sel) == 2:
-    fecha_inicio, fecha_fin = fecha_sel
-    # Aseguramos que la columna 'Fecha' no tenga nulos antes de comparar
-    df_filtrado = df_filtrado.dropna(subset=['Fecha'])
-    df_filtrado = df_filtrado[(df_filtrado['Fecha'].dt.date >= fecha_inicio) & (df_filtrado['Fecha'].dt.date <= fecha_fin)]
+    if len(fecha_sel) == 2:
+        filtros = filtros.con(desde=fecha_sel[0], hasta=fecha_sel[1])
 
-# --- FIN DE LA LÓGICA DE FILTRADO ---
+    columnas_a_mostrar = [
+        "Fecha", "Hora", "Nombre_Sede", "Nombre_Completo_Cliente", "Telefono",
+        "Nombre_Servicio", "Nombre_Completo_Barbero", "Precio"
+    ]
+    df_citas_reales = motor.filtrar(filtros, columnas_a_mostrar)
 
-df_citas_reales = df_filtrado.dropna(subset=['ID_Cita'])
+# --- FIN DE LA LÓGICA DE FILTRADO ---
 
 st.header(f"Resultados: {len(df_citas_reales)} citas encontradas")
 
@@ -73,12 +74,8 @@ else:
         label=f"💰 Ingresos para esta selección",
         value=f"${total_ingresos_filtrado:,.0f}"
     )
-    columnas_a_mostrar = [
-        "Fecha", "Hora", "Nombre_Sede", "Nombre_Completo_Cliente", "Telefono",
-        "Nombre_Servicio", "Nombre_Completo_Barbero", "Precio"
-    ]
     st.dataframe(
-        df_citas_reales[columnas_a_mostrar].sort_values(by=["Fecha", "Hora"], ascending=[False, True]),
+        df_citas_reales.sort_values(by=["Fecha", "Hora"], ascending=[False, True]),
         use_container_width=True,
         hide_index=True,
         column_config={
@@ -90,4 +87,88 @@ else:
             "Nombre_Servicio": "Servicio",
             "Telefono": "Teléfono",
         }
-    )
\ No newline at end of file
+    )
+
+    # --- EXPORTACIÓN DE LA SELECCIÓN ---
+    # El archivo se escribe por bloques en disco y solo se prepara cuando se pide
+    with st.expander("📤 Exportar estas citas"):
+        col_formato, col_preparar = st.columns([3, 1])
+        with col_formato:
+            formato_export = st.radio("Formato:", ex.formatos_disponibles(), horizontal=True, key="formato_export")
+        clave_export = (filtros, formato_export)
+        with col_preparar:
+            if st.button("⚙️ Preparar archivo", key="preparar_export", use_container_width=True):
+                progreso = st.progress(0.0, text="Escribiendo...")
+                with perf.span(f"exportar:{formato_export}"):
+                    ruta_export = ex.exportar(
+                        motor, filtros, ["ID_Cita"] + columnas_a_mostrar, formato_export,
+                        al_avanzar=lambda escritas, total: progreso.progress(min(escritas / max(total, 1), 1.0), text=f"{escritas:,} de {total:,} citas")
+                    )
+                progreso.empty()
+                st.session_state.exportacion_gestion = {"clave": clave_export, "ruta": ruta_export}
+
+        exportacion = st.session_state.get("exportacion_gestion")
+        if exportacion and exportacion["clave"] == clave_export and os.path.exists(exportacion["ruta"]):
+            extension, mime = ex.FORMATOS[formato_export]
+            with open(exportacion["ruta"], "rb") as archivo:
+                st.download_button(f"📥 Descargar {formato_export} ({os.path.getsize(exportacion['ruta']) / 1024 ** 2:,.1f} MB)",
+                                   data=archivo, file_name=f"citas_kingdom_barber{extension}", mime=mime, key="descargar_export")
+        else:
+            st.caption("Prepara el archivo con los filtros actuales para poder descargarlo.")
+
+# --- DISPONIBILIDAD DE BARBEROS ---
+st.markdown("---")
+st.header("🕒 Disponibilidad de Barberos")
+agenda = dm.obtener_agenda(version, df_vista)
+
+col_sede, col_fecha, col_duracion = st.columns(3)
+with col_sede:
+    sedes_agenda = df_sedes['Nombre_Sede'].dropna().unique().tolist()
+    sede_agenda = st.selectbox(
+        "Sede:", options=sedes_agenda,
+        index=sedes_agenda.index(filtros.sede) if filtros.sede in sedes_agenda else 0,
+        key="sede_agenda"
+    )
+with col_fecha:
+    fecha_agenda = st.date_input("Día:", value=datetime.now().date(), key="fecha_agenda")
+with col_duracion:
+    minimo_agenda = st.number_input("Duración mínima (min):", min_value=5, max_value=600, value=30, step=5, key="minimo_agenda")
+
+with perf.span("agenda:huecos"):
+    huecos = agenda.huecos_libres(sede_agenda, fecha_agenda, minimo_agenda)
+
+if huecos.empty:
+    st.info("Ningún barbero de esta sede tiene un espacio libre de esa duración ese día.")
+else:
+    st.caption(f"{huecos['Barbero'].nunique()} barberos con al menos {minimo_agenda} minutos libres · horario de atención {agenda.horario}")
+    st.dataframe(huecos, use_container_width=True, hide_index=True,
+                 column_config={"Minutos": st.column_config.NumberColumn("Minutos libres", format="%d min")})
+
+# Citas cruzadas: mismo barbero con dos citas que se solapan, dentro de los filtros de la barra lateral
+conflictos = agenda.conflictos()
+if filtros.sede is not None:
+    conflictos = conflictos[conflictos['Sede'] == filtros.sede]
+if filtros.barbero is not None:
+    conflictos = conflictos[conflictos['Barbero'] == filtros.barbero]
+if filtros.desde is not None:
+    fechas_conflicto = conflictos['Fecha'].dt.date
+    conflictos = conflictos[(fechas_conflicto >= filtros.desde) & (fechas_conflicto <= filtros.hasta)]
+
+with st.expander(f"⚠️ Citas cruzadas o dobles reservas ({len(conflictos)})", expanded=False):
+    if conflictos.empty:
+        st.success("No hay citas que se solapen con los filtros seleccionados.")
+    else:
+        st.dataframe(
+            conflictos.sort_values(by=["Fecha", "Hora"], ascending=[False, True]),
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "Fecha": st.column_config.DateColumn("Fecha", format="DD/MM/YYYY"),
+                "ID_Cita": "Cita",
+                "Choca_con": "Choca con la cita",
+                "Hora_previa": "Hora de esa cita",
+                "Minutos_solapados": st.column_config.NumberColumn("Solape", format="%d min"),
+            }
+        )
+
+perf.mostrar_panel()
@@ -1,42 +1,43 @@
+import os
 import streamlit as st
 import pandas as pd
 import data_manager as dm
-from report_generator import generar_pdf_reporte
-import google.generativeai as genai
-import traceback
-from io import StringIO
-import sys
-from PIL import Image
+import query_engine as qe
+import ai_client as ai
+import campanas as cp
+import exportacion as ex
+import planes_analisis as pa
+import instrumentation as perf
 from datetime import datetime
-from babel.dates import format_date # 1. IMPORTAMOS BABEL
-from google.generativeai.types import HarmCategory, HarmBlockThreshold
+# El SDK de Gemini, Pillow (vía image_preprocessing), babel y FPDF se importan dentro de la función que los usa
 
 # --- 1. CONFIGURACIÓN DE PÁGINA Y CONEXIÓN A LA IA ---
 st.set_page_config(page_title="Asistente IA", page_icon="🤖", layout="wide")
+perf.iniciar_rerun("Asistente IA")
 st.title("🤖 Asistente de Inteligencia Artificial")
 st.markdown("Tu centro de mando para análisis avanzados, reportes y marketing inteligente.")
 
-model = None
-try:
-    api_key = st.secrets["GOOGLE_API_KEY"]
-    genai.configure(api_key=api_key)
-    # Se mantiene tu modelo de IA especificado
-    model = genai.GenerativeModel('gemini-2.5-flash-preview-05-20') # Modelo actualizado a uno estándar
-except Exception as e:
-    st.error(f"No se pudo configurar la conexión con Google Gemini. Verifica tu API Key. Error: {e}")
-
 # --- 2. CARGA DE DATOS CENTRALIZADA DESDE LA API ---
 @st.cache_data
-def cargar_datos_completos():
-    """Llama al data_manager una sola vez para obtener todos los datos."""
+def cargar_datos_completos(version_publicada):
+    """Llama al data_manager una sola vez por versión de artefactos para obtener todos los datos."""
     return dm.obtener_vista_citas_completa()
 
-df_vista_completa, df_sedes = cargar_datos_completos()
+@st.cache_data(show_spinner=False, ttl=3600, max_entries=8)
+def segmentar_clientes(version, clave_filtros, _df_filtrado):
+    """Segmentación de la campaña masiva; se recalcula solo al cambiar los datos o los filtros."""
+    return cp.segmentar_clientes(_df_filtrado)
+
+df_vista_completa, df_sedes = cargar_datos_completos(dm.version_publicada())
 
 if df_vista_completa.empty:
     st.error("No se pudieron cargar los datos desde la API. Asegúrate de que la API de Java esté corriendo.")
     st.stop()
 
+# Una sola huella por rerun: la comparten el motor de consultas y la segmentación de la campaña
+version = dm.version_datos(df_vista_completa)
+motor = dm.obtener_motor_consultas(version, df_vista_completa)
+
 # --- 3. FILTROS GLOBALES EN LA BARRA LATERAL ---
 with st.sidebar:
     st.header("Filtros Globales")
@@ -44,33 +45,24 @@ with st.sidebar:
     lista_sedes_ia = ['Todas'] + df_sedes['Nombre_Sede'].dropna().unique().tolist()
     sede_seleccionada = st.selectbox("Selecciona una Sede", lista_sedes_ia, key="sede_ia")
     
-    fechas_validas = df_vista_completa['Fecha'].dropna()
-    min_date = fechas_validas.min().date() if not fechas_validas.empty else datetime.now().date()
-    max_date = fechas_validas.max().date() if not fechas_validas.empty else datetime.now().date()
+    min_date, max_date = motor.rango_fechas(qe.FiltroCitas())
+    min_date = min_date or datetime.now().date()
+    max_date = max_date or datetime.now().date()
     if min_date > max_date: min_date = max_date
     rango_fechas = st.date_input("Selecciona un Rango de Fechas", value=(min_date, max_date), min_value=min_date, max_value=max_date, key="date_ia")
     
-    lista_barberos_ia = ['Todos'] + sorted(df_vista_completa['Nombre_Completo_Barbero'].dropna().unique().tolist())
+    lista_barberos_ia = ['Todos'] + motor.opciones('Nombre_Completo_Barbero', qe.FiltroCitas())
     barbero_seleccionado = st.selectbox("Selecciona un Barbero", lista_barberos_ia, key="barbero_ia")
     
-    lista_servicios_ia = ['Todos'] + sorted(df_vista_completa['Nombre_Servicio'].dropna().unique().tolist())
+    lista_servicios_ia = ['Todos'] + motor.opciones('Nombre_Servicio', qe.FiltroCitas())
     servicio_seleccionado = st.selectbox("Selecciona un Servicio", lista_servicios_ia, key="servicio_ia")
 
 # --- 4. APLICACIÓN DE FILTROS ---
-df_filtrado = df_vista_completa.copy()
-if sede_seleccionada != "Todas": df_filtrado = df_filtrado[df_filtrado['Nombre_Sede'] == sede_seleccionada]
-
-if len(rango_fechas) == 2:
-    fecha_inicio, fecha_fin = rango_fechas
-    df_filtrado['Fecha'] = pd.to_datetime(df_filtrado['Fecha'], errors='coerce')
-    df_filtrado.dropna(subset=['Fecha'], inplace=True)
-    df_filtrado = df_filtrado[
-        (df_filtrado['Fecha'].dt.date >= fecha_inicio) & 
-        (df_filtrado['Fecha'].dt.date <= fecha_fin)
-    ]
-
-if barbero_seleccionado != "Todos": df_filtrado = df_filtrado[df_filtrado['Nombre_Completo_Barbero'] == barbero_seleccionado]
-if servicio_seleccionado != "Todos": df_filtrado = df_filtrado[df_filtrado['Nombre_Servicio'] == servicio_seleccionado]
+with perf.span("filtros"):
+    filtros = qe.FiltroCitas(sede=sede_seleccionada, barbero=barbero_seleccionado, servicio=servicio_seleccionado)
+    if len(rango_fechas) == 2:
+        filtros = filtros.con(desde=rango_fechas[0], hasta=rango_fechas[1])
+    df_filtrado = motor.filtrar(filtros)
 
 lista_cortes_populares = [
     # --- Cortes Cortos ---
@@ -112,10 +104,11 @@ with tab_reportes:
     st.header("Generador de Reportes a Medida")
     st.info(f"El reporte se generará basado en las **{len(df_filtrado)} citas** que coinciden con tus filtros actuales.")
     
-    def generar_analisis_reporte(resumen_str):
+    def generar_analisis_reporte(model, resumen_str):
         if not model: return "El modelo de IA no está disponible."
         
         # 2. SE REEMPLAZA LOCALE POR BABEL
+        from babel.dates import format_date
         fecha_actual = format_date(datetime.now(), format="d 'de' MMMM 'de' yyyy", locale='es')
 
         prompt = f"""
@@ -142,8 +135,7 @@ with tab_reportes:
         2 acciones concretas basadas en las observaciones.
         """
         try:
-            response = model.generate_content(prompt)
-            return response.text
+            return ai.generar_texto(model, prompt)
         except Exception as e:
             return f"Error al generar análisis: {e}"
 
@@ -152,21 +144,20 @@ with tab_reportes:
             st.warning("No hay datos para los filtros seleccionados.")
         else:
             with st.spinner("Analizando KPIs y consultando a la IA... 🤖"):
-                total_ingresos = df_filtrado['Precio'].sum()
-                total_citas = len(df_filtrado)
-                ingresos_por_barbero = df_filtrado.groupby('Nombre_Completo_Barbero')['Precio'].sum().nlargest(5)
-                citas_por_servicio = df_filtrado['Nombre_Servicio'].value_counts().nlargest(5)
+                resumen = motor.resumen_reporte(filtros)
                 
                 resumen_de_datos = f"""
-                - Total de Citas: {total_citas}
-                - Ingresos Totales: ${total_ingresos:,.0f} COP
-                - Top 5 Barberos por Ingresos: {ingresos_por_barbero.to_dict()}
-                - Top 5 Servicios por Cantidad: {citas_por_servicio.to_dict()}
+                - Total de Citas: {resumen['total_citas']}
+                - Ingresos Totales: ${resumen['total_ingresos']:,.0f} COP
+                - Top 5 Barberos por Ingresos: {resumen['top_barberos']}
+                - Top 5 Servicios por Cantidad: {resumen['top_servicios']}
                 """
                 
-                analisis_ia = generar_analisis_reporte(resumen_de_datos)
+                # El cliente de Gemini se construye bajo demanda y se pasa explícito a quien lo usa
+                analisis_ia = generar_analisis_reporte(ai.modelo_disponible(), resumen_de_datos)
             
             with st.spinner("Creando el archivo PDF... 📄"):
+                from report_generator import generar_pdf_reporte
                 contexto_reporte = {"sede": sede_seleccionada, "rango_fechas": f"{rango_fechas[0].strftime('%d/%m/%Y')} - {rango_fechas[1].strftime('%d/%m/%Y')}", "barbero": barbero_seleccionado, "servicio": servicio_seleccionado}
                 pdf_bytes = generar_pdf_reporte(df_filtrado, analisis_ia, contexto_reporte)
             
@@ -178,71 +169,126 @@ with tab_analista:
     st.header("🕵️ Chatea con tus Datos")
     st.info(f"Tengo acceso a las **{len(df_filtrado)} citas** que coinciden con tus filtros. Hazme cualquier pregunta.")
     pregunta_usuario = st.text_input("Escribe tu pregunta aquí:", placeholder="Ej: ¿Cuál es el mes de más ganancias?", key="analista_input")
+    # Con DuckDB el análisis puede ser una consulta SQL: se ejecuta en el motor, sin copiar el DataFrame
+    modo_analisis = st.radio("Motor de análisis:", ["Pandas", "SQL (DuckDB)"], horizontal=True, key="analista_modo") if motor.soporta_sql else "Pandas"
     
     if st.button("🤖 Analizar y Responder", key="analista_btn"):
-        if not model: st.error("Motor de IA no disponible.")
-        elif not pregunta_usuario: st.warning("Por favor, escribe una pregunta.")
+        if not pregunta_usuario: st.warning("Por favor, escribe una pregunta.")
         elif df_filtrado.empty: st.warning("No hay datos para los filtros seleccionados.")
         else:
-            with st.spinner("Generando plan de análisis... 🧠"):
-                columnas = df_filtrado.columns.tolist()
-                tipos_de_datos = df_filtrado.dtypes.to_string()
+            lenguaje = 'sql' if modo_analisis == "SQL (DuckDB)" else 'python'
+            # El código solo depende de la pregunta y del esquema: con otros filtros se reutiliza tal cual
+            clave_plan = pa.clave_plan(pregunta_usuario, lenguaje, pa.firma_esquema(df_filtrado), ai.MODELO_GEMINI)
+
+            def ejecutar_plan(codigo):
+                if lenguaje == 'sql':
+                    with perf.span("analista:sql"):
+                        return motor.ejecutar_sql(codigo, filtros).to_string(max_rows=50)
+                with perf.span("analista:pandas"):
+                    return pa.ejecutar_pandas(codigo, df_filtrado)
+
+            try:
+                # Primero el almacén de planes: con un acierto no hace falta construir el cliente de Gemini
+                codigo_generado = pa.buscar(clave_plan)
+                if codigo_generado is not None:
+                    try:
+                        with st.spinner("Ejecutando el análisis... ⚙️"):
+                            resultado_analisis = ejecutar_plan(codigo_generado)
+                        st.caption("♻️ Esta pregunta ya se había respondido: se reutilizó su plan de análisis con los filtros actuales.")
+                    except Exception:
+                        codigo_generado = None  # el plan guardado no sirve para estos datos: se genera uno nuevo
+
+                model = ai.modelo_disponible() if codigo_generado is None else None
+                if codigo_generado is None and not model:
+                    st.error("Motor de IA no disponible.")
+                else:
+                    if codigo_generado is None:
+                        with st.spinner("Generando plan de análisis... 🧠"):
+                            columnas = df_filtrado.columns.tolist()
+                            tipos_de_datos = df_filtrado.dtypes.to_string()
                 
-                prompt_agente = f"""
-                Actúa como 'Alex', un Agente de IA experto en análisis de datos con Pandas.
-                Tu objetivo es generar un script de Python para responder la pregunta del usuario analizando un DataFrame llamado `df`.
+                            prompt_agente = f"""
+                            Actúa como 'Alex', un Agente de IA experto en análisis de datos con SQL (dialecto DuckDB).
+                            Tu objetivo es escribir UNA consulta SQL que responda la pregunta del usuario sobre una tabla llamada `citas`.
+
+                            **Contexto de la tabla `citas`:**
+                            - Contiene datos de citas de una barbería. 'Precio' es ingresos. 'Fecha' es para análisis de tiempo.
+
+                            **Reglas Estrictas:**
+                            1. SOLO SQL: Tu única respuesta debe ser una única sentencia SELECT (o WITH ... SELECT), sin punto y coma intermedios.
+                            2. USA `citas`: La tabla a consultar SIEMPRE se llama `citas`. Escribe los nombres de columna entre comillas dobles.
+                            3. FORMATO DE FECHA: Si la pregunta involucra fechas (meses, años), el resultado DEBE incluir el año (ej. strftime("Fecha", '%m/%Y')).
+                            4. **PROVEE CONTEXTO:** Siempre que sea posible, además de la respuesta directa, incluye columnas adicionales que le den contexto (por ejemplo, el monto de las ganancias además del mes).
+
+                            **Información de la tabla:**
+                            - COLUMNAS: {columnas}
+                            - TIPOS DE DATOS: {tipos_de_datos}
+
+                            **Pregunta del Usuario:**
+                            "{pregunta_usuario}"
+                            """ if modo_analisis == "SQL (DuckDB)" else f"""
+                            Actúa como 'Alex', un Agente de IA experto en análisis de datos con Pandas.
+                            Tu objetivo es generar un script de Python para responder la pregunta del usuario analizando un DataFrame llamado `df`.
                 
-                **Contexto del DataFrame `df`:**
-                - Contiene datos de citas de una barbería. 'Precio' es ingresos. 'Fecha' es para análisis de tiempo.
-
-                **Reglas Estrictas:**
-                1. SOLO CÓDIGO: Tu única respuesta debe ser código Python.
-                2. USA `df`: El DataFrame a analizar SIEMPRE se llama `df`.
-                3. IMPRIME EL RESULTADO: El código DEBE terminar con `print(resultado)`.
-                4. CÓDIGO CLARO: Añade comentarios breves para explicar los pasos.
-                5. FORMATO DE FECHA: Si la pregunta involucra fechas (meses, años), el resultado impreso DEBE incluir el año (ej. 'Febrero 2025').
-                6. **PROVEE CONTEXTO:** Siempre que sea posible, además de la respuesta directa, imprime datos adicionales que le den contexto. Por ejemplo, si la pregunta es sobre el mes con más ganancias, el código no solo debe imprimir el mes, sino también el monto de esas ganancias.
-
-                **Información del DataFrame:**
-                - COLUMNAS: {columnas}
-                - TIPOS DE DATOS: {tipos_de_datos}
-
-                **Pregunta del Usuario:**
-                "{pregunta_usuario}"
-                """
-                try:
-                    respuesta_ia = model.generate_content(prompt_agente)
-                    codigo_generado = respuesta_ia.text.strip().replace("```python", "").replace("```", "")
+                            **Contexto del DataFrame `df`:**
+                            - Contiene datos de citas de una barbería. 'Precio' es ingresos. 'Fecha' es para análisis de tiempo.
+
+                            **Reglas Estrictas:**
+                            1. SOLO CÓDIGO: Tu única respuesta debe ser código Python.
+                            2. USA `df`: El DataFrame a analizar SIEMPRE se llama `df`.
+                            3. IMPRIME EL RESULTADO: El código DEBE terminar con `print(resultado)`.
+                            4. CÓDIGO CLARO: Añade comentarios breves para explicar los pasos.
+                            5. FORMATO DE FECHA: Si la pregunta involucra fechas (meses, años), el resultado impreso DEBE incluir el año (ej. 'Febrero 2025').
+                            6. **PROVEE CONTEXTO:** Siempre que sea posible, además de la respuesta directa, imprime datos adicionales que le den contexto. Por ejemplo, si la pregunta es sobre el mes con más ganancias, el código no solo debe imprimir el mes, sino también el monto de esas ganancias.
+
+                            **Información del DataFrame:**
+                            - COLUMNAS: {columnas}
+                            - TIPOS DE DATOS: {tipos_de_datos}
+
+                            **Pregunta del Usuario:**
+                            "{pregunta_usuario}"
+                            """
+                            respuesta_ia = ai.generar(model, prompt_agente)
+                            codigo_generado = pa.limpiar_codigo(respuesta_ia.text, lenguaje)
+
+                        with st.spinner("Ejecutando el análisis... ⚙️"):
+                            resultado_analisis = ejecutar_plan(codigo_generado)
+                        pa.guardar(clave_plan, codigo_generado, lenguaje, pregunta_usuario)
+
                     with st.expander("🔍 Ver el Plan de Análisis (código generado)"):
-                        st.code(codigo_generado, language='python')
-                    
-                    with st.spinner("Ejecutando el análisis... ⚙️"):
-                        df = df_filtrado.copy()
-                        old_stdout, sys.stdout = sys.stdout, StringIO()
-                        exec(codigo_generado, {'pd': pd, 'df': df})
-                        resultado_analisis = sys.stdout.getvalue()
-                        sys.stdout = old_stdout
-                    
-                    with st.spinner("Interpretando los resultados... 🗣️"):
-                        prompt_interprete = f"""
-                        Eres "Alex", un asistente de datos amigable y experto. Responde la pregunta del usuario de forma conversacional y completa, usando los datos del resultado del análisis. Explica el resultado de forma clara.
+                        st.code(codigo_generado, language=lenguaje)
 
-                        **Pregunta Original del Usuario:**
-                        "{pregunta_usuario}"
-                        
-                        **Resultado del Código (Datos Crudos):**
-                        ---
-                        {resultado_analisis}
-                        ---
-                        
-                        **Tu Respuesta Final:**
-                        """
-                        respuesta_final_ia = model.generate_content(prompt_interprete)
+                    # Un resultado que es solo un número se muestra tal cual, sin otra llamada al modelo
+                    valor = pa.valor_numerico(resultado_analisis)
+                    if valor is None and not model:
+                        model = ai.modelo_disponible()  # un plan reutilizado sin número necesita al modelo para interpretarse
+                    if valor is not None:
                         st.markdown("### 💡 Aquí está tu análisis:")
-                        st.success(respuesta_final_ia.text)
-                except Exception as e:
-                    st.error("¡Oops! Ocurrió un error al procesar tu pregunta.")
-                    st.exception(e)
+                        st.success(f"{pregunta_usuario.strip()} → **{valor}**")
+                    elif not model:
+                        st.markdown("### 💡 Aquí está tu análisis:")
+                        st.text(resultado_analisis)
+                    else:
+                        with st.spinner("Interpretando los resultados... 🗣️"):
+                            prompt_interprete = f"""
+                            Eres "Alex", un asistente de datos amigable y experto. Responde la pregunta del usuario de forma conversacional y completa, usando los datos del resultado del análisis. Explica el resultado de forma clara.
+
+                            **Pregunta Original del Usuario:**
+                            "{pregunta_usuario}"
+                    
+                            **Resultado del Código (Datos Crudos):**
+                            ---
+                            {resultado_analisis}
+                            ---
+                    
+                            **Tu Respuesta Final:**
+                            """
+                            respuesta_final_ia = ai.generar(model, prompt_interprete)
+                            st.markdown("### 💡 Aquí está tu análisis:")
+                            st.success(respuesta_final_ia.text)
+            except Exception as e:
+                st.error("¡Oops! Ocurrió un error al procesar tu pregunta.")
+                st.exception(e)
 
 # --- PESTAÑA 3: ASISTENTE DE MARKETING ---
 with tab_marketing:
@@ -255,17 +301,17 @@ with tab_marketing:
         canal_comunicacion = st.radio("Selecciona el canal:", ("WhatsApp", "Email", "Redes Sociales"), horizontal=True, key="marketing_canal")
     
     if st.button("💡 Generar Idea de Campaña", key="marketing_btn"):
+        model = ai.modelo_disponible()
         if not model: st.error("El modelo de IA no está disponible.")
         elif df_filtrado.empty: st.warning("No hay suficientes datos para generar una idea.")
         else:
             with st.spinner("Creando una campaña brillante... ✨"):
-                try:
-                    # 3. SE USA BABEL PARA OBTENER EL NOMBRE DEL DÍA EN ESPAÑOL
-                    df_filtrado['Dia_Semana'] = pd.to_datetime(df_filtrado['Fecha']).dt.day_name(locale='es_ES.UTF-8')
-                    servicio_menos_popular = df_filtrado['Nombre_Servicio'].value_counts().idxmin()
-                    dia_mas_flojo = df_filtrado['Dia_Semana'].value_counts().idxmin()
-                except Exception:
-                    servicio_menos_popular, dia_mas_flojo = "N/A", "N/A"
+                # El nombre del día se toma de una tabla propia: no depende del locale del servidor.
+                # value_counts descarta los nulos (citas sin servicio o sin fecha)
+                servicios = df_filtrado['Nombre_Servicio'].value_counts()
+                dias = cp.dia_semana(df_filtrado['Fecha']).value_counts()
+                servicio_menos_popular = servicios.idxmin() if not servicios.empty else "N/A"
+                dia_mas_flojo = dias.idxmin() if not dias.empty else "N/A"
                 
                 prompt_marketing = f"""
                 Actúa como un Director Creativo para 'Kingdom Barber'. Crea un borrador para una campaña de marketing.
@@ -284,11 +330,68 @@ with tab_marketing:
                 - **Sugerencia Creativa:**
                 """
                 try:
-                    respuesta_ia = model.generate_content(prompt_marketing)
+                    # Idea creativa: cada clic debe dar una campaña distinta, nunca la de otra sesión
+                    respuesta_ia = ai.generar(model, prompt_marketing, coalescer=False)
                     st.markdown(respuesta_ia.text)
                 except Exception as e:
                     st.error(f"Ocurrió un error al generar la campaña: {e}")
 
+    # --- Campaña masiva: una plantilla por segmento, mensajes personalizados en local ---
+    st.markdown("---")
+    st.subheader("📬 Campaña Masiva Personalizada")
+    st.markdown("Segmenta a los clientes de los datos filtrados, pide **una plantilla por segmento** a la IA y personaliza los mensajes de todos los clientes sin más llamadas.")
+
+    with perf.span("campana:segmentar"):
+        clientes_campana = segmentar_clientes(version, filtros, df_filtrado)
+    if clientes_campana.empty:
+        st.info("No hay clientes con citas en los filtros seleccionados.")
+    else:
+        resumen_campana = cp.resumen_segmentos(clientes_campana)
+        st.dataframe(resumen_campana, use_container_width=True, column_config={
+            "Visitas_Promedio": st.column_config.NumberColumn("Visitas prom.", format="%.1f"),
+            "Dias_Sin_Visita_Promedio": st.column_config.NumberColumn("Días sin visita prom.", format="%.0f"),
+            "Gasto_Promedio": st.column_config.NumberColumn("Gasto prom.", format="$ %.0f"),
+            "Servicio_Top": "Servicio más pedido",
+        })
+        segmentos_campana = st.multiselect("Segmentos a contactar:", resumen_campana.index.tolist(), default=resumen_campana.index.tolist(), key="campana_segmentos")
+
+        if st.button(f"✉️ Generar mensajes para {resumen_campana.loc[segmentos_campana, 'Clientes'].sum():,} clientes", key="campana_btn", disabled=not segmentos_campana):
+            model = ai.modelo_disponible()
+            if not model: st.error("El modelo de IA no está disponible.")
+            else:
+                try:
+                    with st.spinner(f"Escribiendo {len(segmentos_campana)} plantillas... ✍️"):
+                        plantillas = cp.generar_plantillas(resumen_campana.loc[segmentos_campana], tipo_campaña, canal_comunicacion,
+                                                           lambda prompt: ai.generar_texto(model, prompt))
+                    with perf.span("campana:renderizar"):
+                        mensajes = cp.renderizar_mensajes(clientes_campana, plantillas)
+                    # Los archivos se escriben solo en el formato que se pida, al prepararlos
+                    st.session_state.campana = {"plantillas": plantillas, "mensajes": mensajes, "archivos": {}}
+                except Exception as e:
+                    st.error(f"Ocurrió un error al generar la campaña masiva: {e}")
+
+        if "campana" in st.session_state:
+            campana = st.session_state.campana
+            for segmento, plantilla in campana["plantillas"].items():
+                with st.expander(f"Plantilla · {segmento}"):
+                    st.code(plantilla, language=None)
+            st.dataframe(campana["mensajes"].head(50), use_container_width=True, hide_index=True)
+            col_formato, col_preparar = st.columns([3, 1])
+            with col_formato:
+                formato_campana = st.radio("Formato:", ex.formatos_disponibles(), horizontal=True, key="campana_formato")
+            with col_preparar:
+                if st.button("⚙️ Preparar archivo", key="campana_preparar", use_container_width=True):
+                    with st.spinner("Preparando el archivo de exportación... 📦"), perf.span(f"campana:exportar:{formato_campana}"):
+                        campana["archivos"][formato_campana] = cp.exportar(campana["mensajes"], formato_campana)
+            ruta_campana = campana["archivos"].get(formato_campana)
+            if ruta_campana and os.path.exists(ruta_campana):
+                extension, mime = ex.FORMATOS[formato_campana]
+                with open(ruta_campana, "rb") as archivo:
+                    st.download_button(f"📥 Descargar {formato_campana}", data=archivo, file_name=f"campana_kingdom_barber{extension}",
+                                       mime=mime, key="campana_descargar")
+            else:
+                st.caption("Prepara el archivo en el formato elegido para poder descargarlo.")
+
 # --- PESTAÑA 4: DETECTOR DE OPORTUNIDADES ---
 with tab_oportunidades:
     st.header("💎 Detector de Oportunidades Personalizadas")
@@ -296,6 +399,7 @@ with tab_oportunidades:
     opciones_analisis = st.multiselect("Selecciona qué oportunidades quieres buscar:", ["Clientes en Riesgo de Abandono", "Oportunidades de Venta Cruzada (Cross-selling)", "Optimización de Servicios", "Rendimiento de Barberos"], default=["Clientes en Riesgo de Abandono"], key="oportunidades_multi")
     
     if st.button("🔍 Encontrar Oportunidades", key="oportunidades_btn"):
+        model = ai.modelo_disponible()
         if not model: st.error("El modelo de IA no está disponible.")
         elif df_filtrado.empty or not opciones_analisis: st.warning("Selecciona un área y asegúrate de que haya datos.")
         else:
@@ -322,7 +426,7 @@ with tab_oportunidades:
                     **Resumen de Datos:**
                     {resumen_oportunidades}
                     """
-                    respuesta_ia = model.generate_content(prompt_oportunidad)
+                    respuesta_ia = ai.generar(model, prompt_oportunidad)
                     st.markdown(respuesta_ia.text)
                 except Exception as e:
                     st.error(f"No se pudo generar el análisis de oportunidades: {e}")
@@ -335,13 +439,31 @@ with tab_asesor:
     uploaded_file = st.file_uploader("Sube una foto donde tu rostro se vea claramente", type=["jpg", "jpeg", "png"], key="style_uploader")
     
     if uploaded_file is not None:
-        image = Image.open(uploaded_file)
+        import image_preprocessing as ip
+        foto = ip.preprocesar_foto(uploaded_file.getvalue())
         col1, col2 = st.columns([1, 2])
         with col1:
-            st.image(image, caption="Imagen subida", width=250)
+            st.image(foto.imagen, caption="Imagen subida", width=250)
+            st.caption(ip.resumen(foto))
         with col2:
+            import result_store as rs
+            clave_recomendacion = rs.clave_resultado(foto.huella, ai.MODELO_GEMINI, "recomendacion")
+
+            def mostrar_recomendaciones(texto):
+                st.divider()
+                st.markdown("### 💈 Mis recomendaciones para ti:")
+                st.info("Copia el 'Nombre del Estilo' y las 'Especificaciones' en la pestaña 'Hazme un Nuevo Corte' para generar una vista previa.")
+                st.markdown(texto)
+                st.link_button("📅 ¡Reserva tu cita ahora!", "https://pi-web2-six.vercel.app", type="primary")
+
             if st.button("✨ ¡Recomiéndame un corte!", key="style_button"):
-                if not model:
+                # Primero las recomendaciones guardadas: con un acierto no se construye el cliente de Gemini
+                guardada = rs.almacen().obtener(clave_recomendacion)
+                model = None if guardada else ai.modelo_disponible()
+                if guardada:
+                    st.caption("♻️ Ya habías analizado esta foto: estas son tus recomendaciones guardadas.")
+                    mostrar_recomendaciones(guardada[0].decode("utf-8"))
+                elif not model:
                     st.error("El modelo de IA no está disponible.")
                 else:
                     with st.spinner("Analizando tus rasgos y buscando los mejores estilos... 🧐"):
@@ -371,24 +493,16 @@ with tab_asesor:
                                 [Aquí, escribe especificaciones detalladas y creativas que el usuario pueda copiar y pegar. Incluye detalles sobre textura (liso, ondulado), longitud, color sugerido, tipo de desvanecido, etc. Sé específico. Por ejemplo: "Cabello ondulado con textura natural, color castaño claro con reflejos sutiles, longitud media en la parte superior, desvanecido bajo (low fade) en los lados."]
                                 ```
                                 """,
-                                image,
+                                ai.parte_imagen(foto),
                             ]
                             
                             # Usamos la misma configuración de seguridad para evitar bloqueos
-                            safety_settings = {
-                                HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-                                HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-                                HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-                                HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-                            }
-
-                            response = model.generate_content(prompt_parts, safety_settings=safety_settings)
-                            
-                            st.divider()
-                            st.markdown("### 💈 Mis recomendaciones para ti:")
-                            st.info("Copia el 'Nombre del Estilo' y las 'Especificaciones' en la pestaña 'Hazme un Nuevo Corte' para generar una vista previa.")
-                            st.markdown(response.text)
-                            st.link_button("📅 ¡Reserva tu cita ahora!", "https://pi-web2-six.vercel.app", type="primary")
+                            safety_settings = ai.configuracion_seguridad()
+
+                            response = ai.generar(model, prompt_parts, safety_settings=safety_settings)
+                            rs.almacen().guardar(clave_recomendacion, response.text.encode("utf-8"), "text/markdown",
+                                                 foto=foto.huella, tipo="recomendacion")
+                            mostrar_recomendaciones(response.text)
                         
                         except Exception as e:
                             st.error("¡Oops! Ocurrió un error al analizar la imagen.")
@@ -402,11 +516,13 @@ with tab_hazme_corte:
     uploaded_file_corte = st.file_uploader("Sube una foto clara de tu rostro:", type=["jpg", "jpeg", "png"], key="corte_uploader")
 
     if uploaded_file_corte is not None:
-        image_corte = Image.open(uploaded_file_corte)
+        import image_preprocessing as ip
+        foto_corte = ip.preprocesar_foto(uploaded_file_corte.getvalue())
         col_img, col_ops = st.columns([1, 2])
 
         with col_img:
-            st.image(image_corte, caption="Tu Imagen Original", width=250)
+            st.image(foto_corte.imagen, caption="Tu Imagen Original", width=250)
+            st.caption(ip.resumen(foto_corte))
 
         with col_ops:
             st.markdown("### ✂️ Define tu Estilo")
@@ -425,8 +541,21 @@ with tab_hazme_corte:
                 key="especificaciones_corte"
             )
 
+            import result_store as rs
+
+            def mostrar_look(datos, corte):
+                st.success("¡Aquí está tu nuevo look!")
+                st.image(datos, caption=f"Tu look con el corte: {corte}", use_container_width=True)
+                st.link_button("📅 ¡Reserva tu cita ahora!", "https://pi-web2-six.vercel.app", type="primary")
+
             if st.button("✨ ¡Generar mi Nuevo Corte!", key="generar_corte_btn", type="primary"):
-                if not model:
+                clave_look = rs.clave_resultado(foto_corte.huella, ai.MODELO_GEMINI, "corte", corte_deseado, especificaciones_adicionales)
+                guardado = rs.almacen().obtener(clave_look) if corte_deseado else None
+                model = None if guardado else ai.modelo_disponible()
+                if guardado:
+                    st.caption("♻️ Ya habías generado este look con esta foto: se muestra sin volver a generarlo.")
+                    mostrar_look(guardado[0], corte_deseado)
+                elif not model:
                     st.error("El modelo de IA no está disponible.")
                 elif not corte_deseado:
                     st.warning("Por favor, selecciona o escribe el corte deseado.")
@@ -442,19 +571,15 @@ with tab_hazme_corte:
     Considera estas especificaciones adicionales: {especificaciones_adicionales if especificaciones_adicionales else 'Ninguna.'}
     La imagen final debe ser una visualización clara del nuevo corte. No tiene que ser fotorrealista si es un rostro humano.
     """,
-    image_corte,
+    ai.parte_imagen(foto_corte),
 ]
 
                             # Define la configuración de seguridad para ser menos restrictiva
-                            safety_settings = {
-                                HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-                                HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-                                HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-                                HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-                            }
+                            safety_settings = ai.configuracion_seguridad()
 
                             # Realiza la llamada a la IA AÑADIENDO la configuración de seguridad
-                            generated_response = model.generate_content(
+                            generated_response = ai.generar(
+                                model,
                                 prompt_generacion_corte,
                                 safety_settings=safety_settings
                             )
@@ -467,13 +592,9 @@ with tab_hazme_corte:
                                 image_found = False
                                 for part in generated_response.parts:
                                     if hasattr(part, 'blob') and hasattr(part.blob, 'mime_type') and part.blob.mime_type.startswith("image/"):
-                                        st.success("¡Aquí está tu nuevo look!")
-                                        st.image(
-                                            part.blob.data,
-                                            caption=f"Tu look con el corte: {corte_deseado}",
-                                            use_container_width=True
-                                        )
-                                        st.link_button("📅 ¡Reserva tu cita ahora!", "https://pi-web2-six.vercel.app", type="primary")
+                                        rs.almacen().guardar(clave_look, part.blob.data, part.blob.mime_type, foto=foto_corte.huella,
+                                                             tipo="corte", estilo=corte_deseado, especificaciones=especificaciones_adicionales)
+                                        mostrar_look(part.blob.data, corte_deseado)
                                         image_found = True
                                         break
                                 
@@ -492,4 +613,18 @@ with tab_hazme_corte:
                                 st.exception(e)
                         except Exception as e:
                             st.error("¡Oops! Ocurrió un error general al procesar la solicitud.")
-                            st.exception(e)
\ No newline at end of file
+                            st.exception(e)
+
+        # Galería de looks ya generados con esta misma foto: cambiar entre ellos no llama a la IA
+        looks_previos = rs.almacen().listar(foto=foto_corte.huella, tipo="corte")
+        if looks_previos:
+            st.markdown("#### 🗂️ Looks que ya generaste con esta foto")
+            columnas_looks = st.columns(3)
+            for i, (clave, meta) in enumerate(looks_previos[:6]):
+                guardado = rs.almacen().obtener(clave)
+                if guardado:
+                    with columnas_looks[i % 3]:
+                        st.image(guardado[0], caption=meta["estilo"] + (f" · {meta['especificaciones']}" if meta["especificaciones"] else ""),
+                                 use_container_width=True)
+
+perf.mostrar_panel()
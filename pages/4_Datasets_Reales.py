@@ -1,7 +1,15 @@
 import pandas as pd
 import streamlit as st
 import plotly.express as px
-import re
+import dataset_loader as dl
+import schema_resolver as sr
+import geo_rollup as geo
+import search_index as si
+import competencia as comp
+import data_manager as dm
+import instrumentation as perf
+
+MAX_SUGERENCIAS = 200
 
 # --- 1. CONFIGURACIÓN DE LA PÁGINA ---
 st.set_page_config(
@@ -11,63 +19,56 @@ st.set_page_config(
 )
 
 # --- 2. FUNCIÓN DE CARGA Y NORMALIZACIÓN ---
-@st.cache_data
-def load_and_normalize_dataset(url):
-    """Carga y normaliza columnas de forma robusta."""
+@st.cache_data(ttl=3600, show_spinner="Cargando dataset...")
+def load_and_normalize_dataset(nombre_dataset):
+    """Carga el dataset desde la caché local (Parquet) o lo descarga y normaliza si cambió. Devuelve (df, versión)."""
     try:
-        df = pd.read_csv(url, low_memory=False)
-        new_cols = []
-        for col in df.columns:
-            clean_col = str(col).lower().strip()
-            clean_col = clean_col.replace('_', ' ').replace('-', ' ')
-            clean_col = ' '.join(clean_col.split())
-            replacements = {
-                'razon social': 'nombre del establecimiento',
-                'nombre establecimiento': 'nombre del establecimiento',
-                'departamento domicilio': 'departamento',
-                'municipio domicilio': 'municipio',
-                'depto': 'departamento'
-            }
-            for old, new in replacements.items():
-                if old in clean_col:
-                    clean_col = new
-            clean_col = re.sub(r'[^a-z0-9\s]+$', '', clean_col).strip()
-            new_cols.append(clean_col)
-        df.columns = new_cols
-        return df
+        df, meta = dl.cargar_dataset(nombre_dataset)
+        return df, meta.get("version")
+    except sr.EsquemaInvalidoError as e:
+        st.error(f"La estructura del dataset cambió: faltan las columnas {e.faltantes}.")
+        st.warning(f"Columnas detectadas en el archivo: {e.encabezado}")
+        return pd.DataFrame(), None
     except Exception as e:
         st.error(f"Error crítico al cargar o procesar los datos: {e}")
-        try:
-            df_partial = pd.read_csv(url, low_memory=False, nrows=5)
-            st.warning(f"Columnas detectadas en el archivo: {df_partial.columns.tolist()}")
-        except:
-            pass
-        return pd.DataFrame()
+        columnas = dl.columnas_detectadas(nombre_dataset)
+        if columnas:
+            st.warning(f"Columnas detectadas en el archivo: {columnas}")
+        return pd.DataFrame(), None
+
+@st.cache_data(show_spinner=False)
+def obtener_rollup(nombre_dataset, version, columna, _df):
+    """Rollup por ubicación precalculado una vez por versión del dataset."""
+    columna_departamento = 'departamento' if columna != 'barrio' else None
+    return geo.construir_rollup(_df, columna, columna_departamento, georreferenciar=columna != 'barrio')
+
+@st.cache_resource(show_spinner="Indexando nombres de establecimientos...")
+def obtener_indice_nombres(nombre_dataset, version, _df):
+    """Índice de búsqueda por nombre, construido una vez por versión del dataset."""
+    return si.IndiceBusqueda(_df['nombre del establecimiento'])
 
 # ==============================================================================
 # --- 3. NUEVA SECCIÓN DE CONCLUSIONES ---
 # ==============================================================================
 
-def mostrar_conclusiones_dinamicas(df_original, df_filtrado, columna_ubicacion, nombre_singular_ubicacion):
+def mostrar_conclusiones_dinamicas(total_original, total_filtrado, rollup_filtrado, nombre_singular_ubicacion):
     """
-    Genera y muestra conclusiones basadas en los datos filtrados.
+    Genera y muestra conclusiones basadas en los datos filtrados (a partir del rollup por ubicación).
     """
     st.header("💡 Conclusiones Dinámicas")
 
-    if df_filtrado.empty:
+    if total_filtrado == 0:
         st.warning("No hay datos para los filtros seleccionados, por lo que no se pueden generar conclusiones.")
         return
 
     # Insight 1: Resumen del filtro
-    total_original = len(df_original)
-    total_filtrado = len(df_filtrado)
     porcentaje_filtrado = (total_filtrado / total_original) * 100
     st.info(f"Estás viendo **{total_filtrado:,}** establecimientos, que representan el **{porcentaje_filtrado:.1f}%** del total de **{total_original:,}** registros del dataset.")
 
-    # Insight 2: Ubicación más común
-    if columna_ubicacion in df_filtrado.columns and df_filtrado[columna_ubicacion].nunique() > 1:
-        lugar_top = df_filtrado[columna_ubicacion].mode()[0]
-        conteo_top = df_filtrado[columna_ubicacion].value_counts().max()
+    # Insight 2: Ubicación más común (el rollup ya viene ordenado de mayor a menor)
+    if len(rollup_filtrado) > 1:
+        lugar_top = rollup_filtrado['ubicacion'].iat[0]
+        conteo_top = rollup_filtrado['establecimientos'].iat[0]
         porcentaje_top = (conteo_top / total_filtrado) * 100
         
         mensaje = f"""
@@ -75,140 +76,216 @@ def mostrar_conclusiones_dinamicas(df_original, df_filtrado, columna_ubicacion,
         - Cuenta con **{conteo_top}** registros, lo que equivale al **{porcentaje_top:.1f}%** de los resultados mostrados.
         """
         st.markdown(mensaje)
-    elif df_filtrado[columna_ubicacion].nunique() == 1:
-        lugar_unico = df_filtrado[columna_ubicacion].unique()[0]
+    elif len(rollup_filtrado) == 1:
+        lugar_unico = rollup_filtrado['ubicacion'].iat[0]
         st.markdown(f"- Todos los resultados mostrados pertenecen al **{nombre_singular_ubicacion}** de **{lugar_unico}**.")
 
 
+def mostrar_mapa(rollup, titulo):
+    """Mapa de burbujas por municipio usando los centroides del gazetteer offline."""
+    if 'latitud' not in rollup.columns:
+        return
+    ubicados = rollup.dropna(subset=['latitud', 'longitud'])
+    st.subheader(titulo)
+    if ubicados.empty:
+        st.info("Ninguna ubicación de la selección aparece en el gazetteer de municipios.")
+        return
+    with perf.span("grafico:mapa"):
+        fig = px.scatter_map(
+            ubicados, lat='latitud', lon='longitud', size='establecimientos', color='establecimientos',
+            hover_name='ubicacion', hover_data={'codigo_dane': True, 'latitud': False, 'longitud': False},
+            color_continuous_scale=px.colors.sequential.YlOrRd, size_max=40,
+            center=geo.CENTRO_COLOMBIA if len(ubicados) > 1 else {'lat': ubicados['latitud'].iat[0], 'lon': ubicados['longitud'].iat[0]},
+            zoom=4.3 if len(ubicados) > 1 else 9, map_style="carto-darkmatter", height=550,
+        )
+    st.plotly_chart(fig, use_container_width=True)
+    sin_ubicar = len(rollup) - len(ubicados)
+    if sin_ubicar:
+        st.caption(f"{sin_ubicar} ubicaciones con {rollup['establecimientos'].sum() - ubicados['establecimientos'].sum():,} establecimientos no están en el gazetteer y no se muestran en el mapa.")
+
+
+@perf.medir("filtros")
+def filtrar_rollup(rollup, seleccion):
+    """Aplica el filtro de ubicación sobre el rollup en lugar de sobre las filas crudas."""
+    if seleccion == 'Todos':
+        return rollup
+    return rollup[rollup['ubicacion'] == seleccion]
+
+
 # ==============================================================================
 # --- 4. DASHBOARDS ESPECÍFICOS (AHORA INCLUYEN CONCLUSIONES) ---
 # ==============================================================================
 
-def mostrar_dashboard_nacional(df):
+def mostrar_dashboard_nacional(df, rollup, indice):
     st.sidebar.header("🔍 Filtros Nacionales")
-    df_filtrado = df.copy()
+    df_filtrado = df
     
-    # ... (código de filtros sin cambios) ...
     st.sidebar.subheader("Filtrar por Establecimiento")
-    if 'nombre del establecimiento' in df_filtrado.columns:
-        nombres = ['Todos'] + sorted(df_filtrado['nombre del establecimiento'].dropna().unique())
-        nombre_sel = st.sidebar.selectbox("Selecciona un nombre", nombres)
-        if nombre_sel != 'Todos':
+    consulta = st.sidebar.text_input("Busca por nombre", placeholder="Ej: barberia kingdom", key="busqueda_nombre")
+    posiciones = indice.buscar(consulta)
+    if posiciones is not None:
+        df_filtrado = df_filtrado.iloc[posiciones]
+        st.sidebar.caption(f"{len(posiciones):,} establecimientos coinciden con la búsqueda.")
+        # Sugerencias para afinar la búsqueda a un nombre exacto
+        sugerencias = df_filtrado['nombre del establecimiento'].dropna().unique()[:MAX_SUGERENCIAS]
+        nombre_sel = st.sidebar.selectbox("Coincidencias", ['Todas'] + sorted(sugerencias))
+        if nombre_sel != 'Todas':
             df_filtrado = df_filtrado[df_filtrado['nombre del establecimiento'] == nombre_sel]
+        # El subconjunto es pequeño: su rollup se calcula al vuelo
+        rollup = geo.construir_rollup(df_filtrado, 'municipio comercial', 'departamento')
     st.sidebar.subheader("Filtrar por Ubicación")
-    if 'municipio comercial' in df_filtrado.columns:
-        municipios = ['Todos'] + sorted(df_filtrado['municipio comercial'].dropna().unique())
-        municipio_sel = st.sidebar.selectbox("Municipio Comercial", municipios)
-        if municipio_sel != 'Todos':
-            df_filtrado = df_filtrado[df_filtrado['municipio comercial'] == municipio_sel]
+    municipios = ['Todos'] + sorted(rollup['ubicacion'])
+    municipio_sel = st.sidebar.selectbox("Municipio Comercial", municipios)
+    if municipio_sel != 'Todos':
+        df_filtrado = df_filtrado[df_filtrado['municipio comercial'] == municipio_sel]
+    rollup_sel = filtrar_rollup(rollup, municipio_sel)
             
     st.header("Métricas Clave a Nivel Nacional")
-    # ... (código de métricas sin cambios) ...
     total_registros = len(df_filtrado)
-    total_municipios = df_filtrado['municipio comercial'].nunique() if 'municipio comercial' in df_filtrado.columns else 0
-    municipio_comun = df_filtrado['municipio comercial'].mode()[0] if total_municipios > 0 and not df_filtrado['municipio comercial'].mode().empty else "N/A"
+    total_municipios = len(rollup_sel)
+    municipio_comun = rollup_sel['ubicacion'].iat[0] if total_municipios > 0 else "N/A"
     col1, col2, col3 = st.columns(3)
     col1.metric("💈 Establecimientos Encontrados", f"{total_registros:,}")
     col2.metric("🗺️ Municipios en Selección", f"{total_municipios}")
     col3.metric("📍 Municipio Más Común", municipio_comun)
 
-    # Llamada a la nueva función de conclusiones
-    mostrar_conclusiones_dinamicas(df, df_filtrado, 'municipio comercial', 'Municipio')
+    mostrar_conclusiones_dinamicas(len(df), total_registros, rollup_sel, 'Municipio')
     
     st.header("Análisis Visual Nacional")
-    # ... (código de gráficos sin cambios) ...
-    if 'municipio comercial' in df_filtrado.columns:
-        st.subheader("Establecimientos por Municipio Comercial")
-        conteo_mun = df_filtrado['municipio comercial'].value_counts().nlargest(15).reset_index()
-        fig = px.bar(conteo_mun, x='municipio comercial', y='count', text_auto=True, title="Top 15 Municipios")
-        st.plotly_chart(fig, use_container_width=True)
-    else:
-        st.info("No se encontró la columna 'municipio comercial' para generar gráficos.")
+    st.subheader("Establecimientos por Municipio Comercial")
+    fig = px.bar(rollup_sel.head(15), x='ubicacion', y='establecimientos', text_auto=True, title="Top 15 Municipios",
+                 labels={'ubicacion': 'Municipio comercial', 'establecimientos': 'Establecimientos'})
+    st.plotly_chart(fig, use_container_width=True)
+    mostrar_mapa(rollup_sel, "Mapa de Establecimientos por Municipio")
 
     return df_filtrado
 
-def mostrar_dashboard_risaralda(df):
+def mostrar_dashboard_risaralda(df, rollup):
     st.sidebar.header("🔍 Filtros para Risaralda")
-    df_filtrado = df.copy()
-    # ... (código de filtros sin cambios) ...
-    municipios = ['Todos'] + sorted(df['municipio'].dropna().unique())
+    df_filtrado = df
+    municipios = ['Todos'] + sorted(rollup['ubicacion'])
     mun_sel = st.sidebar.selectbox("Municipio de Risaralda", municipios)
     if mun_sel != 'Todos':
         df_filtrado = df_filtrado[df_filtrado['municipio'] == mun_sel]
+    rollup_sel = filtrar_rollup(rollup, mun_sel)
 
     st.header("Métricas Clave para Risaralda")
-    # ... (código de métricas sin cambios) ...
     total_registros = len(df_filtrado)
-    municipio_comun = df_filtrado['municipio'].mode()[0] if not df_filtrado.empty else "N/A"
+    municipio_comun = rollup_sel['ubicacion'].iat[0] if not rollup_sel.empty else "N/A"
     col1, col2 = st.columns(2)
     col1.metric("💈 Establecimientos en Selección", f"{total_registros:,}")
     col2.metric("📍 Municipio Más Común", municipio_comun)
 
-    # Llamada a la nueva función de conclusiones
-    mostrar_conclusiones_dinamicas(df, df_filtrado, 'municipio', 'Municipio')
+    mostrar_conclusiones_dinamicas(len(df), total_registros, rollup_sel, 'Municipio')
 
     st.header("Análisis Visual para Risaralda")
-    # ... (código de gráficos sin cambios) ...
     st.subheader("Distribución de Establecimientos por Municipio")
-    conteo_mun = df_filtrado['municipio'].value_counts().reset_index()
-    fig = px.bar(conteo_mun, x='municipio', y='count', text_auto=True, title="Conteos por Municipio en Risaralda")
+    fig = px.bar(rollup_sel, x='ubicacion', y='establecimientos', text_auto=True, title="Conteos por Municipio en Risaralda",
+                 labels={'ubicacion': 'Municipio', 'establecimientos': 'Establecimientos'})
     st.plotly_chart(fig, use_container_width=True)
+    mostrar_mapa(rollup_sel, "Mapa de Establecimientos en Risaralda")
 
     return df_filtrado
 
-def mostrar_dashboard_local(df):
+def mostrar_dashboard_local(df, rollup):
     st.sidebar.header("🔍 Filtros Locales")
-    df_filtrado = df.copy()
-    # ... (código de filtros sin cambios) ...
-    barrios = ['Todos'] + sorted(df['barrio'].dropna().unique())
+    df_filtrado = df
+    barrios = ['Todos'] + sorted(rollup['ubicacion'])
     barrio_sel = st.sidebar.selectbox("Barrio", barrios)
     if barrio_sel != 'Todos':
         df_filtrado = df_filtrado[df_filtrado['barrio'] == barrio_sel]
+    rollup_sel = filtrar_rollup(rollup, barrio_sel)
     
     st.header("Métricas Clave Locales")
-    # ... (código de métricas sin cambios) ...
     total_registros = len(df_filtrado)
-    barrio_comun = df_filtrado['barrio'].mode()[0] if not df_filtrado.empty else "N/A"
+    barrio_comun = rollup_sel['ubicacion'].iat[0] if not rollup_sel.empty else "N/A"
     col1, col2 = st.columns(2)
     col1.metric("💈 Establecimientos Encontrados", f"{total_registros:,}")
     col2.metric("📍 Barrio Más Común", barrio_comun)
 
-    # Llamada a la nueva función de conclusiones
-    mostrar_conclusiones_dinamicas(df, df_filtrado, 'barrio', 'Barrio')
+    mostrar_conclusiones_dinamicas(len(df), total_registros, rollup_sel, 'Barrio')
     
     st.header("Análisis Visual Local")
-    # ... (código de gráficos sin cambios) ...
     st.subheader("Top 15 Barrios con más Establecimientos")
-    conteo_barrio = df_filtrado['barrio'].value_counts().nlargest(15).reset_index()
-    fig = px.bar(conteo_barrio, x='barrio', y='count', text_auto=True, title="Establecimientos por Barrio")
+    fig = px.bar(rollup_sel.head(15), x='ubicacion', y='establecimientos', text_auto=True, title="Establecimientos por Barrio",
+                 labels={'ubicacion': 'Barrio', 'establecimientos': 'Establecimientos'})
     st.plotly_chart(fig, use_container_width=True)
     
     return df_filtrado
 
+@st.cache_data(show_spinner="Cruzando sedes con la competencia...")
+def obtener_competencia(nombre_dataset, version, nivel, df_sedes, huella_citas, _df_vista, _rollup):
+    """Análisis de competencia cacheado por versión del dataset y estado de las citas."""
+    return comp.analizar_competencia(df_sedes, _df_vista, _rollup, nivel)
+
+def mostrar_competencia(nombre_dataset, version, rollup, nivel):
+    """Compara los ingresos de cada sede de Kingdom Barber con la competencia de su zona."""
+    st.header("🏁 Nuestras Sedes frente a la Competencia")
+    if not st.toggle("Comparar con las sedes de Kingdom Barber", key="toggle_competencia"):
+        st.caption("Activa la comparación para cruzar las sedes y sus ingresos con los establecimientos de este dataset.")
+        return
+
+    df_vista, df_sedes = dm.obtener_vista_citas_completa()
+    if df_sedes.empty or 'Nombre_Sede' not in df_sedes.columns:
+        st.warning("No se pudieron cargar las sedes desde la API.")
+        return
+
+    huella_citas = (len(df_vista), float(df_vista['Precio'].sum()) if 'Precio' in df_vista.columns else 0.0)
+    columnas_sede = ['Nombre_Sede'] + [c for c in comp.COLUMNAS_UBICACION_SEDE if c in df_sedes.columns]
+    df_comp = obtener_competencia(nombre_dataset, version, nivel, df_sedes[columnas_sede], huella_citas, df_vista, rollup)
+
+    sin_ubicar = df_comp['ubicacion'].isna().sum()
+    if sin_ubicar:
+        st.info(f"{sin_ubicar} sedes no se pudieron ubicar en este dataset (su {nivel} no aparece en los datos públicos).")
+
+    st.dataframe(
+        df_comp, use_container_width=True, hide_index=True,
+        column_config={
+            "Nombre_Sede": "Sede",
+            "ubicacion": st.column_config.TextColumn(nivel.capitalize()),
+            "ingresos": st.column_config.NumberColumn("Ingresos ($)", format="$ %.0f"),
+            "citas": st.column_config.NumberColumn("Citas", format="%d"),
+            "competidores": st.column_config.NumberColumn("Competidores", format="%d"),
+            "cuota_mercado": st.column_config.NumberColumn("Cuota de Mercado (%)", format="%.1f%%"),
+            "indice_saturacion": st.column_config.NumberColumn("Índice de Saturación", format="%.2f", help="Competidores de la zona frente a la mediana del dataset (1.0 = zona típica)."),
+            "ingreso_por_competidor": st.column_config.NumberColumn("Ingreso por Competidor ($)", format="$ %.0f"),
+        },
+    )
+    ubicadas = df_comp.dropna(subset=['ubicacion'])
+    if not ubicadas.empty:
+        fig = px.scatter(ubicadas, x='competidores', y='ingresos', size=ubicadas['citas'].clip(lower=1), color='indice_saturacion',
+                         text='Nombre_Sede', title="Ingresos por Sede vs. Competencia Local",
+                         labels={'competidores': 'Establecimientos competidores', 'ingresos': 'Ingresos ($)', 'indice_saturacion': 'Saturación'},
+                         color_continuous_scale=px.colors.sequential.YlOrRd)
+        fig.update_traces(textposition='top center')
+        st.plotly_chart(fig, use_container_width=True)
+
 # ==============================================================================
 # --- 5. APLICACIÓN PRINCIPAL ---
 # ==============================================================================
 def app():
+    perf.iniciar_rerun("Datasets Reales")
     st.title("📈 Dashboard de Peluquerías y Salones de Belleza en Colombia")
     st.markdown("---")
-    datasets = {
-        "Nacional - Establecimientos de Belleza": "https://www.datos.gov.co/api/views/e27n-di57/rows.csv?accessType=DOWNLOAD",
-        "Risaralda - Estética Facial y Corporal": "https://www.datos.gov.co/api/views/92e4-cjqu/rows.csv?accessType=DOWNLOAD",
-        "Estética Local (Ejemplo)": "https://www.datos.gov.co/api/views/mwxa-drpn/rows.csv?accessType=DOWNLOAD",
-    }
     st.subheader("Paso 1: Selecciona un conjunto de datos para analizar")
-    opcion_dataset = st.selectbox("Elige el dataset que quieres visualizar:", list(datasets.keys()))
-    df_original = load_and_normalize_dataset(datasets[opcion_dataset])
+    opcion_dataset = st.selectbox("Elige el dataset que quieres visualizar:", list(dl.DATASETS.keys()))
+    with perf.span("dataset:cargar"):
+        df_original, version = load_and_normalize_dataset(opcion_dataset)
     if df_original.empty:
         st.warning("No se pudieron cargar los datos.")
         st.stop()
+    rollup = None
     try:
         if opcion_dataset == "Nacional - Establecimientos de Belleza":
-            df_final = mostrar_dashboard_nacional(df_original)
+            rollup = obtener_rollup(opcion_dataset, version, 'municipio comercial', df_original)
+            indice = obtener_indice_nombres(opcion_dataset, version, df_original)
+            df_final = mostrar_dashboard_nacional(df_original, rollup, indice)
         elif opcion_dataset == "Risaralda - Estética Facial y Corporal":
-            df_final = mostrar_dashboard_risaralda(df_original)
+            rollup = obtener_rollup(opcion_dataset, version, 'municipio', df_original)
+            df_final = mostrar_dashboard_risaralda(df_original, rollup)
         elif opcion_dataset == "Estética Local (Ejemplo)":
-            df_final = mostrar_dashboard_local(df_original)
+            rollup = obtener_rollup(opcion_dataset, version, 'barrio', df_original)
+            df_final = mostrar_dashboard_local(df_original, rollup)
         else:
             df_final = df_original
             st.info("Mostrando datos crudos.")
@@ -218,10 +295,16 @@ def app():
         st.write("Columnas encontradas después de la normalización:")
         st.write(df_original.columns.tolist())
         df_final = df_original
+    if rollup is not None:
+        st.markdown("---")
+        nivel = 'barrio' if opcion_dataset == "Estética Local (Ejemplo)" else 'municipio'
+        with perf.span("competencia"):
+            mostrar_competencia(opcion_dataset, version, rollup, nivel)
     st.markdown("---")
     st.header("Explorador de Datos")
     st.write(f"Mostrando {len(df_final)} de {len(df_original)} registros según los filtros.")
     st.dataframe(df_final)
+    perf.mostrar_panel()
 
 if __name__ == "__main__":
     app()
\ No newline at end of file
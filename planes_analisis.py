@@ -0,0 +1,65 @@
+import functools
+import hashlib
+import io
+import re
+
+import pandas as pd
+
+import instrumentation as perf
+import result_store as rs
+from text_utils import normalizar_cadena
+
+# --- Configuración ---
+TIPO = "plan_analisis"
+MIMES = {"python": "text/x-python", "sql": "application/sql"}
+# Un resultado "solo numérico" es un único número, opcionalmente con signo de pesos o porcentaje
+NUMERO = re.compile(r"^\s*\$?\s*-?[\d.,]+\s*%?\s*$")
+
+
+def firma_esquema(df):
+    """Columnas y dtypes: el código generado solo depende de esto, no de las filas filtradas."""
+    return tuple((columna, str(dtype)) for columna, dtype in df.dtypes.items())
+
+
+def clave_plan(pregunta, lenguaje, firma, modelo):
+    """Misma pregunta (sin importar mayúsculas, tildes ni signos) + lenguaje + esquema + modelo => misma clave."""
+    partes = [normalizar_cadena(pregunta), lenguaje, repr(firma), modelo]
+    return hashlib.sha256("\x1f".join(partes).encode("utf-8")).hexdigest()
+
+
+def limpiar_codigo(texto, lenguaje):
+    """Quita las cercas de Markdown con las que el modelo suele envolver el código."""
+    return texto.strip().replace(f"```{lenguaje}", "").replace("```", "").strip()
+
+
+def buscar(clave):
+    """Código guardado para esta clave, o None."""
+    perf.contar("cache.planes.llamadas")
+    guardado = rs.almacen().obtener(clave)
+    if guardado is None:
+        perf.contar("cache.planes.fallos")
+        return None
+    return guardado[0].decode("utf-8")
+
+
+def guardar(clave, codigo, lenguaje, pregunta):
+    """Guarda un plan que ya se ejecutó con éxito (nunca uno que falló)."""
+    rs.almacen().guardar(clave, codigo.encode("utf-8"), MIMES[lenguaje], tipo=TIPO, lenguaje=lenguaje,
+                         pregunta=" ".join(pregunta.split()))
+
+
+def ejecutar_pandas(codigo, df):
+    """
+    Ejecuta el script sobre una copia de `df` y devuelve lo que imprime. `print` se inyecta
+    apuntando a un buffer propio en lugar de reemplazar `sys.stdout`, que es global al proceso
+    y lo comparten todas las sesiones.
+    """
+    salida = io.StringIO()
+    exec(codigo, {'pd': pd, 'df': df.copy(), 'print': functools.partial(print, file=salida)})
+    return salida.getvalue()
+
+
+def valor_numerico(resultado):
+    """El número si el resultado es solo eso (no hace falta que el modelo lo interprete); None si no."""
+    texto = resultado.strip()
+    return texto if NUMERO.match(texto) and any(c.isdigit() for c in texto) else None
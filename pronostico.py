@@ -0,0 +1,160 @@
+import itertools
+import os
+
+import numpy as np
+import pandas as pd
+
+# --- Configuración ---
+HORIZONTE_DIAS = int(os.environ.get("KB_PRONOSTICO_DIAS", 28))
+ESTACIONALIDAD = 7                   # semanal: el patrón lunes..domingo se repite
+AMORTIGUACION = 0.98                 # tendencia amortiguada: no se proyecta una recta indefinidamente
+Z_BANDA = 1.28                       # banda de predicción del 80 %
+# Rejilla de parámetros (alfa: nivel, beta: tendencia, gamma: estacionalidad). Se evalúan todas a la
+# vez para todas las series y cada serie se queda con la de menor error de un paso.
+REJILLA = list(itertools.product((0.05, 0.15, 0.35), (0.0, 0.05, 0.15), (0.05, 0.15, 0.3)))
+NIVELES = {"sede": "Nombre_Sede", "barbero": "Nombre_Completo_Barbero", "servicio": "Nombre_Servicio"}
+
+
+def _matriz_diaria(citas, columna, dia, n_dias):
+    """Conteo de citas por (valor de `columna`, día) como matriz densa, con un solo bincount."""
+    codigos, valores = pd.factorize(citas[columna])
+    validas = codigos >= 0
+    plano = np.bincount(codigos[validas] * n_dias + dia[validas], minlength=len(valores) * n_dias)
+    return list(valores), plano.reshape(len(valores), n_dias).astype(float)
+
+
+def ajustar_holt_winters(Y, rejilla=REJILLA, m=ESTACIONALIDAD, phi=AMORTIGUACION):
+    """
+    Holt-Winters aditivo con tendencia amortiguada, ajustado a todas las filas de `Y` (series ×
+    días) a la vez. Las combinaciones de la rejilla son un eje más del arreglo, así que el único
+    bucle de Python es sobre el tiempo. Devuelve los estados finales y parámetros elegidos por serie.
+    """
+    n_series, n_dias = Y.shape
+    parametros = np.array(rejilla)                        # (G, 3)
+    alfa, beta, gamma = (parametros[:, i, None] for i in range(3))   # (G, 1) para difundir sobre series
+
+    # Estados iniciales a partir de las dos primeras semanas
+    nivel0 = Y[:, :m].mean(axis=1)
+    tendencia0 = (Y[:, m:2 * m].mean(axis=1) - nivel0) / m
+    estacional0 = Y[:, :m] - nivel0[:, None]
+    G = len(parametros)
+    nivel = np.broadcast_to(nivel0, (G, n_series)).copy()
+    tendencia = np.broadcast_to(tendencia0, (G, n_series)).copy()
+    estacional = np.broadcast_to(estacional0, (G, n_series, m)).copy()
+    sse = np.zeros((G, n_series))
+
+    for t in range(m, n_dias):
+        k = t % m
+        error = Y[:, t] - (nivel + phi * tendencia + estacional[:, :, k])
+        sse += error ** 2
+        nivel = nivel + phi * tendencia + alfa * error
+        tendencia = phi * tendencia + alfa * beta * error
+        estacional[:, :, k] += gamma * error
+
+    mejor = sse.argmin(axis=0)                            # (S,)
+    series = np.arange(n_series)
+    return {
+        "nivel": nivel[mejor, series],
+        "tendencia": tendencia[mejor, series],
+        "estacional": estacional[mejor, series],          # (S, m), posición = t % m
+        "sigma": np.sqrt(sse[mejor, series] / max(n_dias - m, 1)),
+        "parametros": parametros[mejor],                  # (S, 3)
+        "n_dias": n_dias,
+    }
+
+
+def pronosticar(modelo, horizonte=HORIZONTE_DIAS, m=ESTACIONALIDAD, phi=AMORTIGUACION):
+    """Media y desviación (series × horizonte) de los próximos `horizonte` días."""
+    h = np.arange(1, horizonte + 1)
+    suma_phi = np.cumsum(phi ** h)                        # φ + φ² + … + φ^h
+    posicion = (modelo["n_dias"] + h - 1) % m
+    media = modelo["nivel"][:, None] + modelo["tendencia"][:, None] * suma_phi + modelo["estacional"][:, posicion]
+
+    # Varianza del ETS(A,Ad,A): σ² (1 + Σ_{j<h} c_j²), c_j = α(1 + β Σ_{i≤j} φ^i) + γ·[j múltiplo de m]
+    alfa, beta, gamma = (modelo["parametros"][:, i, None] for i in range(3))
+    j = h[:-1]
+    c = alfa * (1 + beta * np.cumsum(phi ** j)) + gamma * (j % m == 0)
+    acumulado = np.concatenate([np.zeros((len(c), 1)), np.cumsum(c ** 2, axis=1)], axis=1)
+    desviacion = modelo["sigma"][:, None] * np.sqrt(1 + acumulado)
+    return np.clip(media, 0, None), desviacion
+
+
+class Pronosticos:
+    """
+    Pronóstico de citas diarias para el total y para cada sede, barbero y servicio, ajustado una
+    sola vez por versión de datos. Todas las series comparten el eje de días, así que el ajuste
+    es una sola pasada de `ajustar_holt_winters` sobre la matriz completa.
+    """
+
+    def __init__(self, df_vista, horizonte=HORIZONTE_DIAS):
+        citas = df_vista.dropna(subset=['ID_Cita', 'Fecha'])
+        self.claves, self.modelo = [], None
+        if citas.empty:
+            return
+        dias = citas['Fecha'].to_numpy().astype('datetime64[D]')
+        inicio, fin = dias.min(), dias.max()
+        n_dias = int((fin - inicio).astype(int)) + 1
+        if n_dias < 3 * ESTACIONALIDAD:
+            return  # historia insuficiente para estimar la estacionalidad semanal
+        dia = (dias - inicio).astype(np.int64)
+
+        filas = [np.bincount(dia, minlength=n_dias).astype(float)]
+        self.claves = [("total", "Todas")]
+        for nivel, columna in NIVELES.items():
+            valores, matriz = _matriz_diaria(citas, columna, dia, n_dias)
+            filas.extend(matriz)
+            self.claves.extend((nivel, v) for v in valores)
+        self._posicion = {clave: i for i, clave in enumerate(self.claves)}
+
+        self.modelo = ajustar_holt_winters(np.vstack(filas))
+        self.media, self.desviacion = pronosticar(self.modelo, horizonte)
+        self.fechas = pd.date_range(pd.Timestamp(fin) + pd.Timedelta(days=1), periods=horizonte, freq="D")
+
+    def __contains__(self, clave):
+        return self.modelo is not None and clave in self._posicion
+
+    def serie(self, nivel, valor):
+        """Pronóstico diario de una serie: Fecha, Pronostico, Desviacion, Inferior y Superior."""
+        i = self._posicion[(nivel, valor)]
+        media, desviacion = self.media[i], self.desviacion[i]
+        return pd.DataFrame({
+            "Fecha": self.fechas, "Pronostico": media, "Desviacion": desviacion,
+            "Inferior": np.clip(media - Z_BANDA * desviacion, 0, None), "Superior": media + Z_BANDA * desviacion,
+        })
+
+    def resumen(self, nivel, dias=7):
+        """Citas esperadas en los próximos `dias` días para cada serie de un nivel (para planear turnos)."""
+        filas = [(valor, self.media[i, :dias].sum()) for (n, valor), i in self._posicion.items() if n == nivel]
+        return pd.DataFrame(filas, columns=[nivel.capitalize(), f"Citas próximos {dias} días"]).sort_values(
+            f"Citas próximos {dias} días", ascending=False)
+
+
+def agrupar_con_historia(diaria, pronostico, agrupacion):
+    """
+    Lleva el pronóstico diario a la agrupación del gráfico (Día / Semana / Mes). Si el último
+    periodo real está incompleto se suma lo observado con lo pronosticado; las bandas suman
+    varianzas (errores diarios independientes).
+    """
+    futuro = pronostico.set_index('Fecha')
+    observado = diaria.set_index('Fecha')['Numero de Citas'].astype(float)
+    if agrupacion == 'Día':
+        resultado = futuro[['Pronostico', 'Inferior', 'Superior']].reset_index()
+        resultado['Fecha'] = resultado['Fecha'].dt.date
+        return resultado
+
+    regla = 'W-Mon' if agrupacion == 'Semana' else 'ME'
+    agrupado = pd.DataFrame({
+        "Pronostico": futuro['Pronostico'].resample(regla).sum(),
+        "Varianza": (futuro['Desviacion'] ** 2).resample(regla).sum(),
+    })
+    # El último periodo que el horizonte no alcanza a cubrir se descarta para no mostrarlo "a medias"
+    agrupado = agrupado[agrupado.index <= futuro.index[-1]]
+    # Solo el primer periodo puede mezclar días observados y pronosticados; reindex descarta el resto
+    agrupado['Pronostico'] += observado.resample(regla).sum().reindex(agrupado.index, fill_value=0)
+    banda = Z_BANDA * np.sqrt(agrupado.pop('Varianza'))
+    agrupado['Inferior'] = (agrupado['Pronostico'] - banda).clip(lower=0)
+    agrupado['Superior'] = agrupado['Pronostico'] + banda
+    resultado = agrupado.reset_index()
+    if agrupacion == 'Mes':
+        resultado['Fecha'] = resultado['Fecha'].dt.strftime('%Y-%m')
+    return resultado
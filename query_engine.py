@@ -0,0 +1,398 @@
+import importlib.util
+import os
+import re
+import threading
+import warnings
+from collections import OrderedDict
+from dataclasses import dataclass, fields, replace
+from datetime import date, datetime, time, timedelta
+
+import numpy as np
+import pandas as pd
+
+import instrumentation as perf
+
+# --- Configuración ---
+# auto: DuckDB si está instalado; pandas si no. Se puede forzar con KB_MOTOR_CONSULTAS=pandas|duckdb.
+# duckdb es opcional (no está en requirements.txt, como redis): solo se importa dentro de MotorDuckDB.
+MOTOR_PREFERIDO = os.environ.get("KB_MOTOR_CONSULTAS", "auto")
+COLUMNAS_FILTRO = {
+    "sede": "Nombre_Sede",
+    "barbero": "Nombre_Completo_Barbero",
+    "cliente": "Nombre_Completo_Cliente",
+    "servicio": "Nombre_Servicio",
+}
+SIN_FILTRO = {None, "", "Todas", "Todos"}
+# Memoria máxima para los índices de filas filtradas que se reutilizan entre páginas y sesiones
+MAX_MEMO_BYTES = int(os.environ.get("KB_MEMO_FILTROS_MB", 64)) * 1024 * 1024
+COLUMNA_POSICION = "__fila"   # columna auxiliar de MotorDuckDB con la posición de cada fila
+PALABRAS_PROHIBIDAS_SQL = re.compile(
+    r"\b(ATTACH|DETACH|COPY|EXPORT|IMPORT|INSTALL|LOAD|PRAGMA|SET|RESET|CALL|CREATE|ALTER|DROP|INSERT|UPDATE|DELETE|"
+    r"TRUNCATE|CHECKPOINT|VACUUM)\b|\b(read_\w+|glob|getenv)\s*\(",
+    re.IGNORECASE,
+)
+
+
+def duckdb_disponible():
+    return importlib.util.find_spec("duckdb") is not None
+
+
+def _activo(valor):
+    return valor not in SIN_FILTRO
+
+
+def _como_fecha(valor):
+    if valor is None or isinstance(valor, date) and not isinstance(valor, datetime):
+        return valor
+    return pd.Timestamp(valor).date()
+
+
+@dataclass(frozen=True)
+class FiltroCitas:
+    """
+    Especificación canónica de los filtros de citas, compartida por todas las páginas.
+
+    "Todas", "Todos" y "" equivalen a no filtrar (None) y las fechas se guardan como `date`, así
+    que la misma selección produce la misma clave en el Dashboard, en Gestión de Citas y en el
+    Asistente IA, y reutiliza el mismo subconjunto de filas.
+    """
+
+    sede: object = None
+    barbero: object = None
+    cliente: object = None
+    servicio: object = None
+    desde: object = None
+    hasta: object = None
+    solo_citas: bool = True
+
+    def __post_init__(self):
+        for campo in COLUMNAS_FILTRO:
+            if not _activo(getattr(self, campo)):
+                object.__setattr__(self, campo, None)
+        for campo in ("desde", "hasta"):
+            object.__setattr__(self, campo, _como_fecha(getattr(self, campo)))
+
+    @classmethod
+    def de(cls, filtros, solo_citas=None):
+        """Acepta un FiltroCitas o un dict con las claves sede/barbero/cliente/servicio/desde/hasta."""
+        if not isinstance(filtros, cls):
+            nombres = {f.name for f in fields(cls)}
+            filtros = cls(**{k: v for k, v in filtros.items() if k in nombres})
+        return filtros if solo_citas is None or filtros.solo_citas == solo_citas else replace(filtros, solo_citas=solo_citas)
+
+    def con(self, **cambios):
+        """Copia con algunos campos cambiados (para construir los filtros en cascada)."""
+        return replace(self, **cambios)
+
+    def activos(self):
+        """(columna, valor) de los filtros por igualdad que sí restringen."""
+        return [(columna, getattr(self, campo)) for campo, columna in COLUMNAS_FILTRO.items() if getattr(self, campo) is not None]
+
+
+def _limites_fecha(filtro):
+    """Rango [desde 00:00, hasta+1 día) para comparar la columna datetime sin extraer `.dt.date`."""
+    return (datetime.combine(filtro.desde, time.min) if filtro.desde else None,
+            datetime.combine(filtro.hasta, time.min) + timedelta(days=1) if filtro.hasta else None)
+
+
+class MemoIndices:
+    """
+    LRU de posiciones de filas por (versión de datos, FiltroCitas), acotado por bytes. Los
+    arreglos guardados son de solo lectura porque se comparten entre sesiones.
+    """
+
+    def __init__(self, max_bytes=MAX_MEMO_BYTES):
+        self.max_bytes = max_bytes
+        self._entradas = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        perf.contar("cache.filtros.llamadas")
+        with self._lock:
+            indices = self._entradas.get(clave)
+            if indices is not None:
+                self._entradas.move_to_end(clave)
+        if indices is None:
+            perf.contar("cache.filtros.fallos")
+        return indices
+
+    def guardar(self, clave, indices):
+        indices.flags.writeable = False
+        with self._lock:
+            if clave in self._entradas:
+                return self._entradas[clave]
+            self._entradas[clave] = indices
+            self._bytes += indices.nbytes
+            while self._bytes > self.max_bytes and len(self._entradas) > 1:
+                _, viejo = self._entradas.popitem(last=False)
+                self._bytes -= viejo.nbytes
+        return indices
+
+
+def _serie_desde_diaria(diaria, agrupacion):
+    """Misma agregación temporal del Dashboard a partir de conteos diarios (pocas filas)."""
+    if diaria.empty:
+        return pd.DataFrame(columns=['Fecha', 'Numero de Citas'])
+    diaria = diaria.set_index('Fecha')['Numero de Citas']
+    if agrupacion == 'Día':
+        resultado = diaria.reset_index()
+        resultado['Fecha'] = resultado['Fecha'].dt.date
+        return resultado
+    if agrupacion == 'Semana':
+        return diaria.resample('W-Mon').sum().reset_index()
+    resultado = diaria.resample('ME').sum().reset_index()
+    resultado['Fecha'] = resultado['Fecha'].dt.strftime('%Y-%m')
+    return resultado
+
+
+class MotorPandas:
+    """
+    Consultas sobre la vista de citas en pandas. Todos los filtros se combinan en una sola
+    máscara booleana y solo se materializan las columnas que cada consulta necesita. Las
+    posiciones resultantes se memorizan por FiltroCitas: cualquier página o sesión que pida la
+    misma selección reutiliza el subconjunto sin recalcular la máscara.
+    """
+
+    nombre = "pandas"
+    soporta_sql = False
+
+    def __init__(self, df_vista, version=None):
+        self.df = df_vista
+        self.version = version
+        self._memo = MemoIndices()
+
+    def _mascara(self, filtro):
+        df = self.df
+        mascara = np.ones(len(df), dtype=bool)
+        if filtro.solo_citas:
+            mascara &= df['ID_Cita'].notna().to_numpy()
+        for columna, valor in filtro.activos():
+            mascara &= (df[columna] == valor).to_numpy()
+        desde, hasta = _limites_fecha(filtro)
+        if desde is not None:
+            mascara &= (df['Fecha'] >= desde).to_numpy()
+        if hasta is not None:
+            mascara &= (df['Fecha'] < hasta).to_numpy()
+        return mascara
+
+    def indices(self, filtros, solo_citas=True):
+        """Posiciones (de solo lectura) de las filas que cumplen los filtros, memorizadas en un LRU."""
+        filtro = FiltroCitas.de(filtros, solo_citas)
+        clave = (self.version, filtro)
+        indices = self._memo.obtener(clave)
+        if indices is None:
+            # int32 alcanza para cualquier vista realista y ocupa la mitad en el memo
+            tipo = np.int32 if len(self.df) < 2 ** 31 else np.int64
+            indices = self._memo.guardar(clave, self._calcular_indices(filtro).astype(tipo))
+        return indices
+
+    def _calcular_indices(self, filtro):
+        return np.flatnonzero(self._mascara(filtro))
+
+    def precargar(self, indices):
+        """Siembra el memo con las posiciones por valor que publica `artefactos.py` ({campo: {valor: posiciones}})."""
+        for campo, por_valor in indices.items():
+            for valor, posiciones in por_valor.items():
+                self._memo.guardar((self.version, FiltroCitas(**{campo: valor})), posiciones)
+
+    def _posiciones_columnas(self, columnas):
+        """Posición de cada columna pedida; KeyError si alguna no existe (get_indexer devolvería -1 = la última)."""
+        posiciones = self.df.columns.get_indexer(columnas)
+        if (posiciones < 0).any():
+            raise KeyError(f"Columnas inexistentes en la vista: {[c for c, p in zip(columnas, posiciones) if p < 0]}")
+        return posiciones
+
+    def filtrar(self, filtros, columnas=None, solo_citas=True):
+        columnas = self._posiciones_columnas(columnas) if columnas else slice(None)
+        return self.df.iloc[self.indices(filtros, solo_citas), columnas]
+
+    def contar(self, filtros, solo_citas=True):
+        return len(self.indices(filtros, solo_citas))
+
+    def iterar(self, filtros, columnas, filas_por_bloque, solo_citas=True):
+        """Filas filtradas en bloques de `filas_por_bloque`; solo un bloque materializado a la vez."""
+        indices_columnas = self._posiciones_columnas(columnas)
+        posiciones = self.indices(filtros, solo_citas)
+        for inicio in range(0, len(posiciones), filas_por_bloque):
+            yield self.df.iloc[posiciones[inicio:inicio + filas_por_bloque], indices_columnas]
+
+    def opciones(self, columna, filtros):
+        """Valores únicos ordenados de `columna` dentro de los filtros (para los selectbox en cascada)."""
+        valores = self.df[columna].iloc[self.indices(filtros, solo_citas=False)]
+        return sorted(valores.dropna().unique().tolist())
+
+    def rango_fechas(self, filtros):
+        fechas = self.df['Fecha'].iloc[self.indices(filtros, solo_citas=False)].dropna()
+        return (fechas.min().date(), fechas.max().date()) if not fechas.empty else (None, None)
+
+    def kpis(self, filtros):
+        """KPIs y agregados del Dashboard, o None si no hay citas con esos filtros."""
+        df = self.filtrar(filtros, ['Precio', 'Nombre_Servicio', 'Nombre_Completo_Barbero'])
+        if df.empty:
+            return None
+        ingresos_por_barbero = df.groupby('Nombre_Completo_Barbero')['Precio'].sum()
+        citas_barbero = df['Nombre_Completo_Barbero'].value_counts().reset_index()
+        citas_barbero.columns = ['Barbero', 'Cantidad de Citas']
+        return {
+            "total_ingresos": df['Precio'].sum(),
+            "total_citas": len(df),
+            "servicio_popular": df['Nombre_Servicio'].mode().iloc[0],
+            "barbero_top": ingresos_por_barbero.idxmax() if not ingresos_por_barbero.empty else "N/A",
+            "ingresos_por_barbero": ingresos_por_barbero,
+            "ingresos_por_servicio": df.groupby('Nombre_Servicio')['Precio'].sum().reset_index(),
+            "citas_por_servicio": df['Nombre_Servicio'].value_counts(),
+            "citas_por_barbero": citas_barbero,
+        }
+
+    def citas_por_dia(self, filtros):
+        fechas = self.filtrar(filtros, ['Fecha'])['Fecha'].dropna().dt.normalize()
+        return fechas.value_counts().sort_index().rename_axis('Fecha').reset_index(name='Numero de Citas')
+
+    def serie_citas(self, filtros, agrupacion):
+        return _serie_desde_diaria(self.citas_por_dia(filtros), agrupacion)
+
+    def resumen_reporte(self, filtros):
+        """Totales y top 5 que alimentan el prompt del reporte PDF."""
+        kpis = self.kpis(filtros)
+        if kpis is None:
+            return {"total_citas": 0, "total_ingresos": 0, "top_barberos": {}, "top_servicios": {}}
+        return {
+            "total_citas": kpis["total_citas"],
+            "total_ingresos": kpis["total_ingresos"],
+            "top_barberos": kpis["ingresos_por_barbero"].nlargest(5).to_dict(),
+            "top_servicios": kpis["citas_por_servicio"].nlargest(5).to_dict(),
+        }
+
+
+class MotorDuckDB(MotorPandas):
+    """
+    Las mismas consultas con DuckDB: la vista se registra una vez como relación sobre un
+    snapshot Arrow y cada consulta se ejecuta multihilo con los filtros empujados al escaneo.
+    Cada llamada usa su propio cursor, así que varias sesiones pueden consultar a la vez.
+
+    Los subconjuntos de filas pasan por el mismo memo que el motor de pandas: DuckDB solo
+    resuelve las posiciones la primera vez y filtrar, contar, iterar, opciones y rango_fechas
+    cortan la vista con ellas. Los agregados (KPIs, serie diaria y SQL del analista) siguen en SQL.
+    """
+
+    nombre = "duckdb"
+    soporta_sql = True
+
+    def __init__(self, df_vista, version=None):
+        import duckdb
+        import pyarrow as pa
+        super().__init__(df_vista, version)
+        self._duckdb = duckdb
+        # 'sede' es el objeto anidado que devuelve la API para los barberos; ya está aplanado en ID_Sede
+        tabla = pa.Table.from_pandas(df_vista.drop(columns=['sede'], errors='ignore'), preserve_index=False)
+        # Posición de cada fila en df_vista, para llevar los resultados de SQL al memo de índices
+        self._tabla = tabla.append_column(COLUMNA_POSICION, pa.array(np.arange(len(df_vista), dtype=np.int64)))
+        self._con = duckdb.connect(":memory:", config={"threads": os.cpu_count() or 1})
+
+    def _cursor(self):
+        cur = self._con.cursor()
+        cur.register("vista_citas", self._tabla)
+        return cur
+
+    def _where(self, filtros, solo_citas=True):
+        filtro = FiltroCitas.de(filtros, solo_citas)
+        condiciones, parametros = ["TRUE"], []
+        if filtro.solo_citas:
+            condiciones.append('"ID_Cita" IS NOT NULL')
+        for columna, valor in filtro.activos():
+            condiciones.append(f'"{columna}" = ?')
+            parametros.append(valor)
+        desde, hasta = _limites_fecha(filtro)
+        if desde is not None:
+            condiciones.append('"Fecha" >= ?')
+            parametros.append(desde)
+        if hasta is not None:
+            condiciones.append('"Fecha" < ?')
+            parametros.append(hasta)
+        return " AND ".join(condiciones), parametros
+
+    def _consulta(self, sql, parametros=()):
+        return self._cursor().execute(sql, list(parametros)).df()
+
+    def _calcular_indices(self, filtro):
+        where, parametros = self._where(filtro, filtro.solo_citas)
+        resultado = self._cursor().execute(
+            f'SELECT "{COLUMNA_POSICION}" FROM vista_citas WHERE {where} ORDER BY 1', parametros).fetchnumpy()
+        return np.asarray(resultado[COLUMNA_POSICION])
+
+    def kpis(self, filtros):
+        where, parametros = self._where(filtros)
+        # Una sola pasada agrupada por barbero y servicio; el resto se deriva de ese resultado pequeño
+        agregado = self._consulta(
+            f'SELECT "Nombre_Completo_Barbero" AS barbero, "Nombre_Servicio" AS servicio, count(*) AS citas, sum("Precio") AS ingresos '
+            f'FROM vista_citas WHERE {where} GROUP BY ALL', parametros,
+        )
+        if agregado.empty:
+            return None
+        por_barbero = agregado.groupby('barbero').agg(citas=('citas', 'sum'), ingresos=('ingresos', 'sum'))
+        por_servicio = agregado.groupby('servicio').agg(citas=('citas', 'sum'), ingresos=('ingresos', 'sum'))
+        ingresos_por_barbero = por_barbero['ingresos'].rename_axis('Nombre_Completo_Barbero').rename('Precio')
+        citas_barbero = por_barbero['citas'].sort_values(ascending=False, kind='stable').reset_index()
+        citas_barbero.columns = ['Barbero', 'Cantidad de Citas']
+        max_citas = por_servicio['citas'].max()
+        return {
+            "total_ingresos": agregado['ingresos'].sum(),
+            "total_citas": int(agregado['citas'].sum()),
+            "servicio_popular": sorted(por_servicio.index[por_servicio['citas'] == max_citas])[0],
+            "barbero_top": ingresos_por_barbero.idxmax() if not ingresos_por_barbero.empty else "N/A",
+            "ingresos_por_barbero": ingresos_por_barbero,
+            "ingresos_por_servicio": por_servicio['ingresos'].rename('Precio').rename_axis('Nombre_Servicio').reset_index(),
+            "citas_por_servicio": por_servicio['citas'].sort_values(ascending=False, kind='stable'),
+            "citas_por_barbero": citas_barbero,
+        }
+
+    def citas_por_dia(self, filtros):
+        where, parametros = self._where(filtros)
+        diaria = self._consulta(
+            f'SELECT date_trunc(\'day\', "Fecha") AS "Fecha", count(*) AS "Numero de Citas" FROM vista_citas '
+            f'WHERE {where} AND "Fecha" IS NOT NULL GROUP BY 1 ORDER BY 1', parametros,
+        )
+        diaria['Fecha'] = pd.to_datetime(diaria['Fecha'])
+        return diaria
+
+    def ejecutar_sql(self, sql, filtros):
+        """
+        Ejecuta una consulta SELECT generada por el analista sobre la tabla `citas` (la vista ya
+        filtrada). Corre en una conexión aparte sin acceso a archivos, red ni extensiones.
+        """
+        consulta = validar_sql(sql)
+        where, parametros = self._where(filtros)
+        filtrada = self._cursor().execute(
+            f'SELECT * EXCLUDE ("{COLUMNA_POSICION}") FROM vista_citas WHERE {where}', parametros).arrow()
+        con = self._duckdb.connect(":memory:")
+        try:
+            con.register("citas", filtrada)
+            con.execute("SET enable_external_access = false")
+            con.execute("SET lock_configuration = true")
+            return con.execute(consulta).df()
+        finally:
+            con.close()
+
+
+def validar_sql(sql):
+    """Acepta una sola consulta de lectura (SELECT/WITH). Lanza ValueError si no lo es."""
+    consulta = sql.strip().rstrip(";").strip()
+    if ";" in consulta:
+        raise ValueError("Solo se permite una consulta.")
+    if not re.match(r"^(SELECT|WITH)\b", consulta, re.IGNORECASE):
+        raise ValueError("La consulta debe empezar con SELECT o WITH.")
+    prohibida = PALABRAS_PROHIBIDAS_SQL.search(consulta)
+    if prohibida:
+        raise ValueError(f"Instrucción no permitida en la consulta: {prohibida.group(0)}")
+    return consulta
+
+
+def crear_motor(df_vista, preferido=MOTOR_PREFERIDO, version=None):
+    """DuckDB si está disponible (o se pide explícitamente); pandas en caso contrario."""
+    if preferido != "pandas" and duckdb_disponible():
+        return MotorDuckDB(df_vista, version)
+    if preferido == "duckdb":
+        warnings.warn("KB_MOTOR_CONSULTAS=duckdb pero duckdb no está instalado (pip install duckdb); se usa pandas.",
+                      RuntimeWarning, stacklevel=2)
+    return MotorPandas(df_vista, version)
@@ -2,6 +2,8 @@ import pandas as pd
 from fpdf import FPDF, HTMLMixin
 from datetime import datetime
 from babel.dates import format_date
+from asset_pipeline import ruta_logo_pdf
+import instrumentation as perf
 
 # --- Configuración de Estilo ---
 COLOR_ORO = '#D4AF37'
@@ -11,7 +13,7 @@ class PDF(FPDF, HTMLMixin):
         self.set_fill_color(30, 30, 30)
         self.rect(0, 0, 210, 40, 'F')
         try:
-            self.image('assets/Logo.png', x=10, y=8, w=33)
+            self.image(ruta_logo_pdf(), x=10, y=8, w=33)
         except RuntimeError:
             self.set_xy(10, 8)
             self.set_font('Arial', 'B', 12); self.set_text_color(255, 255, 255); self.cell(33, 33, 'Logo', 0, 0, 'C')
@@ -54,6 +56,7 @@ class PDF(FPDF, HTMLMixin):
         self.set_y(y)
         self.set_x(x + width)
 
+@perf.medir("pdf:generar_reporte")
 def generar_pdf_reporte(df, analisis_ia, contexto_reporte):
     pdf = PDF()
     pdf.add_page()
@@ -83,4 +86,6 @@ def generar_pdf_reporte(df, analisis_ia, contexto_reporte):
 
     # La sección de Visualización de Datos ha sido eliminada.
             
-    return pdf.output(dest='S').encode('latin-1')
\ No newline at end of file
+    salida = pdf.output(dest='S')
+    # PyFPDF devuelve str; fpdf2 (el que instala requirements.txt) devuelve bytearray
+    return salida.encode('latin-1') if isinstance(salida, str) else bytes(salida)
\ No newline at end of file
@@ -0,0 +1,106 @@
+import functools
+import hashlib
+import json
+import os
+import threading
+import time
+
+# --- Configuración ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STORE_DIR = os.path.join(BASE_DIR, ".cache", "resultados")
+MAX_BYTES = int(os.environ.get("KB_RESULTADOS_MAX_MB", 512)) * 1024 * 1024
+
+
+def clave_resultado(huella_foto, modelo, tipo, estilo="", especificaciones=""):
+    """Dirección del resultado: misma foto + modelo + tipo + estilo + especificaciones => misma clave."""
+    partes = [huella_foto, modelo, tipo, " ".join(estilo.split()).lower(), " ".join(especificaciones.split()).lower()]
+    return hashlib.sha256("\x1f".join(partes).encode("utf-8")).hexdigest()
+
+
+class AlmacenResultados:
+    """
+    Almacén en disco direccionado por contenido para resultados de IA (imágenes y textos).
+
+    Cada entrada son dos archivos: `<clave>.bin` con los datos y `<clave>.json` con sus
+    metadatos. Se escriben de forma atómica (tmp + os.replace) y, al superar `max_bytes`, se
+    desalojan las entradas usadas hace más tiempo (LRU por fecha de último acceso).
+    """
+
+    def __init__(self, directorio=STORE_DIR, max_bytes=MAX_BYTES):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._indice = {}   # clave -> metadatos (incluye 'bytes' y 'usado')
+        os.makedirs(directorio, exist_ok=True)
+        self._cargar_indice()
+
+    def _ruta(self, clave, extension):
+        return os.path.join(self.directorio, f"{clave}.{extension}")
+
+    def _cargar_indice(self):
+        for nombre in os.listdir(self.directorio):
+            if not nombre.endswith(".json"):
+                continue
+            clave = nombre[:-5]
+            try:
+                with open(self._ruta(clave, "json"), encoding="utf-8") as f:
+                    meta = json.load(f)
+                meta["usado"] = os.path.getmtime(self._ruta(clave, "bin"))
+            except (OSError, ValueError):
+                continue  # entrada incompleta o corrupta: se ignora
+            self._indice[clave] = meta
+
+    def _escribir_atomico(self, ruta, contenido):
+        tmp = f"{ruta}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(contenido)
+        os.replace(tmp, ruta)
+
+    def _desalojar(self):
+        total = sum(m["bytes"] for m in self._indice.values())
+        for clave in sorted(self._indice, key=lambda c: self._indice[c]["usado"]):
+            if total <= self.max_bytes:
+                break
+            total -= self._indice.pop(clave)["bytes"]
+            for extension in ("json", "bin"):
+                try:
+                    os.remove(self._ruta(clave, extension))
+                except FileNotFoundError:
+                    pass
+
+    def guardar(self, clave, datos, mime, **meta):
+        """Guarda `datos` (bytes) bajo `clave`. Los metadatos extra permiten listar por foto."""
+        meta = {**meta, "mime": mime, "bytes": len(datos), "creado": time.time()}
+        with self._lock:
+            self._escribir_atomico(self._ruta(clave, "bin"), datos)
+            self._escribir_atomico(self._ruta(clave, "json"), json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+            self._indice[clave] = {**meta, "usado": time.time()}
+            self._desalojar()
+
+    def obtener(self, clave):
+        """(datos, metadatos) o None. Leer una entrada la marca como usada recientemente."""
+        with self._lock:
+            meta = self._indice.get(clave)
+            if meta is None:
+                return None
+            try:
+                with open(self._ruta(clave, "bin"), "rb") as f:
+                    datos = f.read()
+                os.utime(self._ruta(clave, "bin"))
+            except FileNotFoundError:
+                self._indice.pop(clave, None)
+                return None
+            meta["usado"] = time.time()
+            return datos, meta
+
+    def listar(self, **filtros):
+        """Claves y metadatos que coinciden con todos los filtros, de la más reciente a la más antigua."""
+        with self._lock:
+            entradas = [(c, m) for c, m in self._indice.items() if all(m.get(k) == v for k, v in filtros.items())]
+        return sorted(entradas, key=lambda e: e[1]["creado"], reverse=True)
+
+
+@functools.lru_cache(maxsize=1)
+def almacen():
+    """Instancia compartida por todas las sesiones del proceso."""
+    return AlmacenResultados()
@@ -0,0 +1,134 @@
+import hashlib
+import re
+
+import pandas as pd
+
+# --- Esquemas canónicos de los datasets de datos.gov.co ---
+# Cada columna canónica declara su tipo, si es requerida y sus alias. Los alias son
+# fragmentos de regex sobre el encabezado ya normalizado (minúsculas, sin tildes, sin '_' ni '-').
+# El orden de los alias es su prioridad: si dos columnas del archivo caen en la misma
+# canónica, gana la que coincide con el alias más prioritario.
+ESQUEMAS = {
+    "nacional": {
+        "nombre del establecimiento": {
+            "tipo": "string[pyarrow]", "requerida": True,
+            "alias": ["nombre del establecimiento", "nombre establecimiento", "razon social", ".*razon social.*"],
+        },
+        "municipio comercial": {
+            "tipo": "category", "requerida": True,
+            "alias": ["municipio comercial", "ciudad comercial", "municipio"],
+        },
+        "departamento": {
+            "tipo": "category", "requerida": False,
+            "alias": ["departamento", "departamento comercial", ".*departamento domicilio.*", ".*depto.*"],
+        },
+    },
+    "risaralda": {
+        "nombre del establecimiento": {
+            "tipo": "string[pyarrow]", "requerida": False,
+            "alias": ["nombre del establecimiento", "nombre establecimiento", "razon social", ".*razon social.*"],
+        },
+        "municipio": {
+            "tipo": "category", "requerida": True,
+            "alias": ["municipio", ".*municipio domicilio.*", "ciudad"],
+        },
+        "departamento": {
+            "tipo": "category", "requerida": False,
+            "alias": ["departamento", ".*departamento domicilio.*", ".*depto.*"],
+        },
+    },
+    "local": {
+        "nombre del establecimiento": {
+            "tipo": "string[pyarrow]", "requerida": False,
+            "alias": ["nombre del establecimiento", "nombre establecimiento", "razon social", ".*razon social.*"],
+        },
+        "barrio": {
+            "tipo": "category", "requerida": True,
+            "alias": ["barrio", "nombre barrio", "barrio comercial", ".*barrio.*"],
+        },
+        "municipio": {
+            "tipo": "category", "requerida": False,
+            "alias": ["municipio", ".*municipio domicilio.*", "ciudad"],
+        },
+    },
+}
+
+
+class EsquemaInvalidoError(KeyError):
+    """El archivo no trae las columnas requeridas por el esquema del dataset."""
+
+    def __init__(self, esquema, faltantes, encabezado):
+        self.esquema = esquema
+        self.faltantes = faltantes
+        self.encabezado = list(encabezado)
+        super().__init__(f"Faltan columnas requeridas para '{esquema}': {faltantes}")
+
+
+# --- Compilación de alias ---
+def _compilar(esquema):
+    """Une todos los alias del esquema en una sola regex con un grupo con nombre por alias."""
+    grupos, destinos = [], {}
+    for i, (canonica, definicion) in enumerate(ESQUEMAS[esquema].items()):
+        for j, alias in enumerate(definicion["alias"]):
+            nombre_grupo = f"c{i}_{j}"
+            grupos.append(f"(?P<{nombre_grupo}>{alias})")
+            destinos[nombre_grupo] = (canonica, j)
+    return re.compile("^(?:" + "|".join(grupos) + ")$"), destinos
+
+
+_PATRONES = {esquema: _compilar(esquema) for esquema in ESQUEMAS}
+_MAPEOS_CACHE = {}
+
+
+def normalizar_encabezado(encabezado):
+    """Normaliza todos los nombres de columna a la vez con operaciones vectorizadas de pandas."""
+    return (
+        pd.Index(encabezado).astype(str)
+        .str.normalize("NFKD").str.encode("ascii", "ignore").str.decode("ascii")
+        .str.lower()
+        .str.replace(r"[_\-]+", " ", regex=True)
+        .str.replace(r"\s+", " ", regex=True)
+        .str.strip()
+        .str.replace(r"[^a-z0-9\s]+$", "", regex=True)
+        .str.strip()
+    )
+
+
+def huella_encabezado(encabezado):
+    return hashlib.sha1("\x1f".join(map(str, encabezado)).encode("utf-8")).hexdigest()
+
+
+def resolver_columnas(esquema, encabezado):
+    """
+    Devuelve {columna_original: columna_canónica} para las columnas del esquema presentes en
+    `encabezado`. Lanza EsquemaInvalidoError si falta alguna requerida. El resultado se guarda
+    por huella del encabezado, así que cargas repetidas de la misma fuente no recalculan nada.
+    """
+    clave = (esquema, huella_encabezado(encabezado))
+    if clave in _MAPEOS_CACHE:
+        return dict(_MAPEOS_CACHE[clave])
+
+    patron, destinos = _PATRONES[esquema]
+    coincidencias = normalizar_encabezado(encabezado).str.extract(patron)
+
+    elegidas = {}  # canónica -> (prioridad del alias, posición, columna original)
+    for grupo in coincidencias.columns:
+        canonica, prioridad = destinos[grupo]
+        for posicion in coincidencias.index[coincidencias[grupo].notna()]:
+            candidato = (prioridad, posicion, encabezado[posicion])
+            if canonica not in elegidas or candidato < elegidas[canonica]:
+                elegidas[canonica] = candidato
+
+    faltantes = [c for c, d in ESQUEMAS[esquema].items() if d["requerida"] and c not in elegidas]
+    if faltantes:
+        raise EsquemaInvalidoError(esquema, faltantes, encabezado)
+
+    # Respetamos el orden de las columnas en el archivo
+    mapeo = {original: canonica for canonica, (_, _, original) in sorted(elegidas.items(), key=lambda x: x[1][1])}
+    _MAPEOS_CACHE[clave] = mapeo
+    return dict(mapeo)
+
+
+def tipos(esquema):
+    """Tipos declarados para cada columna canónica del esquema."""
+    return {canonica: d["tipo"] for canonica, d in ESQUEMAS[esquema].items()}
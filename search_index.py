@@ -0,0 +1,78 @@
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+import text_utils as tu
+
+
+class IndiceBusqueda:
+    """
+    Índice invertido sobre una columna de texto (p. ej. 'nombre del establecimiento').
+
+    Los textos se normalizan (mayúsculas, sin tildes ni signos) y se separan en tokens.
+    El vocabulario queda ordenado, de modo que una búsqueda por prefijo es un rango
+    contiguo que se localiza con `np.searchsorted`; las filas de cada token se guardan
+    concatenadas en un único arreglo. Si un fragmento no es prefijo de ningún token se
+    recurre a un índice de trigramas para buscarlo dentro de las palabras.
+    """
+
+    def __init__(self, serie):
+        tokens = tu.normalizar_texto(serie.reset_index(drop=True)).str.split()
+        pares = tokens.explode().dropna()
+
+        codigos, vocabulario = pd.factorize(pares.to_numpy(dtype=str), sort=True)
+        filas = pares.index.to_numpy()
+        orden = np.lexsort((filas, codigos))
+
+        self.vocabulario = np.asarray(vocabulario, dtype=str)
+        self.filas = filas[orden]
+        self.inicios = np.searchsorted(codigos[orden], np.arange(len(self.vocabulario) + 1))
+
+        self.trigramas = defaultdict(list)
+        for i, token in enumerate(self.vocabulario):
+            for trigrama in {token[j:j + 3] for j in range(len(token) - 2)}:
+                self.trigramas[trigrama].append(i)
+
+    def _rango_prefijo(self, prefijo):
+        desde = np.searchsorted(self.vocabulario, prefijo, side="left")
+        hasta = np.searchsorted(self.vocabulario, prefijo + "\uffff", side="left")
+        return desde, hasta
+
+    def _tokens_con_fragmento(self, fragmento):
+        """Ids de vocabulario que contienen `fragmento` (se usa cuando no hay coincidencia por prefijo)."""
+        if len(fragmento) < 3:
+            return np.array([], dtype=int)
+        candidatos = None
+        for j in range(len(fragmento) - 2):
+            ids = set(self.trigramas.get(fragmento[j:j + 3], ()))
+            candidatos = ids if candidatos is None else candidatos & ids
+            if not candidatos:
+                return np.array([], dtype=int)
+        return np.array(sorted(i for i in candidatos if fragmento in self.vocabulario[i]), dtype=int)
+
+    def _filas_de_token(self, fragmento):
+        desde, hasta = self._rango_prefijo(fragmento)
+        if hasta > desde:
+            return np.unique(self.filas[self.inicios[desde]:self.inicios[hasta]])
+        ids = self._tokens_con_fragmento(fragmento)
+        if ids.size == 0:
+            return ids
+        return np.unique(np.concatenate([self.filas[self.inicios[i]:self.inicios[i + 1]] for i in ids]))
+
+    def buscar(self, consulta):
+        """
+        Devuelve las posiciones de las filas cuyo texto contiene todas las palabras de la
+        consulta (cada una como prefijo de alguna palabra, o como fragmento si no hay prefijo).
+        Una consulta vacía devuelve None para indicar "sin filtro".
+        """
+        fragmentos = tu.normalizar_cadena(consulta).split()
+        if not fragmentos:
+            return None
+        resultado = None
+        for fragmento in sorted(fragmentos, key=len, reverse=True):
+            filas = self._filas_de_token(fragmento)
+            resultado = filas if resultado is None else np.intersect1d(resultado, filas, assume_unique=True)
+            if resultado.size == 0:
+                break
+        return resultado
@@ -0,0 +1,38 @@
+import pandas as pd
+import pytest
+
+import artefactos as art
+
+
+def _vista(clientes, barberos, servicios, citas, sedes):
+    """Arma la vista con la misma traducción y los mismos merges que usan data_manager y el ETL."""
+    tablas = [art.traducir(endpoint, pd.DataFrame(filas)) for endpoint, filas in
+              zip(art.ENDPOINTS, [clientes, barberos, servicios, citas, sedes])]
+    return art.construir_vista(*tablas)
+
+
+@pytest.fixture
+def vista_pequena():
+    """
+    Seis citas con hechos conocidos de antemano:
+
+    - la cita 2 se cruza con la 1 (mismo barbero, 09:15 dentro de 09:00-09:30);
+    - la cohorte 2025-01 son los clientes 1, 2 y 3: el 1 vuelve al mes 1 y el 2 y el 3 al mes 2;
+    - el cliente 4 no tiene citas (queda en la vista con ID_Cita nulo).
+    """
+    sedes = [{"id": 1, "nombreSede": "Sede Centro"}, {"id": 2, "nombreSede": "Sede Norte"}]
+    barberos = [{"id": 1, "nombreBarbero": "Ana", "apellidoBarbero": "Gómez", "sede": {"id": 1}},
+                {"id": 2, "nombreBarbero": "Luis", "apellidoBarbero": "Torres", "sede": {"id": 2}}]
+    servicios = [{"id": 1, "nombreServicio": "Corte", "precio": 25000, "duracionMin": 30},
+                 {"id": 2, "nombreServicio": "Barba", "precio": 18000, "duracionMin": 20}]
+    clientes = [{"id": i, "nombreCliente": n, "apellidoCliente": "Pérez", "telefono": f"30000000{i}",
+                 "email": f"c{i}@correo.com"} for i, n in enumerate(["Juan", "Sofía", "Mateo", "Laura"], start=1)]
+    citas = [
+        {"id": 1, "idCliente": 1, "idBarbero": 1, "idServicio": 1, "idSede": 1, "fecha": "2025-01-06", "hora": "09:00:00"},
+        {"id": 2, "idCliente": 2, "idBarbero": 1, "idServicio": 2, "idSede": 1, "fecha": "2025-01-06", "hora": "09:15:00"},
+        {"id": 3, "idCliente": 3, "idBarbero": 2, "idServicio": 1, "idSede": 2, "fecha": "2025-01-06", "hora": "10:00:00"},
+        {"id": 4, "idCliente": 1, "idBarbero": 1, "idServicio": 1, "idSede": 1, "fecha": "2025-02-10", "hora": "09:00:00"},
+        {"id": 5, "idCliente": 2, "idBarbero": 2, "idServicio": 2, "idSede": 2, "fecha": "2025-03-03", "hora": "11:00:00"},
+        {"id": 6, "idCliente": 3, "idBarbero": 2, "idServicio": 1, "idSede": 2, "fecha": "2025-03-03", "hora": "11:30:00"},
+    ]
+    return _vista(clientes, barberos, servicios, citas, sedes)[0]
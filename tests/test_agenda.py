@@ -0,0 +1,33 @@
+import agenda
+
+
+def test_conflictos_detecta_la_doble_reserva(vista_pequena):
+    conflictos = agenda.IndiceAgenda(vista_pequena).conflictos()
+    assert len(conflictos) == 1
+    fila = conflictos.iloc[0]
+    assert (fila["ID_Cita"], fila["Choca_con"], fila["Barbero"]) == (2, 1, "Ana Gómez")
+    assert (fila["Hora"], fila["Hora_previa"], fila["Minutos_solapados"]) == ("09:15", "09:00", 15)
+
+
+def test_sin_solapes_no_hay_conflictos(vista_pequena):
+    sin_cruce = vista_pequena[vista_pequena['ID_Cita'] != 2]
+    assert agenda.IndiceAgenda(sin_cruce).conflictos().empty
+
+
+def test_huecos_libres_respetan_horario_y_solapes(vista_pequena):
+    indice = agenda.IndiceAgenda(vista_pequena, horario="08:00-12:00")
+    huecos = indice.huecos_libres("Sede Centro", "2025-01-06")
+    # La cita cruzada extiende lo ocupado hasta las 09:35 (09:15 + 20 min de barba)
+    assert huecos.values.tolist() == [["Ana Gómez", "08:00", "09:00", 60], ["Ana Gómez", "09:35", "12:00", 145]]
+
+
+def test_huecos_de_todas_las_sedes_y_minimo(vista_pequena):
+    indice = agenda.IndiceAgenda(vista_pequena, horario="08:00-12:00")
+    huecos = indice.huecos_libres("Todas", "2025-01-06", minimo_min=100)
+    assert huecos[["Barbero", "Desde", "Hasta"]].values.tolist() == [
+        ["Ana Gómez", "09:35", "12:00"], ["Luis Torres", "08:00", "10:00"]]
+
+
+def test_dia_sin_citas_deja_todo_el_horario_libre(vista_pequena):
+    huecos = agenda.IndiceAgenda(vista_pequena, horario="08:00-12:00").huecos_libres("Sede Norte", "2025-01-07")
+    assert huecos.values.tolist() == [["Luis Torres", "08:00", "12:00", 240]]
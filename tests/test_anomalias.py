@@ -0,0 +1,27 @@
+from datetime import date
+
+import anomalias
+
+
+def test_solo_se_revisan_los_dias_cerrados(vista_pequena):
+    estado = anomalias.EstadoAnomalias()
+    anomalias.revisar(estado, vista_pequena, hoy=date(2025, 3, 3))
+    assert str(estado.ultimo_dia) == "2025-02-10"           # el 3 de marzo aún no cerró
+    anomalias.revisar(estado, vista_pequena, hoy=date(2025, 3, 4))
+    assert str(estado.ultimo_dia) == "2025-03-03"
+
+
+def test_revisar_no_escribe_y_actualizar_cambia_la_firma(vista_pequena, tmp_path):
+    assert anomalias.firma_estado(str(tmp_path)) is None
+    estado = anomalias.cargar(str(tmp_path))
+    anomalias.revisar(estado, vista_pequena, hoy=date(2025, 2, 1))
+    assert anomalias.firma_estado(str(tmp_path)) is None
+
+    outbox = str(tmp_path / "outbox.jsonl")
+    anomalias.actualizar(vista_pequena, str(tmp_path), hoy=date(2025, 2, 1), outbox=outbox, webhook="")
+    primera = anomalias.firma_estado(str(tmp_path))
+    assert primera is not None
+    # Un día más cerrado: el ETL guarda otro estado y la firma cambia (las páginas lo vuelven a leer)
+    anomalias.actualizar(vista_pequena, str(tmp_path), hoy=date(2025, 3, 4), outbox=outbox, webhook="")
+    assert anomalias.firma_estado(str(tmp_path)) != primera
+    assert str(anomalias.cargar(str(tmp_path)).ultimo_dia) == "2025-03-03"
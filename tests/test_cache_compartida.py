@@ -0,0 +1,140 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import cache_compartida as cc
+
+
+def _redis(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    redis = pytest.importorskip("redis")
+    servidor = fakeredis.FakeServer()
+    monkeypatch.setattr(redis.Redis, "from_url", classmethod(lambda cls, url, **k: fakeredis.FakeRedis(server=servidor)))
+    return cc.CacheRedis("redis://localhost:6379/0")
+
+
+@pytest.fixture(params=["memoria", "disco", "redis"])
+def backend(request, tmp_path, monkeypatch):
+    if request.param == "memoria":
+        instancia = cc.CacheMemoria()
+    elif request.param == "disco":
+        instancia = cc.CacheDisco(str(tmp_path))
+    else:
+        instancia = _redis(monkeypatch)
+    monkeypatch.setattr(cc, "backend", lambda: instancia)
+    monkeypatch.setattr(cc, "_decodificados", OrderedDict())
+    return instancia
+
+
+def _texto(clave, calcular, **kwargs):
+    return cc.obtener_o_calcular(clave, calcular, str.encode, bytes.decode, **kwargs)
+
+
+def test_un_solo_calculo_con_llamadas_concurrentes(backend):
+    calculos, resultados = [], []
+
+    def calcular():
+        calculos.append(1)
+        time.sleep(0.2)
+        return "valor"
+
+    hilos = [threading.Thread(target=lambda: resultados.append(_texto("k", calcular))) for _ in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join(10)
+    assert len(calculos) == 1
+    assert resultados == ["valor"] * 8
+
+
+def test_error_al_calcular_no_guarda_nada(backend):
+    def falla():
+        raise RuntimeError("la API no respondió")
+
+    with pytest.raises(RuntimeError):
+        _texto("k", falla)
+    assert backend.obtener("k") is None and backend.obtener("k:version") is None
+    assert _texto("k", lambda: "ahora sí") == "ahora sí"
+
+
+def test_ida_y_vuelta_de_frames_con_version(backend):
+    df = pd.DataFrame({
+        "ID_Cita": [1.0, np.nan, 3.0], "Nombre": ["Ana", None, "Luis"],
+        "Fecha": pd.to_datetime(["2025-01-06", None, "2025-03-03"]), "Precio": [25000, 18000, 25000],
+    })
+    sedes = pd.DataFrame({"ID_Sede": [1, 2], "Nombre_Sede": ["Centro", "Norte"]})
+    calculado = cc.obtener_o_calcular("vista", lambda: (df, sedes), cc.frames_a_bytes, cc.bytes_a_frames)
+    version = backend.obtener("vista:version")
+    assert len(version) == 16
+
+    # Mientras la versión no cambie, el proceso devuelve el valor ya deserializado
+    assert cc.obtener_o_calcular("vista", pytest.fail, cc.frames_a_bytes, cc.bytes_a_frames) is calculado
+
+    # Otra réplica (sin memoria propia) lo lee del backend
+    cc._decodificados.clear()
+    leidos = cc.obtener_o_calcular("vista", pytest.fail, cc.frames_a_bytes, cc.bytes_a_frames)
+    pd.testing.assert_frame_equal(leidos[0], df)
+    pd.testing.assert_frame_equal(leidos[1], sedes)
+
+    # Un valor nuevo con otra versión reemplaza al recordado
+    backend.guardar("vista", cc.frames_a_bytes([sedes.head(1)]), 60)
+    backend.guardar("vista:version", b"otra-version-000", 60)
+    assert len(cc.obtener_o_calcular("vista", pytest.fail, cc.frames_a_bytes, cc.bytes_a_frames)[0]) == 1
+
+
+def test_sin_recordar_siempre_deserializa(backend):
+    _texto("llm:1", lambda: "texto", recordar=False)
+    assert "llm:1" not in cc._decodificados
+    assert _texto("llm:1", pytest.fail, recordar=False) == "texto"
+
+
+def test_pickle_solo_en_backends_locales(backend):
+    mezclado = pd.DataFrame({"valor": [1, "uno", 2.5]})         # Arrow no representa esta columna
+    calcular = lambda: (mezclado,)
+    resultado = cc.obtener_o_calcular("mezclado", calcular, cc.frames_a_bytes, cc.bytes_a_frames)
+    pd.testing.assert_frame_equal(resultado[0], mezclado)
+    if backend.admite_pickle:
+        assert backend.obtener("mezclado")[:1] == b"P"
+    else:
+        # Con Redis no se guarda (se usa sin compartir) y un valor con pickle no se deserializa
+        assert backend.obtener("mezclado") is None
+        with pytest.raises(cc.SerializacionNoSegura):
+            cc.bytes_a_frames(b"P" + (4).to_bytes(8, "little") + b"\x80\x04N.")
+
+
+def test_bloqueo_abandonado_se_retoma(tmp_path):
+    disco = cc.CacheDisco(str(tmp_path))
+    ruta = disco._ruta("k", ".lock")
+    open(ruta, "w").close()
+    viejo = time.time() - cc.EXPIRA_BLOQUEO_SEG - 1
+    os.utime(ruta, (viejo, viejo))
+    inicio = time.monotonic()
+    with disco.bloqueo("k") as obtenido:
+        assert obtenido
+        assert os.path.getmtime(ruta) > viejo                   # es un bloqueo nuevo, propio
+    assert time.monotonic() - inicio < 1
+    assert not os.path.exists(ruta)
+
+
+def test_bloqueo_vigente_vence_y_se_calcula_igual(tmp_path, monkeypatch):
+    disco = cc.CacheDisco(str(tmp_path))
+    monkeypatch.setattr(cc, "ESPERA_BLOQUEO_SEG", 0.2)
+    monkeypatch.setattr(cc, "backend", lambda: disco)
+    monkeypatch.setattr(cc, "_decodificados", OrderedDict())
+    open(disco._ruta("k", ".lock"), "w").close()                 # otra réplica está calculando
+    with disco.bloqueo("k") as obtenido:
+        assert not obtenido
+    assert _texto("k", lambda: "calculado") == "calculado"
+    assert os.path.exists(disco._ruta("k", ".lock"))             # el bloqueo ajeno no se toca
+
+
+def test_crear_backend():
+    assert cc.crear_backend("") is None
+    assert isinstance(cc.crear_backend("memoria"), cc.CacheMemoria)
+    with pytest.raises(ValueError):
+        cc.crear_backend("memcached://x")
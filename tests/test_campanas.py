@@ -0,0 +1,69 @@
+import pandas as pd
+import pytest
+
+import campanas as cp
+
+
+@pytest.fixture
+def clientes(vista_pequena):
+    return cp.segmentar_clientes(vista_pequena, hoy="2025-04-20").set_index('ID_Cliente')
+
+
+def test_segmentos_y_rasgos_por_cliente(clientes):
+    assert list(clientes.index) == [1, 2, 3]             # el cliente sin citas no entra
+    assert clientes['Segmento'].to_dict() == {1: "En riesgo", 2: "Activos", 3: "Activos"}
+    assert clientes.loc[1, ['Visitas', 'Gasto_Total', 'Dias_Sin_Visita']].tolist() == [2, 50000, 69]
+    # Empate entre barberos y sedes: gana el de la visita más reciente
+    assert clientes.loc[2, ['Servicio_Favorito', 'Barbero_Favorito', 'Sede_Habitual']].tolist() == \
+        ["Barba", "Luis Torres", "Sede Norte"]
+
+
+def test_resumen_sigue_el_orden_de_los_segmentos(clientes):
+    resumen = cp.resumen_segmentos(clientes.reset_index())
+    assert list(resumen.index) == ["Activos", "En riesgo"]
+    assert resumen.loc["Activos", "Clientes"] == 2
+
+
+def test_una_llamada_por_segmento_y_mensajes_personalizados(clientes):
+    prompts = []
+
+    def generar_texto(prompt):
+        prompts.append(prompt)
+        return "```\nHola {nombre}, tu {servicio} te espera en {sede} {sin_variable}\n```"
+
+    resumen = cp.resumen_segmentos(clientes.reset_index())
+    plantillas = cp.generar_plantillas(resumen.loc[["Activos"]], "Fidelizar", "WhatsApp", generar_texto)
+    assert len(prompts) == 1 and '"Activos"' in prompts[0]
+    mensajes = cp.renderizar_mensajes(clientes.reset_index(), plantillas)
+    assert mensajes['Mensaje'].tolist() == [
+        "Hola Sofía, tu Barba te espera en Sede Norte {sin_variable}",
+        "Hola Mateo, tu Corte te espera en Sede Norte {sin_variable}",
+    ]
+    assert list(mensajes.columns) == cp.CONTACTO + ['Segmento', 'Mensaje']
+
+
+def test_exportar_csv_por_bloques(clientes):
+    mensajes = cp.renderizar_mensajes(clientes.reset_index(), {"Activos": "Hola {nombre}", "En riesgo": "Vuelve {nombre}"})
+    ruta = cp.exportar(mensajes, "CSV", filas_por_bloque=2)
+    with open(ruta, "rb") as f:
+        assert f.read(3) == b"\xef\xbb\xbf"
+    leidos = pd.read_csv(ruta, encoding="utf-8-sig", dtype=str)
+    assert leidos['Mensaje'].tolist() == ["Vuelve Juan", "Hola Sofía", "Hola Mateo"]
+
+
+def test_exportar_sin_mensajes_deja_encabezados(clientes):
+    mensajes = cp.renderizar_mensajes(clientes.reset_index(), {})
+    assert pd.read_csv(cp.exportar(mensajes, "CSV"), encoding="utf-8-sig").columns.tolist() == cp.CONTACTO + ['Segmento', 'Mensaje']
+
+
+def test_dia_semana_no_depende_del_locale():
+    fechas = pd.Series(pd.to_datetime(["2025-01-06", "2025-01-12"]))
+    assert cp.dia_semana(fechas).tolist() == ["Lunes", "Domingo"]
+
+
+def test_dia_semana_con_fechas_faltantes():
+    fechas = pd.Series(pd.to_datetime(["2025-01-06", None, "2025-01-07", "2025-01-06"]), index=[10, 11, 12, 13])
+    dias = cp.dia_semana(fechas)
+    assert dias.tolist() == ["Lunes", None, "Martes", "Lunes"] and dias.index.tolist() == [10, 11, 12, 13]
+    assert dias.value_counts().idxmin() == "Martes"
+    assert cp.dia_semana(pd.Series(pd.to_datetime([None, None]))).value_counts().empty
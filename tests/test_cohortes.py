@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+import cohortes
+
+
+@pytest.fixture
+def calculadas(vista_pequena):
+    return cohortes.Cohortes(vista_pequena)
+
+
+def test_retencion_global(calculadas):
+    retencion = calculadas.retencion()
+    assert list(retencion.index) == ["2025-01"]
+    assert retencion.loc["2025-01", [0, 1, 2]].round(1).tolist() == [100.0, 33.3, 66.7]
+
+
+def test_retencion_por_sede(calculadas):
+    # En Sede Norte el cliente 2 es de la cohorte 2025-03: su primera visita a esa sede
+    norte = calculadas.retencion("Sede Norte")
+    assert list(norte.index) == ["2025-01", "2025-03"]
+    assert norte.loc["2025-01", 2] == 100.0
+    assert np.isnan(norte.loc["2025-03", 1])      # ese mes todavía no ocurrió
+    assert calculadas.retencion("Sede Centro").loc["2025-01", [1, 2]].tolist() == [50.0, 0.0]
+
+
+def test_valor_de_vida_y_resumen(calculadas):
+    valor = calculadas.valor_vida()
+    assert valor.loc["2025-01", ["Clientes", "Citas", "Ingresos"]].tolist() == [3, 6, 136000]
+    assert valor.loc["2025-01", "Valor de vida"] == pytest.approx(136000 / 3)
+    resumen = calculadas.resumen(meses=2)
+    assert resumen["clientes"] == 3
+    assert resumen["valor_a_meses"] == pytest.approx((25000 + 18000 + 25000 + 25000) / 3)
+    assert resumen["retencion_mes_1"] == pytest.approx(100 / 3)
+
+
+def test_ingresos_por_sede_de_la_cita(calculadas):
+    por_sede = calculadas.ingresos_por_sede()
+    assert por_sede.loc["2025-01"].to_dict() == {"Sede Centro": 68000, "Sede Norte": 68000}
+
+
+def test_sin_citas(vista_pequena):
+    vacias = cohortes.Cohortes(vista_pequena[vista_pequena['ID_Cita'].isna()])
+    assert not vacias
@@ -0,0 +1,214 @@
+import os
+import shutil
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+import dataset_loader as dl
+import schema_resolver as sr
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+NACIONAL = "Nacional - Establecimientos de Belleza"
+LOCAL = "Estética Local (Ejemplo)"
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    """Sirve el CSV del servidor con ETag / Last-Modified y responde 304 si no cambió."""
+
+    def do_GET(self):
+        servidor = self.server
+        servidor.peticiones.append(dict(self.headers))
+        if (self.headers.get("If-None-Match") == servidor.etag
+                or self.headers.get("If-Modified-Since") == servidor.modificado):
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv; charset=utf-8")
+        self.send_header("Content-Length", str(len(servidor.contenido)))
+        self.send_header("ETag", servidor.etag)
+        self.send_header("Last-Modified", servidor.modificado)
+        self.end_headers()
+        self.wfile.write(servidor.contenido)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(dl, "DATASETS_DIR", None)
+    monkeypatch.setattr(dl, "CACHE_DIR", str(tmp_path / "cache"))
+    return tmp_path
+
+
+@pytest.fixture
+def servidor():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Manejador)
+    with open(os.path.join(FIXTURES, "nacional.csv"), "rb") as f:
+        httpd.contenido = f.read()
+    httpd.etag, httpd.modificado, httpd.peticiones = '"v1"', "Mon, 05 Oct 2026 10:00:00 GMT", []
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}/rows.csv"
+    hilo = threading.Thread(target=httpd.serve_forever, daemon=True)
+    hilo.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _sin_parseo(monkeypatch):
+    """A partir de aquí cualquier lectura del CSV falla: la carga tiene que salir del Parquet."""
+    def falla(*args, **kwargs):
+        raise AssertionError("se volvió a parsear el CSV")
+    monkeypatch.setattr(dl, "_leer_csv_por_bloques", falla)
+
+
+# --- Revalidación ETag / Last-Modified ---
+def test_primera_descarga_guarda_parquet_y_borra_el_csv(cache, servidor):
+    df, meta = dl.cargar_dataset(NACIONAL, fuente=servidor.url)
+    ruta_csv, ruta_parquet, _ = dl._rutas("nacional")
+
+    assert len(df) == 5 and meta["filas"] == 5
+    assert "If-None-Match" not in servidor.peticiones[0] and "If-Modified-Since" not in servidor.peticiones[0]
+    assert meta["etag"] == '"v1"' and meta["last_modified"] == servidor.modificado
+    assert os.path.exists(ruta_parquet) and not os.path.exists(ruta_csv)
+    assert dl.columnas_detectadas(NACIONAL)[:3] == ["NIT", "Razón Social", "Municipio Comercial"]
+
+
+def test_dentro_del_intervalo_no_pregunta_al_servidor(cache, servidor, monkeypatch):
+    df, _ = dl.cargar_dataset(NACIONAL, fuente=servidor.url)
+    _sin_parseo(monkeypatch)
+
+    otra, _ = dl.cargar_dataset(NACIONAL, fuente=servidor.url)
+    assert len(servidor.peticiones) == 1
+    pd.testing.assert_frame_equal(otra, df)
+
+
+def test_revalidacion_304_reutiliza_el_parquet(cache, servidor, monkeypatch):
+    df, _ = dl.cargar_dataset(NACIONAL, fuente=servidor.url)
+    monkeypatch.setattr(dl, "REVALIDAR_CADA_SEG", 0)
+    _sin_parseo(monkeypatch)
+
+    otra, meta = dl.cargar_dataset(NACIONAL, fuente=servidor.url)
+    condicional = servidor.peticiones[1]
+    assert condicional["If-None-Match"] == '"v1"' and condicional["If-Modified-Since"] == servidor.modificado
+    assert not os.path.exists(dl._rutas("nacional")[0])
+    assert meta["etag"] == '"v1"'
+    pd.testing.assert_frame_equal(otra, df)
+
+
+def test_revalidacion_con_cambios_vuelve_a_parsear(cache, servidor, monkeypatch):
+    dl.cargar_dataset(NACIONAL, fuente=servidor.url)
+    monkeypatch.setattr(dl, "REVALIDAR_CADA_SEG", 0)
+    servidor.contenido += "9006,Barbería Nueva,ARMENIA,QUINDÍO,Calle 7\n".encode("utf-8")
+    servidor.etag, servidor.modificado = '"v2"', "Mon, 12 Oct 2026 10:00:00 GMT"
+
+    df, meta = dl.cargar_dataset(NACIONAL, fuente=servidor.url)
+    assert len(df) == 6 and meta["etag"] == '"v2"'
+    assert "ARMENIA" in df["municipio comercial"].cat.categories
+    # La copia Parquet quedó con la versión nueva
+    assert len(pd.read_parquet(dl._rutas("nacional")[1])) == 6
+
+
+def test_sin_conexion_sirve_la_ultima_copia(cache, servidor, monkeypatch):
+    df, _ = dl.cargar_dataset(NACIONAL, fuente=servidor.url)
+    servidor.shutdown()
+    servidor.server_close()
+    monkeypatch.setattr(dl, "REVALIDAR_CADA_SEG", 0)
+    monkeypatch.setattr(dl, "TIMEOUT_DESCARGA", 2)
+    _sin_parseo(monkeypatch)
+
+    otra, _ = dl.cargar_dataset(NACIONAL, fuente=servidor.url)
+    pd.testing.assert_frame_equal(otra, df)
+
+
+def test_forzar_descarga_sin_condiciones(cache, servidor):
+    dl.cargar_dataset(NACIONAL, fuente=servidor.url)
+    dl.cargar_dataset(NACIONAL, fuente=servidor.url, forzar=True)
+    assert len(servidor.peticiones) == 2 and "If-None-Match" not in servidor.peticiones[1]
+
+
+# --- Parseo por bloques ---
+def test_bloques_mantienen_tipos_y_unen_categorias(cache, monkeypatch):
+    monkeypatch.setattr(dl, "TAMANO_CHUNK", 2)        # 5 filas -> 3 bloques con categorías distintas
+    df, _ = dl.cargar_dataset(NACIONAL, fuente=os.path.join(FIXTURES, "nacional.csv"))
+
+    assert list(df.columns) == ["nombre del establecimiento", "municipio comercial", "departamento"]
+    assert df["nombre del establecimiento"].dtype == "string[pyarrow]"
+    assert isinstance(df["municipio comercial"].dtype, pd.CategoricalDtype)
+    assert set(df["municipio comercial"].cat.categories) == {"PEREIRA", "DOSQUEBRADAS", "MEDELLÍN", "CALI"}
+    assert df["municipio comercial"].tolist() == ["PEREIRA", "DOSQUEBRADAS", "MEDELLÍN", "PEREIRA", "CALI"]
+    assert df["nombre del establecimiento"].isna().tolist() == [False] * 4 + [True]
+
+    # Con un solo bloque sale exactamente lo mismo
+    monkeypatch.setattr(dl, "TAMANO_CHUNK", 50_000)
+    entero, _ = dl._leer_csv_por_bloques(os.path.join(FIXTURES, "nacional.csv"), dl.DATASETS[NACIONAL])
+    pd.testing.assert_frame_equal(df, entero, check_categorical=False)
+
+
+def test_el_parquet_conserva_los_tipos(cache, monkeypatch):
+    monkeypatch.setattr(dl, "TAMANO_CHUNK", 2)
+    df, _ = dl.cargar_dataset(NACIONAL, fuente=os.path.join(FIXTURES, "nacional.csv"))
+    _sin_parseo(monkeypatch)
+    copia, _ = dl.cargar_dataset(NACIONAL, fuente=os.path.join(FIXTURES, "nacional.csv"))
+    assert copia["nombre del establecimiento"].dtype == "string[pyarrow]"
+    pd.testing.assert_frame_equal(copia, df)
+
+
+def test_csv_vacio_devuelve_columnas_tipadas(cache, tmp_path):
+    ruta = tmp_path / "vacio.csv"
+    ruta.write_text("Razon Social,Nombre Barrio,Ciudad\n", encoding="utf-8")
+    df, meta = dl.cargar_dataset(LOCAL, fuente=str(ruta))
+    assert df.empty and meta["filas"] == 0
+    assert df.dtypes.astype(str).to_dict() == {"nombre del establecimiento": "string",
+                                               "barrio": "category", "municipio": "category"}
+
+
+def test_falta_columna_requerida(cache, tmp_path):
+    ruta = tmp_path / "sin_barrio.csv"
+    ruta.write_text("Razon Social,Ciudad\nSalón,Pereira\n", encoding="utf-8")
+    with pytest.raises(sr.EsquemaInvalidoError):
+        dl.cargar_dataset(LOCAL, fuente=str(ruta))
+
+
+# --- Archivos locales ---
+def test_archivo_local_sin_cambios_lee_el_parquet(cache, monkeypatch):
+    fuente = str(cache / "local.csv")
+    shutil.copy(os.path.join(FIXTURES, "local.csv"), fuente)
+    df, _ = dl.cargar_dataset(LOCAL, fuente=fuente)
+    assert df["barrio"].tolist() == ["La Pradera", "Cuba", "Centro"]
+    assert os.path.exists(fuente)                     # el archivo del usuario no se borra
+
+    leer = dl._leer_csv_por_bloques
+    _sin_parseo(monkeypatch)
+    otra, _ = dl.cargar_dataset(LOCAL, fuente=fuente)
+    pd.testing.assert_frame_equal(otra, df)
+
+    # Si el archivo cambia (tamaño / fecha) se vuelve a parsear
+    monkeypatch.setattr(dl, "_leer_csv_por_bloques", leer)
+    with open(fuente, "a", encoding="utf-8") as f:
+        f.write("Salón Nuevo,Álamos,Pereira,3003334455\n")
+    nueva, meta = dl.cargar_dataset(LOCAL, fuente=fuente)
+    assert len(nueva) == 4 and meta["filas"] == 4
+
+
+def test_cambio_de_esquema_invalida_el_parquet(cache, monkeypatch):
+    fuente = os.path.join(FIXTURES, "local.csv")
+    dl.cargar_dataset(LOCAL, fuente=fuente)
+    llamadas = []
+    leer = dl._leer_csv_por_bloques
+    monkeypatch.setattr(dl, "_leer_csv_por_bloques", lambda *a: llamadas.append(a) or leer(*a))
+    monkeypatch.setattr(dl, "_firma_spec", lambda spec: "otra-firma")
+
+    dl.cargar_dataset(LOCAL, fuente=fuente)
+    assert len(llamadas) == 1
+
+
+@pytest.mark.parametrize("nombre", list(dl.DATASETS))
+def test_cada_fixture_cumple_su_esquema(cache, nombre):
+    spec = dl.DATASETS[nombre]
+    df, _ = dl.cargar_dataset(nombre, fuente=os.path.join(FIXTURES, spec["clave"] + ".csv"))
+    requeridas = [c for c, d in sr.ESQUEMAS[spec["esquema"]].items() if d["requerida"]]
+    assert not df.empty and set(requeridas) <= set(df.columns)
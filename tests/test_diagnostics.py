@@ -0,0 +1,117 @@
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import diagnostics as diag
+
+
+def _exitosa(nombre):
+    return diag._resultado(nombre, True, time.perf_counter(), estado=200, bytes=10)
+
+
+def _lenta(segundos):
+    def ejecutar(nombre):
+        inicio = time.perf_counter()
+        time.sleep(segundos)
+        return diag._resultado(nombre, True, inicio, estado=200)
+    return ejecutar
+
+
+def _falla(nombre):
+    raise ConnectionError("sin red")
+
+
+# --- Motor con sustitutos locales ---
+def test_sondas_exitosas_y_orden_por_latencia():
+    resultados = diag.ejecutar_sondas({"rápida": _exitosa, "media": _lenta(0.05)})
+    assert [r["sonda"] for r in resultados] == ["media", "rápida"]
+    assert all(r["ok"] for r in resultados)
+
+
+def test_una_sonda_que_falla_no_afecta_a_las_demas():
+    resultados = {r["sonda"]: r for r in diag.ejecutar_sondas({"rota": _falla, "bien": _exitosa})}
+    assert not resultados["rota"]["ok"] and resultados["rota"]["detalle"] == "ConnectionError: sin red"
+    assert resultados["bien"]["ok"] and resultados["bien"]["estado"] == 200
+
+
+def test_sonda_lenta_se_reporta_como_timeout_sin_esperarla():
+    inicio = time.perf_counter()
+    resultados = {r["sonda"]: r for r in diag.ejecutar_sondas({"colgada": _lenta(1), "bien": _exitosa}, plazo=0.2)}
+    assert time.perf_counter() - inicio < 0.8
+    assert resultados["colgada"]["estado"] == "timeout" and not resultados["colgada"]["ok"]
+    assert resultados["bien"]["ok"]
+
+
+def test_plazo_propio_de_cada_sonda():
+    sondas = {"con plazo corto": (_lenta(0.5), 0.1), "plazo por defecto": _lenta(0.3)}
+    resultados = {r["sonda"]: r for r in diag.ejecutar_sondas(sondas, plazo=2)}
+    assert resultados["con plazo corto"]["estado"] == "timeout"
+    assert resultados["plazo por defecto"]["ok"]
+
+
+def test_termina_a_tiempo_pero_supera_su_plazo():
+    # Sin llegar al corte del motor: la sonda terminó, pero tardó más que su plazo
+    def lenta_al_medir(nombre):
+        return diag._resultado(nombre, True, time.perf_counter() - 1.0)
+    resultado, = diag.ejecutar_sondas({"x": (lenta_al_medir, 0.5)})
+    assert resultado["estado"] == "timeout" and not resultado["ok"]
+
+
+# --- Sonda HTTP contra un servidor local ---
+class _Manejador(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/redirige":
+            self.send_response(302)
+            self.send_header("Location", "/datos.csv")
+            self.end_headers()
+            return
+        if self.path != "/datos.csv":
+            self.send_error(404)
+            return
+        self.server.rangos.append(self.headers.get("Range"))
+        cuerpo = b"x" * 10_000
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def servidor():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Manejador)
+    httpd.rangos = []
+    httpd.base = f"http://127.0.0.1:{httpd.server_address[1]}"
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_sonda_http_mide_y_limita_lo_leido(servidor):
+    resultado = diag.sonda_http(f"{servidor.base}/redirige", rango=100)("csv")
+    assert resultado["ok"] and resultado["estado"] == 200
+    # El servidor ignora el Range, pero la sonda no lee más de lo pedido
+    assert resultado["bytes"] == 100 and servidor.rangos == ["bytes=0-99"]
+    assert resultado["conexion_ms"] is not None and resultado["ttfb_ms"] <= resultado["total_ms"]
+
+
+def test_sonda_http_error_del_servidor(servidor):
+    resultado = diag.sonda_http(f"{servidor.base}/no-existe")("api")
+    assert not resultado["ok"] and resultado["estado"] == 404
+
+
+# --- Sonda de Gemini ---
+@pytest.mark.parametrize("disponibles, ok", [(["models/gemini-x", "models/otro"], True), (["models/otro"], False)])
+def test_sonda_gemini_exige_el_modelo_esperado(monkeypatch, disponibles, ok):
+    genai = pytest.importorskip("google.generativeai")
+    monkeypatch.setattr(genai, "configure", lambda **kwargs: None)
+    monkeypatch.setattr(genai, "list_models", lambda: [types.SimpleNamespace(name=n) for n in disponibles])
+    resultado = diag.sonda_gemini("clave", "gemini-x")("Google Gemini")
+    assert resultado["ok"] is ok and resultado["modelos"] == disponibles
+    assert (resultado["estado"] is None) is ok
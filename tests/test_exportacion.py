@@ -0,0 +1,63 @@
+import os
+
+import pandas as pd
+import pytest
+
+import exportacion as ex
+import query_engine as qe
+
+
+@pytest.fixture(autouse=True)
+def directorio_temporal(tmp_path, monkeypatch):
+    monkeypatch.setattr(ex, "EXPORT_DIR", str(tmp_path))
+
+
+@pytest.fixture
+def motor(vista_pequena):
+    return qe.MotorPandas(vista_pequena)
+
+
+COLUMNAS = ['ID_Cita', 'Fecha', 'Nombre_Completo_Cliente', 'Precio']
+
+
+def test_csv_por_bloques_con_progreso(motor):
+    avances = []
+    ruta = ex.exportar(motor, qe.FiltroCitas(sede="Sede Centro"), COLUMNAS, "CSV",
+                       al_avanzar=lambda escritas, total: avances.append((escritas, total)), filas_por_bloque=2)
+    assert avances == [(2, 3), (3, 3)]
+    leidas = pd.read_csv(ruta, encoding="utf-8-sig")
+    assert leidas.columns.tolist() == COLUMNAS
+    assert sorted(leidas['ID_Cita']) == [1, 2, 4]
+    assert leidas['Fecha'].iloc[0] == "2025-01-06"       # solo la fecha, sin 00:00:00
+
+
+def test_parquet_conserva_tipos_aunque_un_bloque_sea_nulo(motor, vista_pequena):
+    pytest.importorskip("pyarrow")
+    # Con solo_citas=False el último bloque es el cliente sin citas: todo nulo salvo el nombre
+    bloques = motor.iterar(qe.FiltroCitas(), COLUMNAS, 6, solo_citas=False)
+    ruta = ex.escribir_archivo(bloques, "Parquet")
+    leidas = pd.read_parquet(ruta)
+    assert len(leidas) == 7
+    assert pd.api.types.is_datetime64_any_dtype(leidas['Fecha'])
+    assert leidas['Precio'].isna().sum() == 1
+
+
+def test_xlsx(motor):
+    openpyxl = pytest.importorskip("openpyxl")
+    ruta = ex.exportar(motor, qe.FiltroCitas(), COLUMNAS, "Excel (XLSX)")
+    hoja = openpyxl.load_workbook(ruta)["Citas"]
+    assert hoja.max_row == 7
+
+
+def test_error_a_mitad_no_deja_archivo(motor, tmp_path):
+    def bloques():
+        yield motor.filtrar(qe.FiltroCitas(), COLUMNAS)
+        raise RuntimeError("se cayó la fuente")
+
+    with pytest.raises(RuntimeError):
+        ex.escribir_archivo(bloques(), "CSV")
+    assert os.listdir(tmp_path) == []
+
+
+def test_formatos_disponibles_incluye_siempre_csv():
+    assert ex.formatos_disponibles()[0] == "CSV"
@@ -0,0 +1,57 @@
+import pandas as pd
+
+import geo_rollup as geo
+import text_utils as tu
+
+# Los 33 departamentos de DIVIPOLA (32 más Bogotá D.C.) por su código DANE de dos dígitos
+DEPARTAMENTOS = {
+    "05", "08", "11", "13", "15", "17", "18", "19", "20", "23", "25", "27", "41", "44", "47", "50", "52",
+    "54", "63", "66", "68", "70", "73", "76", "81", "85", "86", "88", "91", "94", "95", "97", "99",
+}
+
+
+def _gazetteer():
+    return pd.read_csv(geo.GAZETTEER_PATH, dtype={"codigo_dane": str}, keep_default_na=False)
+
+
+def test_gazetteer_cubre_todos_los_departamentos():
+    gaz = _gazetteer()
+    assert set(gaz["codigo_dane"].str[:2]) == DEPARTAMENTOS
+    assert gaz["departamento"].nunique() == len(DEPARTAMENTOS)
+    # Cada departamento lleva un solo nombre y todos sus municipios comparten el prefijo
+    assert (gaz.groupby("departamento")["codigo_dane"].agg(lambda c: c.str[:2].nunique()) == 1).all()
+
+
+def test_gazetteer_lista_completa_de_municipios():
+    gaz = _gazetteer()
+    assert len(gaz) > 1100
+    assert gaz["codigo_dane"].str.fullmatch(r"\d{5}").all() and gaz["codigo_dane"].is_unique
+    assert gaz["latitud"].between(-4.3, 13.5).all() and gaz["longitud"].between(-82, -66.8).all()
+    assert not gaz.duplicated(["latitud", "longitud"]).any()
+    # Ningún municipio queda repetido dentro de su departamento una vez normalizado
+    claves = tu.normalizar_texto(gaz["municipio"]) + "|" + tu.normalizar_texto(gaz["departamento"])
+    assert claves.is_unique
+
+
+def test_rollup_ubica_municipios_de_todo_el_pais():
+    gaz = _gazetteer()
+    df = pd.DataFrame({"municipio": gaz["municipio"].str.upper(), "departamento": gaz["departamento"]})
+    rollup = geo.construir_rollup(df, "municipio", "departamento")
+    assert rollup["codigo_dane"].notna().all()
+    # Los homónimos se agrupan en una sola ubicación; los nombres únicos conservan su código
+    unicos = ~df["municipio"].duplicated(keep=False)
+    assert set(gaz.loc[unicos, "codigo_dane"]) <= set(rollup["codigo_dane"])
+    assert len(rollup) == df["municipio"].nunique()
+
+
+def test_alias_y_homonimos():
+    df = pd.DataFrame({
+        "municipio": ["SANTIAGO DE CALI", "MOMPOS", "Restrepo", "Restrepo", "Restrepo", "Desconocido"],
+        "departamento": ["VALLE DEL CAUCA", "BOLIVAR", "Meta", "Meta", "Valle del Cauca", "Meta"],
+    })
+    rollup = geo.construir_rollup(df, "municipio", "departamento").set_index("ubicacion")
+    assert rollup.loc["SANTIAGO DE CALI", "codigo_dane"] == "76001"
+    assert rollup.loc["MOMPOS", "codigo_dane"] == "13468"
+    # Restrepo existe en Meta y en Valle: se usa el departamento dominante
+    assert rollup.loc["Restrepo", "codigo_dane"] == "50606"
+    assert pd.isna(rollup.loc["Desconocido", "codigo_dane"])
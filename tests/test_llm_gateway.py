@@ -0,0 +1,242 @@
+import threading
+import time
+import types
+
+import pytest
+
+import llm_gateway as gw
+
+
+class ModeloFalso:
+    """Registra cada llamada; si `puerta` está cerrada, las llamadas esperan a que se abra."""
+
+    def __init__(self, errores=()):
+        self.llamadas = []
+        self.puerta = threading.Event()
+        self.puerta.set()
+        self._errores = list(errores)
+        self._candado = threading.Lock()
+
+    def generate_content(self, contenido, **kwargs):
+        with self._candado:
+            self.llamadas.append(contenido)
+            error = self._errores.pop(0) if self._errores else None
+        self.puerta.wait(5)
+        if error is not None:
+            raise error
+        return types.SimpleNamespace(text=f"respuesta a {contenido}")
+
+
+class ErrorApi(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+def _en_hilo(funcion, *args, **kwargs):
+    resultado = {}
+
+    def correr():
+        try:
+            resultado["valor"] = funcion(*args, **kwargs)
+        except Exception as e:
+            resultado["error"] = e
+
+    hilo = threading.Thread(target=correr, daemon=True)
+    hilo.start()
+    return hilo, resultado
+
+
+def _esperar(condicion, plazo=5):
+    limite = time.monotonic() + plazo
+    while not condicion():
+        assert time.monotonic() < limite, "la condición no se cumplió a tiempo"
+        time.sleep(0.005)
+
+
+def test_turnos_en_orden_de_llegada():
+    pasarela = gw.PasarelaLLM(max_concurrentes=1, por_minuto=6000, rafaga=100)
+    modelo = ModeloFalso()
+    modelo.puerta.clear()
+    hilos = [_en_hilo(pasarela.generar, modelo, "primera")[0]]
+    _esperar(lambda: pasarela.estado()["activos"] == 1)
+    for i, prompt in enumerate(["b", "c", "d", "e"], start=1):
+        # Cada una entra a la cola solo cuando la anterior ya tiene su turno
+        hilos.append(_en_hilo(pasarela.generar, modelo, prompt)[0])
+        _esperar(lambda: pasarela.estado()["en_cola"] == i)
+    modelo.puerta.set()
+    for hilo in hilos:
+        hilo.join(5)
+    assert modelo.llamadas == ["primera", "b", "c", "d", "e"]
+    assert pasarela.estado()["llamadas"] == 5
+
+
+def test_posicion_en_la_cola_se_informa():
+    pasarela = gw.PasarelaLLM(max_concurrentes=1, por_minuto=6000, rafaga=100)
+    modelo = ModeloFalso()
+    modelo.puerta.clear()
+    primero, _ = _en_hilo(pasarela.generar, modelo, "a")
+    _esperar(lambda: pasarela.estado()["activos"] == 1)
+    posiciones = []
+    segundo, _ = _en_hilo(pasarela.generar, modelo, "b", al_esperar=posiciones.append)
+    _esperar(lambda: posiciones)
+    modelo.puerta.set()
+    primero.join(5), segundo.join(5)
+    assert posiciones[0] == 1
+
+
+def test_cubo_de_tokens(monkeypatch):
+    reloj = [100.0]
+    monkeypatch.setattr(gw.time, "monotonic", lambda: reloj[0])
+    cubo = gw.CuboTokens(por_minuto=60, rafaga=2)
+    for _ in range(2):
+        assert cubo.espera() == 0
+        cubo.tomar()
+    assert cubo.espera() == pytest.approx(1.0)
+    reloj[0] += 0.25
+    assert cubo.espera() == pytest.approx(0.75)
+    reloj[0] += 10
+    assert cubo.espera() == 0 and cubo.tokens == 2       # la ráfaga no pasa de la capacidad
+    cubo.vaciar()
+    assert cubo.espera() == pytest.approx(1.0)
+
+
+def test_la_tasa_espacia_las_llamadas():
+    pasarela = gw.PasarelaLLM(max_concurrentes=4, por_minuto=600, rafaga=1)     # 10 por segundo
+    modelo = ModeloFalso()
+    inicio = time.monotonic()
+    for prompt in ["a", "b", "c", "d"]:
+        pasarela.generar(modelo, prompt)
+    assert time.monotonic() - inicio >= 0.28            # 1 de ráfaga + 3 × 0,1 s
+
+
+def test_solicitudes_identicas_comparten_una_llamada():
+    pasarela = gw.PasarelaLLM(max_concurrentes=4, por_minuto=6000, rafaga=100)
+    modelo = ModeloFalso()
+    modelo.puerta.clear()
+    hilos = [_en_hilo(pasarela.generar, modelo, "mismo prompt", temperature=0.2) for _ in range(5)]
+    _esperar(lambda: pasarela.estado()["solicitudes"] == 5)
+    modelo.puerta.set()
+    for hilo, _ in hilos:
+        hilo.join(5)
+    assert modelo.llamadas == ["mismo prompt"]
+    assert {r["valor"].text for _, r in hilos} == {"respuesta a mismo prompt"}
+    assert pasarela.estado()["coalescidas"] == 4
+
+
+def test_sin_coalescer_cada_solicitud_llama_al_modelo():
+    pasarela = gw.PasarelaLLM(max_concurrentes=4, por_minuto=6000, rafaga=100)
+    modelo = ModeloFalso()
+    modelo.puerta.clear()
+    hilos = [_en_hilo(pasarela.generar, modelo, "idea creativa", coalescer=False) for _ in range(3)]
+    _esperar(lambda: pasarela.estado()["solicitudes"] == 3)
+    modelo.puerta.set()
+    for hilo, _ in hilos:
+        hilo.join(5)
+    assert modelo.llamadas == ["idea creativa"] * 3
+    assert pasarela.estado()["coalescidas"] == 0
+
+
+def test_huella_distingue_parametros_e_imagenes():
+    modelo = ModeloFalso()
+    base = gw.huella_solicitud(modelo, ["hola", {"mime_type": "image/png", "data": b"1"}], {})
+    assert base == gw.huella_solicitud(modelo, ["hola", {"mime_type": "image/png", "data": b"1"}], {})
+    assert base != gw.huella_solicitud(modelo, ["hola", {"mime_type": "image/png", "data": b"2"}], {})
+    assert base != gw.huella_solicitud(modelo, ["hola", {"mime_type": "image/png", "data": b"1"}], {"temperature": 1})
+
+
+def test_reintenta_429_con_backoff_exponencial_y_jitter(monkeypatch):
+    esperas = []
+    monkeypatch.setattr(gw.random, "uniform", lambda a, b: esperas.append((a, b)) or 0.0)
+    pasarela = gw.PasarelaLLM(por_minuto=6000, rafaga=100, espera_base=0.5, espera_max=1.5)
+    modelo = ModeloFalso(errores=[ErrorApi(429), ErrorApi(503), ErrorApi(429)])
+    assert pasarela.generar(modelo, "hola").text == "respuesta a hola"
+    assert len(modelo.llamadas) == 4
+    # Jitter completo: uniforme entre 0 y base·2^intento, con tope en espera_max
+    assert esperas == [(0, 0.5), (0, 1.0), (0, 1.5)]
+    assert pasarela.estado()["reintentos"] == 3
+
+
+def test_errores_no_reintentables_o_agotados_se_propagan(monkeypatch):
+    monkeypatch.setattr(gw.random, "uniform", lambda a, b: 0.0)
+    pasarela = gw.PasarelaLLM(por_minuto=6000, rafaga=100, max_reintentos=2)
+    modelo = ModeloFalso(errores=[ValueError("prompt inválido")])
+    with pytest.raises(ValueError):
+        pasarela.generar(modelo, "a")
+    assert len(modelo.llamadas) == 1
+
+    modelo = ModeloFalso(errores=[ErrorApi(429)] * 3)
+    with pytest.raises(ErrorApi):
+        pasarela.generar(modelo, "b")
+    assert len(modelo.llamadas) == 3
+    assert pasarela.estado()["activos"] == 0
+
+
+def test_plazo_de_cola_agotado():
+    pasarela = gw.PasarelaLLM(max_concurrentes=1, por_minuto=6000, rafaga=100, plazo_cola=0.2)
+    modelo = ModeloFalso()
+    modelo.puerta.clear()
+    primero, _ = _en_hilo(pasarela.generar, modelo, "larga")
+    _esperar(lambda: pasarela.estado()["activos"] == 1)
+    with pytest.raises(gw.PasarelaSaturadaError):
+        pasarela.generar(modelo, "otra")
+    modelo.puerta.set()
+    primero.join(5)
+    assert pasarela.estado()["saturadas"] == 1 and pasarela.estado()["en_cola"] == 0
+
+
+class Interrumpida(BaseException):
+    """Como RerunException/StopException de Streamlit: no hereda de Exception."""
+
+
+def test_interrupcion_mientras_espera_libera_el_turno():
+    pasarela = gw.PasarelaLLM(max_concurrentes=1, por_minuto=6000, rafaga=100, plazo_cola=2)
+    modelo = ModeloFalso()
+    modelo.puerta.clear()
+    primero, _ = _en_hilo(pasarela.generar, modelo, "larga")
+    _esperar(lambda: pasarela.estado()["activos"] == 1)
+
+    def al_esperar(posicion):
+        raise Interrumpida()
+
+    with pytest.raises(Interrumpida):
+        pasarela.generar(modelo, "impaciente", al_esperar=al_esperar)
+    assert pasarela.estado()["en_cola"] == 0
+
+    modelo.puerta.set()
+    primero.join(5)
+    assert pasarela.generar(modelo, "siguiente").text == "respuesta a siguiente"
+    assert pasarela.estado()["saturadas"] == 0
+
+
+def test_interrupcion_no_se_propaga_a_las_coalescidas():
+    pasarela = gw.PasarelaLLM(max_concurrentes=1, por_minuto=6000, rafaga=100)
+    modelo = ModeloFalso()
+    modelo.puerta.clear()
+    primero, _ = _en_hilo(pasarela.generar, modelo, "larga")
+    _esperar(lambda: pasarela.estado()["activos"] == 1)
+
+    def al_esperar(posicion):
+        # Se interrumpe recién cuando otra sesión ya está esperando su resultado
+        _esperar(lambda: pasarela.estado()["coalescidas"] == 1)
+        raise Interrumpida()
+
+    duena = {}
+
+    def correr():
+        try:
+            pasarela.generar(modelo, "mismo prompt", al_esperar=al_esperar)
+        except Interrumpida:
+            duena["interrumpida"] = True
+
+    hilo = threading.Thread(target=correr, daemon=True)
+    hilo.start()
+    _esperar(lambda: pasarela.estado()["solicitudes"] == 2)
+    otra, resultado = _en_hilo(pasarela.generar, modelo, "mismo prompt")
+    hilo.join(5)
+    assert duena == {"interrumpida": True}
+
+    modelo.puerta.set()
+    primero.join(5), otra.join(5)
+    assert resultado["valor"].text == "respuesta a mismo prompt"
+    assert modelo.llamadas == ["larga", "mismo prompt"]
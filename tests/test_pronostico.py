@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import pronostico
+
+PATRON = [5, 5, 5, 5, 10, 12, 2]     # citas de lunes a domingo
+
+
+def _vista_periodica(semanas=8, inicio="2025-01-06"):
+    """Citas de una sola sede, barbero y servicio que repiten el mismo patrón cada semana."""
+    fechas = pd.date_range(inicio, periods=7 * semanas, freq="D")
+    repetidas = np.repeat(fechas, [PATRON[f.dayofweek] for f in fechas])
+    return pd.DataFrame({
+        "ID_Cita": np.arange(1, len(repetidas) + 1), "Fecha": repetidas,
+        "Nombre_Sede": "Sede Centro", "Nombre_Completo_Barbero": "Ana Gómez", "Nombre_Servicio": "Corte",
+    })
+
+
+def test_serie_periodica_se_pronostica_exacta():
+    pronosticos = pronostico.Pronosticos(_vista_periodica(), horizonte=14)
+    serie = pronosticos.serie("total", "Todas")
+    assert serie["Fecha"].iloc[0] == pd.Timestamp("2025-03-03")      # lunes siguiente al último día
+    esperado = [PATRON[f.dayofweek] for f in serie["Fecha"]]
+    np.testing.assert_allclose(serie["Pronostico"], esperado, atol=1e-6)
+    assert (serie["Inferior"] <= serie["Pronostico"]).all() and (serie["Pronostico"] <= serie["Superior"]).all()
+
+
+def test_todas_las_series_de_cada_nivel():
+    pronosticos = pronostico.Pronosticos(_vista_periodica(), horizonte=7)
+    assert ("sede", "Sede Centro") in pronosticos and ("barbero", "Ana Gómez") in pronosticos
+    resumen = pronosticos.resumen("sede", dias=7)
+    assert resumen.iloc[0, 1] == pytest.approx(sum(PATRON))
+
+
+def test_historia_corta_no_ajusta():
+    pronosticos = pronostico.Pronosticos(_vista_periodica(semanas=2))
+    assert pronosticos.modelo is None and ("total", "Todas") not in pronosticos
+
+
+def test_holt_winters_elige_parametros_por_serie():
+    dias = np.arange(70)
+    Y = np.vstack([np.tile(PATRON, 10).astype(float), 20 + 0.5 * dias])
+    modelo = pronostico.ajustar_holt_winters(Y)
+    media, desviacion = pronostico.pronosticar(modelo, horizonte=7)
+    np.testing.assert_allclose(media[0], PATRON, atol=1e-6)
+    assert media[1, 0] > Y[1, -1]                    # la tendencia creciente continúa
+    assert desviacion.shape == (2, 7) and (np.diff(desviacion, axis=1) >= 0).all()
+
+
+def test_agrupar_con_historia_completa_el_periodo_observado():
+    vista = _vista_periodica()
+    futuro = pronostico.Pronosticos(vista, horizonte=14).serie("total", "Todas")
+    diaria = vista['Fecha'].value_counts().sort_index().rename_axis('Fecha').reset_index(name='Numero de Citas')
+    # Semanas que cierran en lunes: la primera suma los seis días observados y el lunes pronosticado
+    semanal = pronostico.agrupar_con_historia(diaria, futuro, 'Semana')
+    assert semanal["Fecha"].dt.day_name().unique().tolist() == ["Monday"]
+    assert semanal["Pronostico"].tolist() == pytest.approx([sum(PATRON)] * 2)
+    por_dia = pronostico.agrupar_con_historia(diaria, futuro, 'Día')
+    assert len(por_dia) == 14 and list(por_dia.columns) == ["Fecha", "Pronostico", "Inferior", "Superior"]
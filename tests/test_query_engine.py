@@ -0,0 +1,109 @@
+import warnings
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import query_engine as qe
+
+
+@pytest.fixture(params=["pandas", "duckdb"])
+def motor(request, vista_pequena):
+    # Las mismas pruebas para los dos motores; la de DuckDB se salta si no está instalado
+    if request.param == "duckdb":
+        pytest.importorskip("duckdb")
+        return qe.MotorDuckDB(vista_pequena, version="v1")
+    return qe.MotorPandas(vista_pequena, version="v1")
+
+
+def test_filtro_normaliza_sin_filtro_y_fechas():
+    assert qe.FiltroCitas(sede="Todas", barbero="Todos", desde="2025-01-06") == qe.FiltroCitas(desde=date(2025, 1, 6))
+    assert qe.FiltroCitas.de({"sede": "Sede Norte", "otra": 1}) == qe.FiltroCitas(sede="Sede Norte")
+
+
+def test_filtrar_por_sede_y_rango_de_fechas(motor):
+    filtros = qe.FiltroCitas(sede="Sede Centro")
+    assert sorted(motor.filtrar(filtros)['ID_Cita']) == [1, 2, 4]
+    filtros = filtros.con(desde=date(2025, 1, 6), hasta=date(2025, 1, 6))
+    assert sorted(motor.filtrar(filtros, ['ID_Cita'])['ID_Cita']) == [1, 2]
+    assert motor.contar(qe.FiltroCitas(hasta=date(2025, 2, 10))) == 4
+
+
+def test_solo_citas_excluye_clientes_sin_citas(motor):
+    assert motor.contar(qe.FiltroCitas()) == 6
+    assert motor.contar(qe.FiltroCitas(), solo_citas=False) == 7
+    assert motor.opciones('Nombre_Completo_Cliente', qe.FiltroCitas())[-1] == "Sofía Pérez"
+
+
+def test_memo_reutiliza_las_posiciones(motor):
+    filtros = qe.FiltroCitas(barbero="Luis Torres")
+    assert motor.indices(filtros) is motor.indices(filtros)
+    assert not motor.indices(filtros).flags.writeable
+
+
+def test_iterar_en_bloques_equivale_a_filtrar(motor):
+    filtros = qe.FiltroCitas(servicio="Corte")
+    bloques = list(motor.iterar(filtros, ['ID_Cita', 'Precio'], filas_por_bloque=2))
+    assert [len(b) for b in bloques] == [2, 2]
+    pd.testing.assert_frame_equal(pd.concat(bloques), motor.filtrar(filtros, ['ID_Cita', 'Precio']))
+
+
+def test_columna_inexistente_lanza_keyerror(motor):
+    with pytest.raises(KeyError, match="NoExiste"):
+        motor.filtrar(qe.FiltroCitas(), ['ID_Cita', 'NoExiste'])
+    with pytest.raises(KeyError):
+        next(motor.iterar(qe.FiltroCitas(), ['NoExiste'], 10))
+
+
+def test_kpis_y_resumen(motor):
+    kpis = motor.kpis(qe.FiltroCitas())
+    assert kpis["total_ingresos"] == 4 * 25000 + 2 * 18000
+    assert kpis["total_citas"] == 6
+    assert kpis["servicio_popular"] == "Corte"
+    assert kpis["ingresos_por_barbero"].to_dict() == {"Ana Gómez": 68000, "Luis Torres": 68000}
+    assert motor.kpis(qe.FiltroCitas(sede="Sede Inexistente")) is None
+    assert motor.resumen_reporte(qe.FiltroCitas(sede="Sede Inexistente"))["total_citas"] == 0
+
+
+def test_rango_y_serie_mensual(motor):
+    assert motor.rango_fechas(qe.FiltroCitas()) == (date(2025, 1, 6), date(2025, 3, 3))
+    serie = motor.serie_citas(qe.FiltroCitas(), 'Mes')
+    assert serie['Numero de Citas'].tolist() == [3, 1, 2]
+
+
+def test_crear_motor_sin_duckdb_avisa_y_usa_pandas(vista_pequena):
+    if qe.duckdb_disponible():
+        pytest.skip("duckdb instalado")
+    with pytest.warns(RuntimeWarning, match="duckdb"):
+        assert isinstance(qe.crear_motor(vista_pequena, preferido="duckdb"), qe.MotorPandas)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        assert qe.crear_motor(vista_pequena, preferido="pandas").nombre == "pandas"
+
+
+def test_duckdb_devuelve_lo_mismo_que_pandas(vista_pequena):
+    pytest.importorskip("duckdb")
+    pandas_, duck = qe.MotorPandas(vista_pequena), qe.MotorDuckDB(vista_pequena)
+    filtros = qe.FiltroCitas(sede="Sede Norte")
+    assert sorted(duck.filtrar(filtros)['ID_Cita']) == sorted(pandas_.filtrar(filtros)['ID_Cita'])
+    assert duck.kpis(filtros)["total_ingresos"] == pandas_.kpis(filtros)["total_ingresos"]
+
+
+def test_precargar_siembra_el_memo_de_ambos_motores(motor):
+    # Las posiciones publicadas por artefactos.py se usan tal cual, sin volver a filtrar
+    sembradas = np.array([0, 2], dtype=np.int32)
+    motor.precargar({"sede": {"Sede Centro": sembradas}})
+    assert motor.indices(qe.FiltroCitas(sede="Sede Centro")) is sembradas
+    assert motor.contar(qe.FiltroCitas(sede="Sede Centro")) == 2
+
+
+def test_duckdb_comparte_el_memo_de_subconjuntos(vista_pequena):
+    pytest.importorskip("duckdb")
+    pandas_, duck = qe.MotorPandas(vista_pequena), qe.MotorDuckDB(vista_pequena)
+    filtros = qe.FiltroCitas(barbero="Ana Gómez", hasta=date(2025, 2, 28))
+    for solo_citas in (True, False):
+        np.testing.assert_array_equal(duck.indices(filtros, solo_citas), pandas_.indices(filtros, solo_citas))
+    assert duck.indices(filtros) is duck.indices(filtros)
+    pd.testing.assert_frame_equal(duck.filtrar(filtros), pandas_.filtrar(filtros))
+    assert "__fila" not in duck.ejecutar_sql("SELECT * FROM citas", filtros).columns
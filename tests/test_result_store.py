@@ -0,0 +1,39 @@
+import os
+
+import result_store as rs
+
+
+def test_clave_ignora_espacios_y_mayusculas():
+    assert rs.clave_resultado("f1", "m", "corte", " Buzz  Cut ", "Rubio") == rs.clave_resultado("f1", "m", "corte", "buzz cut", "rubio")
+    assert rs.clave_resultado("f1", "m", "corte", "Buzz Cut") != rs.clave_resultado("f2", "m", "corte", "Buzz Cut")
+
+
+def test_guardar_obtener_y_persistir(tmp_path):
+    almacen = rs.AlmacenResultados(str(tmp_path))
+    almacen.guardar("a", b"texto", "text/markdown", foto="f1", tipo="recomendacion")
+    datos, meta = almacen.obtener("a")
+    assert datos == b"texto" and meta["mime"] == "text/markdown"
+    assert almacen.obtener("no-existe") is None
+    # Otra instancia (otro proceso) ve lo mismo desde el disco
+    assert rs.AlmacenResultados(str(tmp_path)).obtener("a")[0] == b"texto"
+    assert [clave for clave, _ in almacen.listar(foto="f1")] == ["a"]
+
+
+def test_desaloja_la_entrada_menos_usada(tmp_path, monkeypatch):
+    almacen = rs.AlmacenResultados(str(tmp_path), max_bytes=10)
+    relojes = iter(range(100))
+    monkeypatch.setattr(rs.time, "time", lambda: next(relojes))
+    almacen.guardar("vieja", b"12345", "x")
+    almacen.guardar("usada", b"12345", "x")
+    almacen.obtener("vieja")                      # ahora "usada" es la menos reciente
+    almacen.guardar("nueva", b"12345", "x")
+    assert almacen.obtener("usada") is None
+    assert almacen.obtener("vieja") is not None and almacen.obtener("nueva") is not None
+    assert not os.path.exists(os.path.join(tmp_path, "usada.bin"))
+
+
+def test_archivo_borrado_por_fuera(tmp_path):
+    almacen = rs.AlmacenResultados(str(tmp_path))
+    almacen.guardar("a", b"x", "x")
+    os.remove(os.path.join(tmp_path, "a.bin"))
+    assert almacen.obtener("a") is None
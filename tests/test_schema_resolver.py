@@ -0,0 +1,38 @@
+import pytest
+
+import schema_resolver as sr
+
+
+def test_normaliza_tildes_guiones_y_puntuacion_final():
+    assert list(sr.normalizar_encabezado(["Razón_Social ", "MUNICIPIO-Comercial:", "Depto."])) == \
+        ["razon social", "municipio comercial", "depto"]
+
+
+def test_resuelve_alias_y_respeta_el_orden_del_archivo():
+    encabezado = ["NIT", "Municipio Comercial", "RAZÓN SOCIAL", "Departamento Domicilio"]
+    assert sr.resolver_columnas("nacional", encabezado) == {
+        "Municipio Comercial": "municipio comercial",
+        "RAZÓN SOCIAL": "nombre del establecimiento",
+        "Departamento Domicilio": "departamento",
+    }
+
+
+def test_gana_el_alias_mas_prioritario():
+    # "nombre del establecimiento" va antes que "razon social" en la lista de alias
+    mapeo = sr.resolver_columnas("nacional", ["Razon Social", "Nombre del Establecimiento", "Municipio"])
+    assert mapeo["Nombre del Establecimiento"] == "nombre del establecimiento"
+    assert "Razon Social" not in mapeo
+
+
+def test_falta_columna_requerida():
+    with pytest.raises(sr.EsquemaInvalidoError) as error:
+        sr.resolver_columnas("local", ["Nombre", "Municipio"])
+    assert error.value.faltantes == ["barrio"]
+    assert isinstance(error.value, KeyError)
+
+
+def test_mapeo_en_cache_no_se_comparte_mutable():
+    encabezado = ["Barrio", "Municipio"]
+    primero = sr.resolver_columnas("local", encabezado)
+    primero["Barrio"] = "otra cosa"
+    assert sr.resolver_columnas("local", encabezado)["Barrio"] == "barrio"
@@ -0,0 +1,30 @@
+import unicodedata
+
+import pandas as pd
+
+
+def normalizar_cadena(texto):
+    """Mayúsculas, sin tildes ni signos y con espacios simples: 'Bogotá, D.C.' -> 'BOGOTA D C'."""
+    texto = unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode("ascii").upper()
+    return " ".join("".join(c if c.isalnum() else " " for c in texto).split())
+
+
+def normalizar_texto(serie):
+    """
+    Versión vectorizada de `normalizar_cadena` para una Serie. Si la Serie es categórica
+    solo se normalizan las categorías (una vez por valor distinto) y se expanden por código.
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        categorias = normalizar_texto(pd.Series(serie.cat.categories, dtype="string"))
+        codigos = serie.cat.codes.to_numpy()
+        valores = categorias.to_numpy(dtype=object, na_value=None)[codigos]
+        valores[codigos < 0] = None
+        return pd.Series(valores, index=serie.index, dtype="string")
+
+    return (
+        serie.astype("string")
+        .str.normalize("NFKD").str.encode("ascii", "ignore").str.decode("ascii")
+        .str.upper()
+        .str.replace(r"[^A-Z0-9]+", " ", regex=True)
+        .str.strip()
+    )